@@ -7,16 +7,40 @@ import unicodedata
 import re
 import spacy
 import difflib
+import threading
+import hashlib
+import atexit
+import json
+import sqlite3
+import shutil
+import copy
+import csv
+import tempfile
+import zipfile
+import struct
+import contextvars
+import functools
+import inspect
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+import queue
+import importlib
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
 from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import async_playwright, TimeoutError as AsyncPlaywrightTimeoutError
 from PyPDF2 import PdfReader
 from docx import Document
 from docx.shared import Pt
-from io import BytesIO
+from docx.oxml.ns import qn
+from io import BytesIO, StringIO
 
 # Bibliotecas para OCR e imagem
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
 import pytesseract
-from PIL import Image, ImageEnhance, ImageFilter
+import numpy as np
+from PIL import Image
 
 # Criptografia de dados (exemplo simples)
 from cryptography.fernet import Fernet
@@ -24,9 +48,12 @@ from cryptography.fernet import Fernet
 # Configuração básica de logs
 logging.basicConfig(level=logging.ERROR)
 
-# Configurar o caminho do Tesseract (ajuste conforme necessário)
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-# pytesseract.pytesseract.tesseract_cmd = '/usr/bin/tesseract'  # Para Linux
+# Caminho do Tesseract: SEI_TESSERACT_CMD, senão a instalação padrão no
+# Windows, senão o "tesseract" do PATH (Linux, servidores do worker)
+TESSERACT_WINDOWS = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+pytesseract.pytesseract.tesseract_cmd = os.environ.get("SEI_TESSERACT_CMD") or (
+    TESSERACT_WINDOWS if os.name == 'nt' and os.path.exists(TESSERACT_WINDOWS) else "tesseract"
+)
 
 # Ajuste para Windows no loop de eventos assíncronos
 if os.name == 'nt':
@@ -34,58 +61,239 @@ if os.name == 'nt':
 
 LOGIN_URL = "https://sei.anvisa.gov.br/sip/login.php?sigla_orgao_sistema=ANVISA&sigla_sistema=SEI"
 
+# Limites de espera (ms) de cada etapa da navegação no SEI
+SEI_TIMEOUTS = {
+    "pesquisa": int(os.environ.get("SEI_TIMEOUT_PESQUISA", "40000")),
+    "navegacao": int(os.environ.get("SEI_TIMEOUT_NAVEGACAO", "30000")),
+    "iframe": int(os.environ.get("SEI_TIMEOUT_IFRAME", "15000")),
+    "barra_acoes": int(os.environ.get("SEI_TIMEOUT_BARRA_ACOES", "20000")),
+    "gerar_pdf": int(os.environ.get("SEI_TIMEOUT_GERAR_PDF", "20000")),
+    "download": int(os.environ.get("SEI_TIMEOUT_DOWNLOAD", "60000")),
+}
+
+@contextmanager
+def medir_tempo(tempos, etapa):
+    """
+    Acumula em tempos[etapa] a duração (s) do bloco. Não faz nada se tempos for None.
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        if tempos is not None:
+            tempos[etapa] = tempos.get(etapa, 0.0) + (time.perf_counter() - inicio)
+
+def _somar_tempos(tempos, parciais):
+    if tempos is not None:
+        for etapa, segundos in parciais.items():
+            tempos[etapa] = tempos.get(etapa, 0.0) + segundos
+
+###############################################################################
+# Rastreamento por etapa (spans exportados em JSON lines)
+###############################################################################
+RASTREAMENTO_ARQUIVO = os.environ.get("SEI_RASTREAMENTO_ARQUIVO", os.path.join(os.getcwd(), "logs", "spans.jsonl"))
+
+_rastro_atual = contextvars.ContextVar("rastro_atual", default=None)
+_span_atual = contextvars.ContextVar("span_atual", default=None)
+_lock_exportacao = threading.Lock()
+
+class Rastro:
+    """
+    Spans de uma requisição (um processo baixado/extraído ou um documento gerado).
+    Fica associado ao contexto de execução; threads e corrotinas que devem
+    contribuir para ele recebem uma cópia do contexto (contextvars).
+    """
+
+    def __init__(self, nome, **atributos):
+        self.id = uuid.uuid4().hex[:12]
+        self.nome = nome
+        self.atributos = atributos
+        self.inicio = time.time()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def registrar(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def como_dict(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s["inicio"])
+        return {"rastro": self.id, "nome": self.nome, "atributos": self.atributos, "inicio": self.inicio, "spans": spans}
+
+    def exportar(self, caminho=RASTREAMENTO_ARQUIVO):
+        """
+        Acrescenta um span por linha em `caminho`, com o id e os atributos do rastro.
+        """
+        if not caminho:
+            return
+        linhas = linhas_jsonl(self.como_dict())
+        try:
+            os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+            with _lock_exportacao, open(caminho, "a", encoding="utf-8") as f:
+                f.writelines(linha + "\n" for linha in linhas)
+        except OSError as e:
+            logging.error(f"Não foi possível exportar os spans para {caminho}: {e}")
+
+def linhas_jsonl(dados_rastro):
+    """
+    Converte um rastro (Rastro.como_dict) em linhas JSON, uma por span.
+    """
+    cabecalho = {"rastro": dados_rastro["rastro"], "nome": dados_rastro["nome"], **dados_rastro["atributos"]}
+    return [
+        json.dumps({**cabecalho, **span}, ensure_ascii=False, default=str)
+        for span in dados_rastro["spans"]
+    ]
+
+@contextmanager
+def iniciar_rastro(nome, **atributos):
+    """
+    Abre um rastro para a requisição; os spans das funções chamadas dentro do
+    bloco são coletados nele e exportados ao final.
+    """
+    rastro = Rastro(nome, **atributos)
+    token_rastro = _rastro_atual.set(rastro)
+    token_span = _span_atual.set(None)
+    try:
+        yield rastro
+    finally:
+        _span_atual.reset(token_span)
+        _rastro_atual.reset(token_rastro)
+        rastro.exportar()
+
+@contextmanager
+def span(etapa, **atributos):
+    """
+    Mede o bloco como um span do rastro atual. Sem rastro ativo, não registra nada.
+    """
+    rastro = _rastro_atual.get()
+    if rastro is None:
+        yield
+        return
+
+    pai = _span_atual.get()
+    registro = {
+        "span": uuid.uuid4().hex[:8],
+        "pai": pai["span"] if pai else None,
+        "etapa": etapa,
+        "inicio": time.time(),
+        "thread": threading.current_thread().name,
+        "atributos": dict(atributos),
+    }
+    token = _span_atual.set(registro)
+    inicio = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        registro["erro"] = str(e)
+        raise
+    finally:
+        registro["duracao_s"] = round(time.perf_counter() - inicio, 6)
+        _span_atual.reset(token)
+        rastro.registrar(registro)
+
+def anotar_span(**atributos):
+    """
+    Acrescenta atributos (páginas, bytes, quantidades) ao span em andamento.
+    """
+    registro = _span_atual.get()
+    if registro is not None:
+        registro["atributos"].update(atributos)
+
+def rastrear(etapa):
+    """
+    Decorador: registra cada chamada da função (síncrona ou corrotina) como um span.
+    """
+    def decorador(funcao):
+        if inspect.iscoroutinefunction(funcao):
+            @functools.wraps(funcao)
+            async def envolvida(*args, **kwargs):
+                with span(etapa):
+                    return await funcao(*args, **kwargs)
+        else:
+            @functools.wraps(funcao)
+            def envolvida(*args, **kwargs):
+                with span(etapa):
+                    return funcao(*args, **kwargs)
+        return envolvida
+    return decorador
+
+async def _no_contexto(coro, contexto):
+    # Tarefas do loop compartilhado copiam o contexto da thread do loop, não de quem as agendou
+    for variavel, valor in contexto.items():
+        variavel.set(valor)
+    return await coro
+
 ###############################################################################
 # Criptografia básica (chave em memória)
 ###############################################################################
-secret_key = Fernet.generate_key()
+@st.cache_resource
+def _obter_chave_secreta():
+    # A chave precisa sobreviver aos reruns do Streamlit, pois o pool de
+    # sessões guarda credenciais cifradas entre execuções do script.
+    return Fernet.generate_key()
+
+secret_key = _obter_chave_secreta()
 cipher_suite = Fernet(secret_key)
 
 ###############################################################################
 # Funções de Validação de CPF e CNPJ
 ###############################################################################
+# Pesos dos dígitos verificadores, da esquerda para a direita
+PESOS_CPF = (np.arange(10, 1, -1), np.arange(11, 1, -1))
+PESOS_CNPJ = (np.array([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]), np.array([6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]))
+
+def _digitos_verificadores_validos(digitos, pesos):
+    """
+    Valida em lote uma matriz (n, tamanho) de dígitos: confere os dois
+    dígitos verificadores de todas as linhas de uma vez (módulo 11) e
+    rejeita as sequências de um único dígito repetido (ex.: 000.000.000-00).
+    Retorna um vetor booleano com uma posição por linha.
+    """
+    digitos = np.asarray(digitos, dtype=np.int64).reshape(-1, len(pesos[1]) + 1)
+    validos = ~(digitos == digitos[:, :1]).all(axis=1)
+    for peso in pesos:
+        posicao = len(peso)
+        resto = (digitos[:, :posicao] @ peso) % 11
+        validos &= np.where(resto < 2, 0, 11 - resto) == digitos[:, posicao]
+    return validos
+
+def _matriz_digitos(numeros, tamanho):
+    return (np.frombuffer("".join(numeros).encode("ascii"), dtype=np.uint8) - ord("0")).reshape(-1, tamanho)
+
+def validar_cpfs(cpfs):
+    """Valida uma lista de CPFs (só dígitos, 11 cada) de uma vez."""
+    if not cpfs:
+        return np.zeros(0, dtype=bool)
+    return _digitos_verificadores_validos(_matriz_digitos(cpfs, 11), PESOS_CPF)
+
+def validar_cnpjs(cnpjs):
+    """Valida uma lista de CNPJs (só dígitos, 14 cada) de uma vez."""
+    if not cnpjs:
+        return np.zeros(0, dtype=bool)
+    return _digitos_verificadores_validos(_matriz_digitos(cnpjs, 14), PESOS_CNPJ)
+
 def validar_cpf(cpf: str) -> bool:
-    cpf = re.sub(r"\D", "", cpf)
+    cpf = re.sub(r"[^0-9]", "", cpf)
     if len(cpf) != 11:
         return False
-    if cpf in [str(i)*11 for i in range(10)]:
-        return False
-    for i in range(9, 11):
-        soma = 0
-        for j in range(0, i):
-            soma += int(cpf[j]) * ((i+1) - j)
-        resto = (soma * 10) % 11
-        resto = 0 if resto == 10 else resto
-        if resto != int(cpf[i]):
-            return False
-    return True
+    return bool(validar_cpfs([cpf])[0])
 
 def validar_cnpj(cnpj: str) -> bool:
-    cnpj = re.sub(r"\D", "", cnpj)
+    cnpj = re.sub(r"[^0-9]", "", cnpj)
     if len(cnpj) != 14:
         return False
-    if cnpj in [str(i)*14 for i in range(10)]:
-        return False
-    
-    def calc_dv(cnpj_parcial):
-        peso = [6,7,8,9,2,3,4,5]
-        soma = 0
-        for i, digit in enumerate(cnpj_parcial[::-1]):
-            soma += int(digit) * peso[i % len(peso)]
-        resto = soma % 11
-        return '0' if resto < 2 else str(11 - resto)
-    
-    dv1 = calc_dv(cnpj[:-2])
-    dv2 = calc_dv(cnpj[:-2] + dv1)
-    return (dv1 == cnpj[-2]) and (dv2 == cnpj[-1])
+    return bool(validar_cnpjs([cnpj])[0])
 
 ###############################################################################
 # Funções relacionadas ao Playwright
 ###############################################################################
-def create_browser_context(headless=True):
+def create_browser_context(headless=True, user_data_dir=None):
     download_dir = os.path.join(os.getcwd(), "downloads")
     os.makedirs(download_dir, exist_ok=True)
     
-    user_data_dir = os.path.join(os.getcwd(), "user_data")
+    if user_data_dir is None:
+        user_data_dir = os.path.join(os.getcwd(), "user_data")
     os.makedirs(user_data_dir, exist_ok=True)
     
     playwright = sync_playwright().start()
@@ -127,6 +335,7 @@ def handle_alert(page):
     except PlaywrightTimeoutError:
         return None
 
+@rastrear("login")
 def login(page, username_encrypted, password_encrypted):
     username = cipher_suite.decrypt(username_encrypted).decode('utf-8')
     password = cipher_suite.decrypt(password_encrypted).decode('utf-8')
@@ -156,12 +365,26 @@ def login(page, username_encrypted, password_encrypted):
     except PlaywrightTimeoutError:
         raise Exception("Login pode não ter sido realizado com sucesso.")
 
-def access_process(page, process_number):
+@rastrear("access_process")
+def access_process(page, process_number, tempos=None):
+    """
+    Pesquisa o processo e aguarda a árvore de ações (divArvoreAcoes) ficar
+    disponível no iframe de visualização, em vez de esperar um tempo fixo.
+    """
     try:
-        search_field = wait_for_element(page, "#txtPesquisaRapida", timeout=40000)
-        search_field.fill(process_number)
-        search_field.press("Enter")
-        time.sleep(5)
+        with medir_tempo(tempos, "pesquisa"):
+            search_field = wait_for_element(page, "#txtPesquisaRapida", timeout=SEI_TIMEOUTS["pesquisa"])
+            search_field.fill(process_number)
+            with page.expect_navigation(wait_until="domcontentloaded", timeout=SEI_TIMEOUTS["navegacao"]):
+                search_field.press("Enter")
+
+        with medir_tempo(tempos, "iframe_visualizacao"):
+            iframe = _obter_iframe_visualizacao(page)
+
+        with medir_tempo(tempos, "barra_acoes"):
+            iframe.wait_for_selector("#divArvoreAcoes", timeout=SEI_TIMEOUTS["barra_acoes"])
+    except PlaywrightTimeoutError as e:
+        raise Exception(f"Erro ao acessar o processo: tempo limite excedido ({e})")
     except Exception as e:
         raise Exception(f"Erro ao acessar o processo: {e}")
 
@@ -169,30 +392,40 @@ IFRAME_VISUALIZACAO_ID = "ifrVisualizacao"
 BUTTON_XPATH_GERAR_PDF = '//*[@id="divArvoreAcoes"]/a[7]/img'
 BUTTON_XPATH_DOWNLOAD_OPTION = '//*[@id="divInfraBarraComandosSuperior"]/button[1]'
 
-def generate_and_download_pdf(page, download_dir):
+def _obter_iframe_visualizacao(page):
+    iframe_element = page.wait_for_selector(f'iframe#{IFRAME_VISUALIZACAO_ID}', timeout=SEI_TIMEOUTS["iframe"])
+    if not iframe_element:
+        raise Exception(f"Iframe com ID {IFRAME_VISUALIZACAO_ID} não encontrado.")
+
+    iframe = iframe_element.content_frame()
+    if not iframe:
+        raise Exception("Não foi possível acessar o conteúdo do iframe.")
+    iframe.wait_for_load_state("domcontentloaded", timeout=SEI_TIMEOUTS["iframe"])
+    return iframe
+
+@rastrear("generate_and_download_pdf")
+def generate_and_download_pdf(page, download_dir, tempos=None):
     try:
-        iframe_element = page.wait_for_selector(f'iframe#{IFRAME_VISUALIZACAO_ID}', timeout=10000)
-        if not iframe_element:
-            raise Exception(f"Iframe com ID {IFRAME_VISUALIZACAO_ID} não encontrado.")
-        
-        iframe = iframe_element.content_frame()
-        if not iframe:
-            raise Exception("Não foi possível acessar o conteúdo do iframe.")
-        
-        gerar_pdf_button = iframe.wait_for_selector(f'xpath={BUTTON_XPATH_GERAR_PDF}', timeout=10000)
-        if not gerar_pdf_button:
-            raise Exception("Botão para gerar PDF não encontrado.")
-        gerar_pdf_button.click()
-        time.sleep(2)
-        
-        download_option_button = iframe.wait_for_selector(f'xpath={BUTTON_XPATH_DOWNLOAD_OPTION}', timeout=10000)
-        if not download_option_button:
-            raise Exception("Botão de opção de download não encontrado.")
-        
-        with page.expect_download(timeout=60000) as download_info_option:
-            download_option_button.click()
-        download_option = download_info_option.value
-        download_option_path = handle_download(download_option, download_dir)
+        iframe = _obter_iframe_visualizacao(page)
+
+        with medir_tempo(tempos, "gerar_pdf"):
+            gerar_pdf_button = iframe.wait_for_selector(f'xpath={BUTTON_XPATH_GERAR_PDF}', timeout=SEI_TIMEOUTS["barra_acoes"])
+            if not gerar_pdf_button:
+                raise Exception("Botão para gerar PDF não encontrado.")
+            gerar_pdf_button.click()
+
+            # O formulário de geração abre no próprio iframe; o botão só aparece quando ele carrega
+            download_option_button = iframe.wait_for_selector(f'xpath={BUTTON_XPATH_DOWNLOAD_OPTION}', timeout=SEI_TIMEOUTS["gerar_pdf"])
+            if not download_option_button:
+                raise Exception("Botão de opção de download não encontrado.")
+
+        with medir_tempo(tempos, "download"):
+            with page.expect_download(timeout=SEI_TIMEOUTS["download"]) as download_info_option:
+                download_option_button.click()
+            download_option = download_info_option.value
+            # save_as aguarda o término do download, dispensando espera fixa
+            download_option_path = handle_download(download_option, download_dir)
+        anotar_span(bytes=os.path.getsize(download_option_path))
         
         return download_option_path
     
@@ -200,24 +433,766 @@ def generate_and_download_pdf(page, download_dir):
         raise Exception("Timeout ao gerar o PDF do processo.")
     except Exception as e:
         raise Exception(f"Erro ao gerar o PDF do processo: {e}")
-    finally:
-        time.sleep(5)
 
-def process_notification(username_encrypted, password_encrypted, process_number, headless=True):
+###############################################################################
+# Pool de sessões do navegador (login mantido entre processos)
+###############################################################################
+POOL_MAX_SESSOES = int(os.environ.get("SEI_POOL_MAX_SESSOES", "4"))
+POOL_TEMPO_OCIOSO = int(os.environ.get("SEI_POOL_TEMPO_OCIOSO", "900"))  # segundos
+# Trechos das mensagens do Playwright quando o navegador/contexto morreu (janela
+# fechada pelo usuário, Chromium encerrado). As funções do fluxo reembrulham
+# as exceções em Exception(f"...: {e}"), por isso a verificação é pelo texto.
+_MENSAGENS_NAVEGADOR_FECHADO = (
+    "has been closed",
+    "Target closed",
+    "Browser closed",
+    "Connection closed",
+    "browser has disconnected",
+)
+
+def _navegador_fechado(erro):
+    mensagem = str(erro)
+    return any(trecho in mensagem for trecho in _MENSAGENS_NAVEGADOR_FECHADO)
+
+class SessaoSEI:
+    """
+    Contexto do Chromium logado no SEI para um usuário.
+    A API síncrona do Playwright só pode ser usada na thread que a criou,
+    por isso cada sessão tem uma thread própria e todo acesso passa por ela.
+    """
+
+    def __init__(self, chave, headless=True, slot=0):
+        self.chave = chave
+        self.headless = headless
+        # Cada slot precisa do seu diretório: o Chromium trava o perfil em uso
+        self.user_data_dir = os.path.join(os.getcwd(), "user_data", f"{chave[:16]}_{slot}")
+        self.ultimo_uso = time.monotonic()
+        self.em_uso = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"sei-{chave[:8]}")
+        self._playwright = None
+        self._context = None
+        self._headless_contexto = None
+        self._url_inicial = None
+
+    def executar(self, username_encrypted, password_encrypted, funcao):
+        """
+        Executa funcao(page) na thread da sessão, com uma página já logada.
+        """
+        # A cópia do contexto leva o rastro da requisição para a thread da sessão
+        return self._executor.submit(
+            contextvars.copy_context().run,
+            self._executar_com_pagina, username_encrypted, password_encrypted, funcao
+        ).result()
+
+    def encerrar(self):
+        try:
+            self._executor.submit(self._fechar).result(timeout=30)
+        except Exception as e:
+            logging.error(f"Erro ao encerrar sessão do navegador: {e}")
+        finally:
+            self._executor.shutdown(wait=False)
+
+    def _executar_com_pagina(self, username_encrypted, password_encrypted, funcao):
+        try:
+            return self._executar_uma_vez(username_encrypted, password_encrypted, funcao)
+        except Exception as e:
+            if not _navegador_fechado(e):
+                raise
+            # Sem isso a sessão ficaria quebrada até reiniciar o processo
+            logging.warning(f"Navegador da sessão foi fechado ({e}); abrindo outro e repetindo.")
+            self._fechar()
+            return self._executar_uma_vez(username_encrypted, password_encrypted, funcao)
+
+    def _executar_uma_vez(self, username_encrypted, password_encrypted, funcao):
+        if self._context is not None and self._headless_contexto != self.headless:
+            # Modo headless trocado enquanto a sessão estava em uso: as chamadas
+            # são serializadas nesta thread, então dá para reabrir aqui
+            self._fechar()
+        if self._context is None:
+            self._playwright, self._context, page = create_browser_context(
+                headless=self.headless, user_data_dir=self.user_data_dir
+            )
+            self._headless_contexto = self.headless
+        else:
+            page = self._context.new_page()
+
+        try:
+            if self._url_inicial:
+                page.goto(self._url_inicial)
+            if not self._url_inicial or self._sessao_expirada(page):
+                login(page, username_encrypted, password_encrypted)
+                self._url_inicial = page.url
+            return funcao(page)
+        finally:
+            # Mantém ao menos uma página aberta para o contexto continuar ativo
+            try:
+                if len(self._context.pages) > 1:
+                    page.close()
+            except Exception as e:
+                logging.warning(f"Erro ao fechar a página: {e}")
+
+    @staticmethod
+    def _sessao_expirada(page):
+        if "login.php" in page.url:
+            return True
+        return page.query_selector("#txtUsuario") is not None
+
+    def _fechar(self):
+        # Com o navegador morto, close()/stop() também podem falhar; as
+        # referências são descartadas de qualquer forma
+        contexto, playwright = self._context, self._playwright
+        self._context = self._playwright = self._headless_contexto = None
+        for recurso, fechar in ((contexto, "close"), (playwright, "stop")):
+            if recurso is None:
+                continue
+            try:
+                getattr(recurso, fechar)()
+            except Exception as e:
+                logging.warning(f"Erro ao fechar o navegador da sessão: {e}")
+
+class PoolSessoesSEI:
+    """
+    Mantém sessões do SEI aquecidas, uma por usuário, com descarte das
+    sessões ociosas. O limite de max_sessoes navegadores abertos é rígido:
+    com todas as sessões em uso, quem precisa de uma nova espera até alguma
+    ser liberada.
+    """
+
+    def __init__(self, max_sessoes=POOL_MAX_SESSOES, tempo_ocioso=POOL_TEMPO_OCIOSO):
+        self.max_sessoes = max_sessoes
+        self.tempo_ocioso = tempo_ocioso
+        self._sessoes = OrderedDict()
+        self._lock = threading.Lock()
+        self._liberada = threading.Condition(self._lock)
+
+    @staticmethod
+    def chave_usuario(username_encrypted):
+        username = cipher_suite.decrypt(username_encrypted).decode('utf-8')
+        return hashlib.sha256(username.encode('utf-8')).hexdigest()
+
+    def executar(self, username_encrypted, password_encrypted, funcao, headless=True, slot=0):
+        """
+        Executa funcao(page) numa sessão do usuário. Slots diferentes usam
+        contextos independentes, permitindo páginas em paralelo (modo lote).
+        """
+        chave = (self.chave_usuario(username_encrypted), slot)
+        sessao = self._adquirir(chave, headless)
+        try:
+            return sessao.executar(username_encrypted, password_encrypted, funcao)
+        finally:
+            with self._liberada:
+                sessao.em_uso -= 1
+                sessao.ultimo_uso = time.monotonic()
+                self._liberada.notify_all()
+
+    def encerrar(self):
+        with self._lock:
+            sessoes = list(self._sessoes.values())
+            self._sessoes.clear()
+        for sessao in sessoes:
+            sessao.encerrar()
+
+    def _adquirir(self, chave, headless):
+        descartadas = []
+        with self._liberada:
+            agora = time.monotonic()
+            for k, s in list(self._sessoes.items()):
+                if s.em_uso == 0 and agora - s.ultimo_uso > self.tempo_ocioso:
+                    descartadas.append(self._sessoes.pop(k))
+
+            sessao = self._sessoes.get(chave)
+            while sessao is None:
+                # Libera espaço descartando a sessão ociosa usada há mais tempo
+                while len(self._sessoes) >= self.max_sessoes:
+                    livre = next((k for k, s in self._sessoes.items() if s.em_uso == 0), None)
+                    if livre is None:
+                        break
+                    descartadas.append(self._sessoes.pop(livre))
+                if len(self._sessoes) < self.max_sessoes:
+                    sessao = SessaoSEI(chave[0], headless=headless, slot=chave[1])
+                    self._sessoes[chave] = sessao
+                    break
+                # Todas em uso: espera uma ser liberada (ou a desta chave ser criada)
+                self._liberada.wait()
+                sessao = self._sessoes.get(chave)
+
+            if sessao is not None and sessao.headless != headless:
+                # A sessão reabre o navegador no novo modo na próxima chamada;
+                # as que já estão na fila dela também passam a usá-lo
+                if sessao.em_uso:
+                    logging.info(
+                        f"Modo headless={headless} aplicado à sessão em uso "
+                        f"({sessao.em_uso} chamada(s) em andamento ou na fila)."
+                    )
+                sessao.headless = headless
+
+            self._sessoes.move_to_end(chave)
+            sessao.em_uso += 1
+
+        for s in descartadas:
+            s.encerrar()
+        return sessao
+
+@st.cache_resource
+def obter_pool_sessoes():
+    pool = PoolSessoesSEI()
+    atexit.register(pool.encerrar)
+    return pool
+
+def process_notification(username_encrypted, password_encrypted, process_number, headless=True, tempos=None):
     download_dir = os.path.join(os.getcwd(), "downloads")
-    playwright, context, page = create_browser_context(headless=headless)
-    
+
+    def _baixar_pdf(page):
+        access_process(page, process_number, tempos=tempos)
+        return generate_and_download_pdf(page, download_dir, tempos=tempos)
+
     try:
-        login(page, username_encrypted, password_encrypted)
-        access_process(page, process_number)
-        download_path = generate_and_download_pdf(page, download_dir)
-        return download_path
+        return obter_pool_sessoes().executar(
+            username_encrypted, password_encrypted, _baixar_pdf, headless=headless
+        )
     except Exception as e:
         logging.error(f"Erro durante o processamento: {e}")
         raise e
-    finally:
-        context.close()
-        playwright.stop()
+
+###############################################################################
+# Pipeline assíncrono (playwright.async_api em loop compartilhado)
+###############################################################################
+ASYNC_MAX_NAVEGADORES = int(os.environ.get("SEI_ASYNC_MAX_NAVEGADORES", "2"))
+ASYNC_MAX_SIMULTANEOS = int(os.environ.get("SEI_ASYNC_MAX_SIMULTANEOS", "8"))
+
+class PipelineAssincrono:
+    """
+    Loop asyncio único, rodando numa thread própria, compartilhado por todas
+    as sessões do Streamlit. Poucos processos do Chromium atendem muitos
+    usuários através de contextos leves (um por processo SEI).
+    """
+
+    def __init__(self, max_navegadores=ASYNC_MAX_NAVEGADORES, max_simultaneos=ASYNC_MAX_SIMULTANEOS):
+        self.max_navegadores = max_navegadores
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="sei-async", daemon=True)
+        self._thread.start()
+        self._lock = asyncio.Lock()
+        self._semaforo = asyncio.Semaphore(max_simultaneos)
+        self._playwright = None
+        self._navegadores = {}
+        self._proximo = 0
+        # (storage_state, url inicial) por usuário, evitando um novo login a cada processo
+        self._estados_login = {}
+
+    def limitar(self):
+        """Limite de processos simultâneos: `async with pipeline.limitar():`."""
+        return self._semaforo
+
+    def estado_login(self, chave):
+        """(storage_state, url inicial) do último login do usuário, ou (None, None)."""
+        return self._estados_login.get(chave, (None, None))
+
+    def guardar_estado_login(self, chave, estado, url_inicial):
+        self._estados_login[chave] = (estado, url_inicial)
+
+    def executar(self, coro):
+        """
+        Agenda a corrotina no loop compartilhado e aguarda o resultado.
+        """
+        return asyncio.run_coroutine_threadsafe(
+            _no_contexto(coro, contextvars.copy_context()), self._loop
+        ).result()
+
+    async def obter_navegador(self, headless=True):
+        async with self._lock:
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            navegadores = self._navegadores.setdefault(headless, [])
+            if len(navegadores) < self.max_navegadores:
+                navegadores.append(await self._playwright.chromium.launch(headless=headless))
+                return navegadores[-1]
+            self._proximo += 1
+            return navegadores[self._proximo % len(navegadores)]
+
+    async def _encerrar(self):
+        for navegadores in self._navegadores.values():
+            for navegador in navegadores:
+                await navegador.close()
+        self._navegadores.clear()
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    def encerrar(self):
+        try:
+            self.executar(self._encerrar())
+        except Exception as e:
+            logging.error(f"Erro ao encerrar o pipeline assíncrono: {e}")
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+@st.cache_resource
+def obter_pipeline_assincrono():
+    pipeline = PipelineAssincrono()
+    atexit.register(pipeline.encerrar)
+    return pipeline
+
+async def wait_for_element_async(page, selector, timeout=20000):
+    try:
+        element = await page.wait_for_selector(selector, timeout=timeout)
+        if element:
+            return element
+    except AsyncPlaywrightTimeoutError:
+        logging.error(f"Elemento {selector} não encontrado na página.")
+        raise Exception(f"Elemento {selector} não encontrado na página.")
+    return None
+
+@rastrear("login")
+async def login_async(page, username_encrypted, password_encrypted):
+    username = cipher_suite.decrypt(username_encrypted).decode('utf-8')
+    password = cipher_suite.decrypt(password_encrypted).decode('utf-8')
+
+    await page.goto(LOGIN_URL)
+
+    user_field = await wait_for_element_async(page, "#txtUsuario")
+    if not user_field:
+        raise Exception("Campo de usuário não encontrado.")
+    await user_field.fill(username)
+
+    password_field = await wait_for_element_async(page, "#pwdSenha")
+    if not password_field:
+        raise Exception("Campo de senha não encontrado.")
+    await password_field.fill(password)
+
+    login_button = await wait_for_element_async(page, "#sbmAcessar")
+    if not login_button:
+        raise Exception("Botão de login não encontrado.")
+    await login_button.click()
+
+    try:
+        await page.wait_for_load_state("networkidle", timeout=20000)
+    except AsyncPlaywrightTimeoutError:
+        raise Exception("Login pode não ter sido realizado com sucesso.")
+
+@rastrear("access_process")
+async def access_process_async(page, process_number, tempos=None):
+    try:
+        with medir_tempo(tempos, "pesquisa"):
+            search_field = await wait_for_element_async(page, "#txtPesquisaRapida", timeout=SEI_TIMEOUTS["pesquisa"])
+            await search_field.fill(process_number)
+            async with page.expect_navigation(wait_until="domcontentloaded", timeout=SEI_TIMEOUTS["navegacao"]):
+                await search_field.press("Enter")
+
+        with medir_tempo(tempos, "iframe_visualizacao"):
+            iframe = await _obter_iframe_visualizacao_async(page)
+
+        with medir_tempo(tempos, "barra_acoes"):
+            await iframe.wait_for_selector("#divArvoreAcoes", timeout=SEI_TIMEOUTS["barra_acoes"])
+    except AsyncPlaywrightTimeoutError as e:
+        raise Exception(f"Erro ao acessar o processo: tempo limite excedido ({e})")
+    except Exception as e:
+        raise Exception(f"Erro ao acessar o processo: {e}")
+
+async def _obter_iframe_visualizacao_async(page):
+    iframe_element = await page.wait_for_selector(f'iframe#{IFRAME_VISUALIZACAO_ID}', timeout=SEI_TIMEOUTS["iframe"])
+    if not iframe_element:
+        raise Exception(f"Iframe com ID {IFRAME_VISUALIZACAO_ID} não encontrado.")
+
+    iframe = await iframe_element.content_frame()
+    if not iframe:
+        raise Exception("Não foi possível acessar o conteúdo do iframe.")
+    await iframe.wait_for_load_state("domcontentloaded", timeout=SEI_TIMEOUTS["iframe"])
+    return iframe
+
+@rastrear("generate_and_download_pdf")
+async def generate_and_download_pdf_async(page, download_dir, tempos=None):
+    try:
+        iframe = await _obter_iframe_visualizacao_async(page)
+
+        with medir_tempo(tempos, "gerar_pdf"):
+            gerar_pdf_button = await iframe.wait_for_selector(f'xpath={BUTTON_XPATH_GERAR_PDF}', timeout=SEI_TIMEOUTS["barra_acoes"])
+            if not gerar_pdf_button:
+                raise Exception("Botão para gerar PDF não encontrado.")
+            await gerar_pdf_button.click()
+
+            download_option_button = await iframe.wait_for_selector(f'xpath={BUTTON_XPATH_DOWNLOAD_OPTION}', timeout=SEI_TIMEOUTS["gerar_pdf"])
+            if not download_option_button:
+                raise Exception("Botão de opção de download não encontrado.")
+
+        with medir_tempo(tempos, "download"):
+            async with page.expect_download(timeout=SEI_TIMEOUTS["download"]) as download_info_option:
+                await download_option_button.click()
+            download_option = await download_info_option.value
+            os.makedirs(download_dir, exist_ok=True)
+            download_path = os.path.join(download_dir, download_option.suggested_filename)
+            await download_option.save_as(download_path)
+            logging.info(f"Download salvo em: {download_path}")
+        anotar_span(bytes=os.path.getsize(download_path))
+
+        return download_path
+
+    except AsyncPlaywrightTimeoutError:
+        raise Exception("Timeout ao gerar o PDF do processo.")
+    except Exception as e:
+        raise Exception(f"Erro ao gerar o PDF do processo: {e}")
+
+async def process_notification_async(pipeline, username_encrypted, password_encrypted, process_number, headless=True, tempos=None):
+    """
+    Versão assíncrona de process_notification: login → pesquisa → gerar PDF → download,
+    num contexto novo do navegador compartilhado, reaproveitando os cookies do usuário.
+    """
+    download_dir = os.path.join(os.getcwd(), "downloads")
+    chave = PoolSessoesSEI.chave_usuario(username_encrypted)
+
+    async with pipeline.limitar():
+        navegador = await pipeline.obter_navegador(headless)
+        estado, url_inicial = pipeline.estado_login(chave)
+        context = await navegador.new_context(accept_downloads=True, storage_state=estado)
+        try:
+            page = await context.new_page()
+            if url_inicial:
+                await page.goto(url_inicial)
+            if not url_inicial or "login.php" in page.url or await page.query_selector("#txtUsuario"):
+                await login_async(page, username_encrypted, password_encrypted)
+                pipeline.guardar_estado_login(chave, await context.storage_state(), page.url)
+
+            await access_process_async(page, process_number, tempos=tempos)
+            return await generate_and_download_pdf_async(page, download_dir, tempos=tempos)
+        except Exception as e:
+            logging.error(f"Erro durante o processamento: {e}")
+            raise e
+        finally:
+            await context.close()
+
+def process_notification_assincrono(username_encrypted, password_encrypted, process_number, headless=True, tempos=None):
+    pipeline = obter_pipeline_assincrono()
+    return pipeline.executar(process_notification_async(
+        pipeline, username_encrypted, password_encrypted, process_number, headless=headless, tempos=tempos
+    ))
+
+###############################################################################
+# Processamento em lote
+###############################################################################
+LOTE_MAX_WORKERS = int(os.environ.get("SEI_LOTE_MAX_WORKERS", "3"))
+
+def parse_process_numbers(texto):
+    """
+    Lê números de processo de uma lista colada ou de um CSV.
+    Aceita um número por linha ou separados por vírgula, ponto e vírgula ou tab.
+    Cabeçalhos e campos sem formato de processo são ignorados.
+    """
+    numeros = []
+    for linha in texto.splitlines():
+        for campo in re.split(r"[;,\t]", linha):
+            campo = campo.strip().strip('"').strip()
+            if re.fullmatch(r"\d[\d./\-\s]*\d", campo) and campo not in numeros:
+                numeros.append(campo)
+    return numeros
+
+def extrair_dados_pdf(download_path, tempos=None):
+    """
+    Extrai texto, informações do autuado e endereços de um PDF baixado.
+    Retorna None se nenhum texto puder ser extraído.
+    """
+    pdf_file_name = os.path.basename(download_path)
+    numero_processo = extract_process_number(pdf_file_name)
+
+    proveniencia = []
+    text_final, enderecos_ocr = extract_text_with_best_ocr(download_path, tempos=tempos, proveniencia=proveniencia)
+    if not text_final.strip():
+        return None
+
+    docs = analisar_documento(text_final)
+    campos_blocos = extrair_campos_por_bloco(text_final)
+    info = extract_information_spacy(text_final, docs=docs, campos=juntar_campos(campos_blocos))
+    addresses_ar_ais = extract_addresses_with_source(text_final, campos_blocos=campos_blocos)
+
+    return {
+        "numero_processo": numero_processo,
+        "texto": text_final,
+        "info": info,
+        # Unir endereços OCR e AR/AIS, juntando as variantes do mesmo endereço,
+        # e conferir cidade/bairro/estado com a base de CEP
+        "addresses": completar_enderecos_cep(deduplicar_enderecos(addresses_ar_ais + enderecos_ocr)),
+        "emails": extract_all_emails(info.get('emails', [])),
+        "paginas": proveniencia,
+    }
+
+def process_batch(username_encrypted, password_encrypted, process_numbers, max_workers=LOTE_MAX_WORKERS, headless=True, forcar_atualizacao=False):
+    """
+    Baixa e extrai vários processos em paralelo, cada um numa sessão própria
+    do pool. Gera um resultado por processo assim que ele termina, na ordem
+    de conclusão; a falha de um processo não interrompe os demais.
+    O paralelismo é limitado ao tamanho do pool (POOL_MAX_SESSOES).
+    """
+    download_dir = os.path.join(os.getcwd(), "downloads")
+    pool = obter_pool_sessoes()
+    max_workers = max(1, min(max_workers, pool.max_sessoes, len(process_numbers) or 1))
+
+    slots = queue.Queue()
+    for slot in range(max_workers):
+        slots.put(slot)
+
+    def _processar(numero):
+        resultado = {"process_number": numero, "pdf_path": None, "dados": None, "error": None, "tempos": {}}
+        with iniciar_rastro("lote", processo=numero) as rastro:
+            try:
+                def _baixar_pdf(page):
+                    access_process(page, numero, tempos=resultado["tempos"])
+                    return generate_and_download_pdf(page, download_dir, tempos=resultado["tempos"])
+
+                def _baixar_no_slot():
+                    slot = slots.get()
+                    try:
+                        return pool.executar(
+                            username_encrypted, password_encrypted, _baixar_pdf, headless=headless, slot=slot
+                        )
+                    finally:
+                        slots.put(slot)
+
+                # A extração roda fora do slot, liberando o navegador para o próximo processo
+                resultado["pdf_path"], resultado["dados"], _ = obter_dados_processo(
+                    numero, _baixar_no_slot, forcar_atualizacao=forcar_atualizacao, tempos=resultado["tempos"]
+                )
+                if resultado["dados"] is None:
+                    resultado["error"] = "Nenhum texto extraído do PDF."
+            except Exception as e:
+                logging.error(f"Erro no processo {numero}: {e}")
+                resultado["error"] = str(e)
+        resultado["rastro"] = rastro.como_dict()
+        return resultado
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="lote") as executor:
+        futures = [executor.submit(_processar, numero) for numero in process_numbers]
+        for future in as_completed(futures):
+            yield future.result()
+
+###############################################################################
+# Cache de PDFs e resultados de extração
+###############################################################################
+CACHE_DIR = os.environ.get("SEI_CACHE_DIR", os.path.join(os.getcwd(), "cache"))
+CACHE_MAX_BYTES = int(os.environ.get("SEI_CACHE_MAX_MB", "2048")) * 1024 * 1024
+# Acessos por leitura são gravados no índice no máximo a cada tantos segundos
+CACHE_INTERVALO_ACESSOS = 30
+# Arquivos fora do índice mais antigos que isto são removidos na limpeza
+CACHE_ORFAO_SEGUNDOS = 3600
+
+def hash_arquivo(caminho):
+    sha = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+class CacheExtracao:
+    """
+    Cache em disco endereçado pelo conteúdo (SHA-256) do PDF:
+    - pdfs/<hash>.pdf: PDF baixado do SEI;
+    - resultados/<hash>.json: texto, info e endereços extraídos;
+    - indice.sqlite: número do processo -> hash, e último acesso de cada hash.
+    O índice é compartilhado entre processos (app e worker.py no mesmo
+    diretório); o SQLite serializa as escritas. Os acessos por leitura são
+    acumulados em memória e gravados em lote. Quando o tamanho total passa
+    de max_bytes, os itens usados há mais tempo são removidos (LRU), assim
+    como os arquivos que não constam do índice.
+    """
+
+    def __init__(self, diretorio=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.diretorio = diretorio
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._acessos_pendentes = {}
+        self._ultima_gravacao = time.monotonic()
+        os.makedirs(os.path.join(diretorio, "pdfs"), exist_ok=True)
+        os.makedirs(os.path.join(diretorio, "resultados"), exist_ok=True)
+        self._conexao = sqlite3.connect(
+            os.path.join(diretorio, "indice.sqlite"), timeout=30, check_same_thread=False
+        )
+        with self._conexao:
+            self._conexao.execute("CREATE TABLE IF NOT EXISTS processos (processo TEXT PRIMARY KEY, hash TEXT NOT NULL)")
+            self._conexao.execute("CREATE TABLE IF NOT EXISTS acessos (hash TEXT PRIMARY KEY, ultimo REAL NOT NULL)")
+        self._importar_indice_json()
+        atexit.register(self._gravar_acessos)
+
+    def _importar_indice_json(self):
+        """Migra o indice.json de versões anteriores, se existir."""
+        caminho = os.path.join(self.diretorio, "indice.json")
+        if not os.path.exists(caminho):
+            return
+        try:
+            with open(caminho, encoding="utf-8") as f:
+                indice = json.load(f)
+            with self._conexao:
+                self._conexao.executemany(
+                    "INSERT OR IGNORE INTO processos VALUES (?, ?)", indice.get("processos", {}).items()
+                )
+                self._conexao.executemany(
+                    "INSERT OR IGNORE INTO acessos VALUES (?, ?)", indice.get("acessos", {}).items()
+                )
+            os.remove(caminho)
+        except (OSError, ValueError, sqlite3.Error) as e:
+            logging.error(f"Erro ao migrar o índice antigo do cache: {e}")
+
+    @staticmethod
+    def _chave_processo(process_number):
+        return re.sub(r"\D", "", process_number)
+
+    def _caminho_pdf(self, hash_pdf):
+        return os.path.join(self.diretorio, "pdfs", f"{hash_pdf}.pdf")
+
+    def _caminho_resultado(self, hash_pdf):
+        return os.path.join(self.diretorio, "resultados", f"{hash_pdf}.json")
+
+    def buscar_processo(self, process_number):
+        """
+        Retorna (caminho do PDF, dados) do último download do processo, ou None.
+        """
+        with self._lock:
+            linha = self._conexao.execute(
+                "SELECT hash FROM processos WHERE processo = ?", (self._chave_processo(process_number),)
+            ).fetchone()
+        if not linha:
+            return None
+        hash_pdf = linha[0]
+        dados = self.buscar_resultado(hash_pdf)
+        if dados is None or not os.path.exists(self._caminho_pdf(hash_pdf)):
+            return None
+        return self._caminho_pdf(hash_pdf), dados
+
+    def guardar_pdf(self, process_number, pdf_path):
+        """
+        Copia o PDF para o cache e associa o processo ao hash do conteúdo.
+        """
+        hash_pdf = hash_arquivo(pdf_path)
+        destino = self._caminho_pdf(hash_pdf)
+        if not os.path.exists(destino):
+            temporario = f"{destino}.{os.getpid()}.{threading.get_ident()}.tmp"
+            shutil.copyfile(pdf_path, temporario)
+            os.replace(temporario, destino)
+        with self._lock:
+            with self._conexao:
+                self._conexao.execute(
+                    "INSERT OR REPLACE INTO processos VALUES (?, ?)", (self._chave_processo(process_number), hash_pdf)
+                )
+            self._acessos_pendentes[hash_pdf] = time.time()
+            self._remover_excedentes()
+        return hash_pdf
+
+    def buscar_resultado(self, hash_pdf):
+        caminho = self._caminho_resultado(hash_pdf)
+        try:
+            with open(caminho, encoding="utf-8") as f:
+                dados = json.load(f)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            self._acessos_pendentes[hash_pdf] = time.time()
+            if time.monotonic() - self._ultima_gravacao > CACHE_INTERVALO_ACESSOS:
+                self._gravar_acessos_sem_lock()
+        return dados
+
+    def guardar_resultado(self, hash_pdf, dados):
+        caminho = self._caminho_resultado(hash_pdf)
+        temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(dados, f, ensure_ascii=False)
+        os.replace(temporario, caminho)
+        with self._lock:
+            self._acessos_pendentes[hash_pdf] = time.time()
+            self._remover_excedentes()
+
+    def _gravar_acessos(self):
+        with self._lock:
+            self._gravar_acessos_sem_lock()
+
+    def _gravar_acessos_sem_lock(self):
+        pendentes, self._acessos_pendentes = self._acessos_pendentes, {}
+        self._ultima_gravacao = time.monotonic()
+        if not pendentes:
+            return
+        try:
+            with self._conexao:
+                # Outro processo pode ter registrado um acesso mais recente
+                self._conexao.executemany(
+                    "INSERT INTO acessos VALUES (?, ?) "
+                    "ON CONFLICT(hash) DO UPDATE SET ultimo = max(ultimo, excluded.ultimo)",
+                    pendentes.items()
+                )
+        except sqlite3.Error as e:
+            logging.error(f"Erro ao gravar acessos do cache: {e}")
+
+    def _arquivos(self):
+        """{hash: [(caminho, tamanho, modificado)]} de tudo que está em pdfs/ e resultados/."""
+        arquivos = {}
+        for pasta in ("pdfs", "resultados"):
+            with os.scandir(os.path.join(self.diretorio, pasta)) as entradas:
+                for entrada in entradas:
+                    if entrada.name.endswith(".tmp") or not entrada.is_file():
+                        continue
+                    estado = entrada.stat()
+                    hash_pdf = entrada.name.rsplit(".", 1)[0]
+                    arquivos.setdefault(hash_pdf, []).append((entrada.path, estado.st_size, estado.st_mtime))
+        return arquivos
+
+    def _remover_excedentes(self):
+        self._gravar_acessos_sem_lock()
+        acessos = dict(self._conexao.execute("SELECT hash, ultimo FROM acessos"))
+        arquivos = self._arquivos()
+        agora = time.time()
+
+        removidos = []
+        for hash_pdf, itens in list(arquivos.items()):
+            # Arquivos fora do índice (gravados por um processo que perdeu a
+            # entrada) saem; os recentes podem estar a caminho do índice
+            if hash_pdf not in acessos and all(agora - modificado > CACHE_ORFAO_SEGUNDOS for _, _, modificado in itens):
+                removidos.append(hash_pdf)
+                del arquivos[hash_pdf]
+
+        total = sum(tamanho for itens in arquivos.values() for _, tamanho, _ in itens)
+        for hash_pdf in sorted(arquivos, key=lambda h: acessos.get(h, agora)):
+            if total <= self.max_bytes:
+                break
+            total -= sum(tamanho for _, tamanho, _ in arquivos[hash_pdf])
+            removidos.append(hash_pdf)
+        # Entradas do índice cujos arquivos já não existem
+        removidos.extend(h for h in acessos if h not in arquivos)
+        if not removidos:
+            return
+
+        for hash_pdf in removidos:
+            for caminho in (self._caminho_pdf(hash_pdf), self._caminho_resultado(hash_pdf)):
+                try:
+                    os.remove(caminho)
+                except FileNotFoundError:
+                    pass
+        with self._conexao:
+            self._conexao.executemany("DELETE FROM acessos WHERE hash = ?", ((h,) for h in removidos))
+            self._conexao.executemany("DELETE FROM processos WHERE hash = ?", ((h,) for h in removidos))
+
+@st.cache_resource
+def obter_cache():
+    return CacheExtracao()
+
+def obter_dados_processo(process_number, baixar_pdf, forcar_atualizacao=False, tempos=None):
+    """
+    Retorna (caminho do PDF, dados extraídos, veio_do_cache).
+    baixar_pdf() só é chamado se o processo não estiver no cache (ou se
+    forcar_atualizacao for True); se o PDF baixado tiver o mesmo conteúdo
+    de um já processado, a extração é reaproveitada.
+    """
+    cache = obter_cache()
+    if not forcar_atualizacao:
+        encontrado = cache.buscar_processo(process_number)
+        if encontrado:
+            return encontrado[0], encontrado[1], True
+
+    download_path = baixar_pdf()
+    hash_pdf = cache.guardar_pdf(process_number, download_path)
+
+    dados = None if forcar_atualizacao else cache.buscar_resultado(hash_pdf)
+    if dados is not None:
+        return download_path, dados, True
+
+    dados = extrair_dados_pdf(download_path, tempos=tempos)
+    if dados is not None:
+        cache.guardar_resultado(hash_pdf, dados)
+    return download_path, dados, False
 
 ###############################################################################
 # Extração de texto e OCR (atualizado)
@@ -229,161 +1204,723 @@ def normalize_text(text):
     text = re.sub(r"\s{2,}", " ", text)
     return text.strip()
 
+# Sequências de mojibake (UTF-8 lido como Latin-1/CP1252) e a grafia correta
+SUBSTITUICOES_MOJIBAKE = {
+    'Ã©': 'é',
+    'Ã§Ã£o': 'ção',
+    'Ã³': 'ó',
+    'Ã': 'à',
+    'â€“': '–',
+    'â€”': '—',
+    'Ãº': 'ú',
+    'Ãª': 'ê',
+    'Ã£o': 'ão',
+    'â€œ': '"',
+    'â€': '"',
+    'Ã¡': 'á',
+    'Ã¢': 'â',
+    'Ã­': 'í',
+    'Ã´': 'ô',
+    'Ã§': 'ç',
+}
+
+# Alternativas da mais longa para a mais curta: numa mesma posição vence a
+# sequência mais longa ('Ã§Ã£o' antes de 'Ã§', 'Ã£o' antes de 'Ã')
+_PADRAO_MOJIBAKE = re.compile("|".join(
+    re.escape(errado) for errado in sorted(SUBSTITUICOES_MOJIBAKE, key=lambda k: (-len(k), k))
+))
+
+def _substituir_mojibake(match):
+    return SUBSTITUICOES_MOJIBAKE[match.group()]
+
 def corrigir_texto(texto):
-    substituicoes = {
-        'Ã©': 'é',
-        'Ã§Ã£o': 'ção',
-        'Ã³': 'ó',
-        'Ã': 'à',
-        'â€“': '–',
-        'â€”': '—',
-        'Ãº': 'ú',
-        'Ãª': 'ê',
-        'Ã£o': 'ão',
-        'â€œ': '"',
-        'â€': '"',
-        'Ã¡': 'á',
-        'Ã¢': 'â',
-        'Ã­': 'í',
-        'Ã´': 'ô',
-        'Ã§': 'ç',
-    }
-    for errado, correto in substituicoes.items():
-        texto = texto.replace(errado, correto)
-    return texto
+    """
+    Corrige as sequências de SUBSTITUICOES_MOJIBAKE numa única passada pelo
+    texto, sempre pela sequência mais longa em cada posição.
+    """
+    # Texto já normalizado (ASCII) não tem mojibake; isascii() é O(1) no CPython
+    if texto.isascii():
+        return texto
+    return _PADRAO_MOJIBAKE.sub(_substituir_mojibake, texto)
+
+def iterar_paginas_pypdf2(pdf_path, normalizar=True):
+    """
+    Gera o texto de cada página via PyPDF2, uma página por vez, já
+    normalizado (normalize_text + corrigir_texto) se `normalizar` for True.
+    Uma página que falha gera '' e é registrada no log, sem descartar as demais.
+    Erros ao abrir o PDF são propagados na primeira iteração.
+    """
+    reader = PdfReader(pdf_path)
+    for idx, page in enumerate(reader.pages, start=1):
+        try:
+            page_text = page.extract_text() or ''
+        except Exception as e:
+            logging.warning(f"PyPDF2 falhou na página {idx} de {pdf_path}: {e}")
+            page_text = ''
+        yield corrigir_texto(normalize_text(page_text)) if normalizar else page_text
 
 def extract_text_with_pypdf2(pdf_path):
     """
     Primeiro tenta extrair texto via PyPDF2, sem OCR.
-    Se der certo, retorna o texto.
+    Se der certo, retorna o texto, com as páginas separadas por '\\f'.
     Caso não encontre nada, retorna string vazia.
     """
     try:
-        reader = PdfReader(pdf_path)
-        text = ""
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text
-        
-        if text.strip():
-            text = corrigir_texto(normalize_text(text))
-            return text.strip()
-        else:
-            return ''
-    except:
+        text = "\f".join(iterar_paginas_pypdf2(pdf_path))
+    except Exception as e:
+        logging.error(f"PyPDF2 não conseguiu abrir {pdf_path}: {e}")
         return ''
+    return text if text.strip() else ''
+
+def ocr_com_confianca(image, lang='por', psm_mode=6, oem_mode=3):
+    """
+    Faz OCR com image_to_data e retorna (texto, confiança média das palavras,
+    de 0 a 100, ponderada pelo tamanho de cada palavra; 0 se nada foi lido).
+    O texto é remontado linha a linha na ordem de leitura do Tesseract.
+    """
+    dados = pytesseract.image_to_data(
+        image, config=f"--psm {psm_mode} --oem {oem_mode} -l {lang}", output_type=pytesseract.Output.DICT
+    )
+    linhas = {}
+    soma_confianca = caracteres = 0
+    for i, palavra in enumerate(dados["text"]):
+        palavra = palavra.strip()
+        if not palavra:
+            continue
+        linhas.setdefault((dados["block_num"][i], dados["par_num"][i], dados["line_num"][i]), []).append(palavra)
+        confianca = float(dados["conf"][i])
+        if confianca >= 0:
+            soma_confianca += confianca * len(palavra)
+            caracteres += len(palavra)
+    texto = "\n".join(" ".join(palavras) for palavras in linhas.values())
+    return texto, (soma_confianca / caracteres if caracteres else 0.0)
+
+def _palavra_rotulo(palavra):
+    palavra = normalize_text(palavra).lower().strip(":.;,()")
+    return palavra in _ROTULOS_ROI or "@" in palavra
+
+def regioes_interesse(image, dpi=300, lang='por', oem_mode=3):
+    """
+    Passada barata de detecção: OCR esparso (psm 11) da imagem reduzida a
+    OCR_DPI_DETECCAO, procurando os rótulos usados pelos regexes (Endereço,
+    CEP, CNPJ, e-mail...). Retorna (faixas, texto da detecção, confiança):
+    faixas horizontais (topo, base) na escala da imagem original, cada uma
+    cobrindo a linha de um rótulo e OCR_ROI_LINHAS_ABAIXO linhas abaixo,
+    já unidas quando se sobrepõem.
+    """
+    escala = min(1.0, OCR_DPI_DETECCAO / dpi)
+    reduzida = image if escala == 1.0 else image.resize(
+        (max(1, round(image.width * escala)), max(1, round(image.height * escala))), Image.BOX
+    )
+    dados = pytesseract.image_to_data(
+        reduzida, config=f"--psm 11 --oem {oem_mode} -l {lang}", output_type=pytesseract.Output.DICT
+    )
+
+    linhas = {}
+    for i, palavra in enumerate(dados["text"]):
+        if not palavra.strip():
+            continue
+        chave = (dados["block_num"][i], dados["par_num"][i], dados["line_num"][i])
+        linha = linhas.setdefault(chave, {"topo": dados["top"][i], "base": 0, "palavras": [], "confiancas": [], "rotulo": False})
+        linha["topo"] = min(linha["topo"], dados["top"][i])
+        linha["base"] = max(linha["base"], dados["top"][i] + dados["height"][i])
+        linha["palavras"].append(palavra.strip())
+        linha["confiancas"].append(float(dados["conf"][i]))
+        linha["rotulo"] = linha["rotulo"] or _palavra_rotulo(palavra)
+
+    faixas = []
+    for linha in linhas.values():
+        if not linha["rotulo"]:
+            continue
+        altura = max(1, linha["base"] - linha["topo"])
+        topo = max(0, round((linha["topo"] - altura / 2) / escala))
+        base = min(image.height, round((linha["base"] + altura * 1.5 * OCR_ROI_LINHAS_ABAIXO + altura / 2) / escala))
+        faixas.append((topo, base))
+
+    unidas = []
+    for topo, base in sorted(faixas):
+        if unidas and topo <= unidas[-1][1]:
+            unidas[-1] = (unidas[-1][0], max(unidas[-1][1], base))
+        else:
+            unidas.append((topo, base))
 
-def extract_text_with_context(image_path, file_origin, lang='por'):
+    texto = "\n".join(" ".join(linha["palavras"]) for linha in linhas.values())
+    confiancas = [c for linha in linhas.values() for c in linha["confiancas"] if c >= 0]
+    return unidas, texto, (sum(confiancas) / len(confiancas) if confiancas else 0.0)
+
+def ocr_regioes_interesse(image, dpi=300, lang='por', psm_mode=6, oem_mode=3, metricas=None):
+    """
+    OCR só das regiões com rótulos (regioes_interesse). As faixas são
+    empilhadas numa única imagem, com um espaço em branco entre elas, para
+    que o Tesseract seja chamado uma vez por página. Sem nenhum rótulo na
+    página, retorna o texto da passada de detecção.
+    Retorna (texto, confiança); `metricas` recebe a quantidade de regiões
+    e a fração da página coberta por elas.
+    """
+    faixas, texto_deteccao, confianca_deteccao = regioes_interesse(image, dpi=dpi, lang=lang, oem_mode=oem_mode)
+    altura_total = sum(base - topo for topo, base in faixas)
+    if metricas is not None:
+        metricas["regioes"] = len(faixas)
+        metricas["fracao_area"] = round(altura_total / image.height, 3) if image.height else 0.0
+    if not faixas:
+        return texto_deteccao, confianca_deteccao
+
+    espaco = max(1, round(dpi / 10))
+    recortes = Image.new(image.mode, (image.width, altura_total + espaco * (len(faixas) - 1)), 255)
+    y = 0
+    for topo, base in faixas:
+        recortes.paste(image.crop((0, topo, image.width, base)), (0, y))
+        y += base - topo + espaco
+    return ocr_com_confianca(recortes, lang=lang, psm_mode=psm_mode, oem_mode=oem_mode)
+
+def extract_text_with_context(image, file_origin, lang='por', psm_mode=6, oem_mode=3, metricas=None, roi=False, dpi=300):
     """
     Extrai texto de uma imagem com Tesseract e localiza endereços básicos via regex.
+    - Aceita uma imagem PIL já carregada ou o caminho de um arquivo.
     - Filtra endereços com menos de 15 caracteres (campo 'endereco').
     - Adiciona 'file_origin' em cada endereço apenas como referência/visão do usuário.
+    - Se `metricas` for um dict, recebe a confiança média do OCR em 'confianca'.
+    - Com `roi`, faz OCR só das regiões com rótulos (ocr_regioes_interesse);
+      `dpi` é a resolução da imagem.
     """
     try:
-        custom_config = f"--psm 6 --oem 3 -l {lang}"
-        image = Image.open(image_path)
-        text_page = pytesseract.image_to_string(image, config=custom_config)
+        if isinstance(image, str):
+            image = Image.open(image)
+        if metricas is None:
+            metricas = {}
+        if roi:
+            text_page, confianca = ocr_regioes_interesse(
+                image, dpi=dpi, lang=lang, psm_mode=psm_mode, oem_mode=oem_mode, metricas=metricas
+            )
+        else:
+            text_page, confianca = ocr_com_confianca(image, lang=lang, psm_mode=psm_mode, oem_mode=oem_mode)
+        metricas["confianca"] = confianca
 
         text_page = corrigir_texto(normalize_text(text_page))
 
-        # Regex simples para capturar Endereco, Cidade, Bairro, Estado e CEP
-        endereco_pattern = r"Endere[c|ç]o[:\s]+([\w\s.,/\-ºª]+)"
-        cidade_pattern   = r"Cidade[:\s]+([\w\s]+)"
-        bairro_pattern   = r"Bairro[:\s]+([\w\s]+)"
-        estado_pattern   = r"Estado[:\s]+([A-Z]{2})"
-        cep_pattern      = r"CEP[:\s]+([\d.\-]+)"
+        campos = extrair_campos(text_page)
+        enderecos_encontrados = enderecos_validos(campos["enderecos"], file_origin)  # source: apenas exibição em tela
 
-        enderecos_encontrados = []
+        return text_page, enderecos_encontrados
 
-        end_matches = re.findall(endereco_pattern, text_page, flags=re.IGNORECASE)
-        cid_matches = re.findall(cidade_pattern, text_page, flags=re.IGNORECASE)
-        bai_matches = re.findall(bairro_pattern, text_page, flags=re.IGNORECASE)
-        uf_matches  = re.findall(estado_pattern, text_page, flags=re.IGNORECASE)
-        cep_matches = re.findall(cep_pattern, text_page, flags=re.IGNORECASE)
+    except Exception as e:
+        logging.error(f"Erro ao processar a imagem de {file_origin}: {e}")
+        return "", []
 
-        max_len = max(len(end_matches), len(cid_matches), len(bai_matches), len(uf_matches), len(cep_matches))
+OCR_DPI = int(os.environ.get("SEI_OCR_DPI", "300"))
+OCR_JANELA_PAGINAS = int(os.environ.get("SEI_OCR_JANELA_PAGINAS", "2"))
+OCR_WORKERS = int(os.environ.get("SEI_OCR_WORKERS", str(os.cpu_count() or 1)))
+OCR_MAX_PAGINAS_SIMULTANEAS = int(os.environ.get("SEI_OCR_MAX_PAGINAS_SIMULTANEAS", str(2 * OCR_WORKERS)))
+OCR_PERFIL = os.environ.get("SEI_OCR_PERFIL", "fixo")
+OCR_PSM = int(os.environ.get("SEI_OCR_PSM", "6"))
+OCR_OEM = int(os.environ.get("SEI_OCR_OEM", "3"))
+# Modo multipassada: OCR barato em OCR_DPI_RAPIDO e, só nas páginas com confiança
+# abaixo de OCR_CONFIANCA_MINIMA, nova passada em OCR_DPI e depois com OCR_PSM_ALTERNATIVO
+OCR_MULTIPASSADA = os.environ.get("SEI_OCR_MULTIPASSADA", "0") == "1"
+OCR_DPI_RAPIDO = int(os.environ.get("SEI_OCR_DPI_RAPIDO", "200"))
+OCR_CONFIANCA_MINIMA = float(os.environ.get("SEI_OCR_CONFIANCA_MINIMA", "75"))
+OCR_PSM_ALTERNATIVO = int(os.environ.get("SEI_OCR_PSM_ALTERNATIVO", "4"))
+# Modo ROI: detecção barata dos rótulos em OCR_DPI_DETECCAO e OCR completo só das regiões encontradas
+OCR_ROI = os.environ.get("SEI_OCR_ROI", "0") == "1"
+OCR_DPI_DETECCAO = int(os.environ.get("SEI_OCR_DPI_DETECCAO", "150"))
+# Linhas abaixo de cada rótulo incluídas na região (valores que quebram de linha)
+OCR_ROI_LINHAS_ABAIXO = int(os.environ.get("SEI_OCR_ROI_LINHAS_ABAIXO", "2"))
+# Resolução entregue ao Tesseract; páginas rasterizadas acima dela são reduzidas antes da binarização
+OCR_DPI_TESSERACT = int(os.environ.get("SEI_OCR_DPI_TESSERACT", "300"))
 
-        for i in range(max_len):
-            endereco_val = end_matches[i] if i < len(end_matches) else "[Não informado]"
-            cidade_val   = cid_matches[i] if i < len(cid_matches) else "[Não informado]"
-            bairro_val   = bai_matches[i] if i < len(bai_matches) else "[Não informado]"
-            estado_val   = uf_matches[i]  if i < len(uf_matches)  else "[Não informado]"
-            cep_val      = cep_matches[i] if i < len(cep_matches) else "[Não informado]"
+###############################################################################
+# Pré-processamento das páginas (NumPy)
+###############################################################################
+PERFIS_PREPROCESSAMENTO = {
+    # Mesmo resultado da cadeia anterior em PIL: contraste 2x, limiar 128 e mediana 3x3
+    "fixo": {"limiar": "fixo", "contraste": 2.0, "valor_limiar": 128, "mediana": True, "deskew": False},
+    # Limiar global pelo histograma: digitalizações claras ou escuras demais, fundo uniforme
+    "otsu": {"limiar": "otsu", "mediana": True, "deskew": True},
+    # Limiar local (média e desvio na janela): sombras, carimbos e fundo irregular
+    "sauvola": {"limiar": "sauvola", "janela": 31, "k": 0.2, "mediana": True, "deskew": True},
+}
+
+def _limiar_fixo(cinza, contraste, valor_limiar):
+    # Contraste como em ImageEnhance.Contrast: m + c * (x - m), com m a média da imagem.
+    # m + c * (x - m) < limiar  <=>  x < m + (limiar - m) / c, sem gerar a imagem intermediária.
+    media = int(cinza.mean() + 0.5)
+    return cinza < media + (valor_limiar - media) / contraste
+
+def _limiar_otsu(cinza):
+    histograma = np.bincount(cinza.ravel(), minlength=256).astype(np.float64)
+    niveis = np.arange(256)
+    peso_fundo = np.cumsum(histograma)
+    peso_frente = peso_fundo[-1] - peso_fundo
+    soma = np.cumsum(histograma * niveis)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        media_fundo = soma / peso_fundo
+        media_frente = (soma[-1] - soma) / peso_frente
+        variancia_entre = peso_fundo * peso_frente * (media_fundo - media_frente) ** 2
+    limiar = int(np.nanargmax(variancia_entre))
+    return cinza <= limiar
+
+def _soma_janela(valores, janela):
+    """
+    Soma de cada janela quadrada centrada no pixel, via imagem integral.
+    """
+    raio = janela // 2
+    integral = np.pad(valores, raio, mode="edge").cumsum(axis=0).cumsum(axis=1)
+    integral = np.pad(integral, ((1, 0), (1, 0)))
+    altura, largura = valores.shape
+    return (
+        integral[janela:janela + altura, janela:janela + largura]
+        - integral[:altura, janela:janela + largura]
+        - integral[janela:janela + altura, :largura]
+        + integral[:altura, :largura]
+    )
 
-            # Excluir endereços com menos de 15 caracteres
-            if len(endereco_val.strip()) < 15:
-                continue
+def _limiar_sauvola(cinza, janela, k, faixa=128.0, reducao=4):
+    # Média e desvio locais variam devagar: são calculados em blocos de
+    # reducao x reducao pixels e o limiar resultante é expandido de volta.
+    altura, largura = cinza.shape
+    borda = np.pad(cinza, ((0, -altura % reducao), (0, -largura % reducao)), mode="edge")
+    blocos = borda.reshape(borda.shape[0] // reducao, reducao, borda.shape[1] // reducao, reducao)
+    area_bloco = float(reducao * reducao)
+    soma = blocos.sum(axis=(1, 3), dtype=np.uint32) / area_bloco
+    soma_quadrados = (blocos.astype(np.uint16) ** 2).sum(axis=(1, 3), dtype=np.uint32) / area_bloco
+
+    janela = max(1, janela // reducao) | 1
+    area = float(janela * janela)
+    media = _soma_janela(soma, janela) / area
+    variancia = _soma_janela(soma_quadrados, janela) / area - media * media
+    desvio = np.sqrt(np.maximum(variancia, 0.0))
+    limiar = media * (1.0 + k * (desvio / faixa - 1.0))
+    limiar = np.repeat(np.repeat(limiar, reducao, axis=0), reducao, axis=1)[:altura, :largura]
+    return cinza < limiar
+
+def _mediana_binaria(escuros):
+    # Em imagem binária a mediana 3x3 é a maioria: ao menos 5 dos 9 vizinhos escuros
+    altura, largura = escuros.shape
+    borda = np.pad(escuros, 1, mode="edge").astype(np.uint8)
+    vizinhos = sum(
+        borda[dy:dy + altura, dx:dx + largura]
+        for dy in range(3) for dx in range(3)
+    )
+    return vizinhos >= 5
 
-            enderecos_encontrados.append({
-                "endereco": endereco_val,
-                "cidade": cidade_val,
-                "bairro": bairro_val,
-                "estado": estado_val,
-                "cep": cep_val,
-                "source": file_origin  # apenas exibição em tela
-            })
+def _angulo_inclinacao(escuros, max_graus=5.0, passo=0.25, max_pontos=20000):
+    """
+    Estima a inclinação (graus) pelo perfil de projeção: o ângulo em que os
+    pixels escuros mais se concentram em poucas linhas horizontais.
+    """
+    ys, xs = np.nonzero(escuros)
+    if len(ys) < 100:
+        return 0.0
+    salto = max(1, len(ys) // max_pontos)
+    ys = ys[::salto].astype(np.float64)
+    xs = xs[::salto].astype(np.float64)
+
+    angulos = np.arange(-max_graus, max_graus + passo / 2, passo)
+    radianos = np.deg2rad(angulos)[:, None]
+    linhas = np.rint(ys * np.cos(radianos) - xs * np.sin(radianos)).astype(np.int64)
+    linhas -= linhas.min(axis=1, keepdims=True)
+
+    # Um único bincount para todos os ângulos: cada ângulo ocupa sua faixa de índices
+    total_linhas = int(linhas.max()) + 1
+    deslocamentos = np.arange(len(angulos))[:, None] * total_linhas
+    histogramas = np.bincount((linhas + deslocamentos).ravel(), minlength=len(angulos) * total_linhas)
+    pontuacoes = np.square(histogramas.reshape(len(angulos), total_linhas).astype(np.float64)).sum(axis=1)
+    return float(angulos[int(np.argmax(pontuacoes))])
+
+def preprocessar_pagina(imagem, perfil=OCR_PERFIL, dpi=OCR_DPI, dpi_alvo=OCR_DPI_TESSERACT):
+    """
+    Converte a página em tons de cinza, reduz para `dpi_alvo` se ela foi
+    rasterizada acima disso e binariza conforme o perfil de
+    PERFIS_PREPROCESSAMENTO ('fixo', 'otsu' ou 'sauvola'), com mediana 3x3
+    e correção de inclinação opcionais.
+    Retorna uma imagem 'L' com texto preto (0) sobre fundo branco (255).
+    """
+    config = PERFIS_PREPROCESSAMENTO[perfil]
+    cinza = imagem.convert("L")
+    if dpi > dpi_alvo:
+        escala = dpi_alvo / dpi
+        cinza = cinza.resize((max(1, round(cinza.width * escala)), max(1, round(cinza.height * escala))), Image.BOX)
+    cinza = np.asarray(cinza)
+
+    if config["limiar"] == "otsu":
+        escuros = _limiar_otsu(cinza)
+    elif config["limiar"] == "sauvola":
+        escuros = _limiar_sauvola(cinza, config["janela"], config["k"])
+    else:
+        escuros = _limiar_fixo(cinza, config["contraste"], config["valor_limiar"])
 
-        return text_page, enderecos_encontrados
+    if config["mediana"]:
+        escuros = _mediana_binaria(escuros)
 
-    except Exception as e:
-        logging.error(f"Erro ao processar a imagem {image_path}: {e}")
-        return "", []
+    binaria = Image.fromarray(np.where(escuros, 0, 255).astype(np.uint8))
+    if config["deskew"]:
+        angulo = _angulo_inclinacao(escuros)
+        if angulo:
+            binaria = binaria.rotate(angulo, resample=Image.NEAREST, fillcolor=255)
+    return binaria
 
-def ocr_extract(pdf_path, psm_mode=6, oem_mode=3):
+def _janelas_paginas(paginas, janela):
     """
-    Extrai texto via OCR de cada página do PDF (convertida em imagem).
-    Retorna todo o texto concatenado e também uma lista de endereços
-    encontrados por regex, com respectivo 'source'.
+    Agrupa números de página em intervalos (inicio, fim) consecutivos de até `janela` páginas.
     """
-    text_total = ""
-    enderecos_totais = []
+    inicio = fim = None
+    for numero in sorted(paginas):
+        if inicio is not None and numero == fim + 1 and numero - inicio < janela:
+            fim = numero
+            continue
+        if inicio is not None:
+            yield inicio, fim
+        inicio = fim = numero
+    if inicio is not None:
+        yield inicio, fim
+
+def rasterizar_paginas(pdf_path, dpi=OCR_DPI, janela=OCR_JANELA_PAGINAS, paginas=None):
+    """
+    Gera (número da página, imagem) rasterizando poucas páginas por vez,
+    para que o uso de memória não cresça com o tamanho do PDF.
+    Se `paginas` for informado, rasteriza apenas essas páginas (numeradas a partir de 1).
+    """
+    if paginas is None:
+        paginas = range(1, pdfinfo_from_path(pdf_path)["Pages"] + 1)
+    for inicio, fim in _janelas_paginas(paginas, janela):
+        imagens = convert_from_path(pdf_path, dpi=dpi, fmt='jpeg', first_page=inicio, last_page=fim)
+        for deslocamento, imagem in enumerate(imagens):
+            yield inicio + deslocamento, imagem
+
+def _ocr_pagina(idx, page, pdf_name, perfil=OCR_PERFIL, dpi=OCR_DPI, psm_mode=OCR_PSM, oem_mode=OCR_OEM, roi=OCR_ROI):
+    """
+    Pré-processa (preprocessar_pagina) e faz OCR de uma página rasterizada
+    a `dpi` (só das regiões com rótulos, se `roi`). Roda nos processos do
+    pool de OCR. A imagem binarizada vai direto para o Tesseract, sem passar
+    por um JPEG no diretório de trabalho.
+    Retorna também o tempo (s) de cada etapa e as métricas do OCR
+    (confiança média; no modo ROI, regiões e fração da página).
+    """
+    tempos = {}
+    with medir_tempo(tempos, "preprocessamento"):
+        threshold = preprocessar_pagina(page, perfil=perfil, dpi=dpi)
+
+    metricas = {}
+    with medir_tempo(tempos, "ocr"):
+        file_origin = f"{pdf_name} - Página {idx}"
+        text_page, enderecos_page = extract_text_with_context(
+            threshold, file_origin, lang='por', psm_mode=psm_mode, oem_mode=oem_mode, metricas=metricas,
+            roi=roi, dpi=min(dpi, OCR_DPI_TESSERACT)
+        )
+    metricas.setdefault("confianca", 0.0)
 
-    try:
-        pages = convert_from_path(pdf_path, dpi=300, fmt='jpeg')
+    return idx, text_page, enderecos_page, tempos, metricas
+
+def _ocr_pagina_serializavel():
+    # Sob `streamlit run` este arquivo roda como __main__, e funções de __main__
+    # não são encontradas pelos processos filhos; importa-se o módulo pelo nome.
+    if __name__ == "__main__":
+        modulo = importlib.import_module(os.path.splitext(os.path.basename(__file__))[0])
+        return modulo._ocr_pagina
+    return _ocr_pagina
 
-        for idx, page in enumerate(pages, start=1):
-            gray = page.convert('L')
-            enhancer = ImageEnhance.Contrast(gray)
-            gray = enhancer.enhance(2.0)
-            threshold = gray.point(lambda x: 0 if x < 128 else 255, '1')
-            threshold = threshold.filter(ImageFilter.MedianFilter())
+@st.cache_resource
+def obter_pool_ocr(workers):
+    executor = ProcessPoolExecutor(max_workers=workers)
+    atexit.register(executor.shutdown, wait=False, cancel_futures=True)
+    return executor
 
-            temp_filename = f"temp_page_{idx}.jpg"
-            threshold.save(temp_filename, "JPEG")
+def _ocr_paralelo(paginas, pdf_name, workers, max_paginas_simultaneas, opcoes):
+    """
+    Distribui as páginas no pool de processos, com no máximo
+    max_paginas_simultaneas páginas em processamento ao mesmo tempo.
+    Como `paginas` é consumido sob demanda, só essas páginas ficam em memória.
+    `opcoes` são repassadas a _ocr_pagina (perfil, dpi, psm_mode, oem_mode, roi).
+    """
+    funcao = _ocr_pagina_serializavel()
+    executor = obter_pool_ocr(workers)
+    pendentes = set()
+    for idx, page in paginas:
+        if len(pendentes) >= max_paginas_simultaneas:
+            concluidos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+            for future in concluidos:
+                yield future.result()
+        pendentes.add(executor.submit(funcao, idx, page, pdf_name, **opcoes))
+    for future in as_completed(pendentes):
+        yield future.result()
+
+def _passada_ocr(pdf_path, paginas, opcoes, workers, max_paginas_simultaneas, tempos):
+    """
+    Rasteriza as páginas em opcoes['dpi'] e faz o OCR delas, em paralelo ou,
+    se o pool falhar, em série. Retorna {página: (texto, endereços, métricas)}.
+    """
+    pdf_name = os.path.basename(pdf_path)
+    resultados = {}
+    em_serie = workers <= 1
+    if not em_serie:
+        try:
+            imagens = rasterizar_paginas(pdf_path, dpi=opcoes["dpi"], paginas=paginas)
+            for idx, text_page, enderecos_page, tempos_pagina, metricas in _ocr_paralelo(imagens, pdf_name, workers, max_paginas_simultaneas, opcoes):
+                resultados[idx] = (text_page, enderecos_page, metricas)
+                _somar_tempos(tempos, tempos_pagina)
+        except BrokenProcessPool as e:
+            # Um processo do pool morreu: descarta o pool e termina em série
+            logging.error(f"Pool de OCR interrompido, seguindo em série: {e}")
+            obter_pool_ocr.clear()
+            em_serie = True
+
+    if em_serie:
+        for idx, page in rasterizar_paginas(pdf_path, dpi=opcoes["dpi"], paginas=paginas):
+            if idx not in resultados:
+                _, text_page, enderecos_page, tempos_pagina, metricas = _ocr_pagina(idx, page, pdf_name, **opcoes)
+                resultados[idx] = (text_page, enderecos_page, metricas)
+                _somar_tempos(tempos, tempos_pagina)
+    return resultados
+
+def passadas_ocr(psm_mode=OCR_PSM, multipassada=OCR_MULTIPASSADA):
+    """
+    Lista de (dpi, psm) de cada passada de OCR. Sem multipassada, uma só em OCR_DPI.
+    """
+    if not multipassada:
+        return [(OCR_DPI, psm_mode)]
+    passadas = [(OCR_DPI_RAPIDO, psm_mode), (OCR_DPI, psm_mode)]
+    if OCR_PSM_ALTERNATIVO != psm_mode:
+        passadas.append((OCR_DPI, OCR_PSM_ALTERNATIVO))
+    return passadas
+
+def ocr_paginas(pdf_path, paginas=None, workers=None, max_paginas_simultaneas=None, tempos=None, perfil=None,
+                psm_mode=None, oem_mode=None, multipassada=None, estatisticas=None, roi=None):
+    """
+    Faz OCR das páginas indicadas (todas, se `paginas` for None).
+    Retorna {número da página: (texto, endereços)}.
+
+    As páginas são rasterizadas sob demanda (rasterizar_paginas) e processadas
+    em paralelo num pool de processos (workers, padrão SEI_OCR_WORKERS).
+    Se `tempos` for informado, acumula nele o tempo de pré-processamento e
+    de OCR somado de todas as páginas. `perfil` escolhe o pré-processamento
+    (PERFIS_PREPROCESSAMENTO; padrão SEI_OCR_PERFIL).
+
+    Em modo multipassada (padrão SEI_OCR_MULTIPASSADA), a primeira passada é
+    feita em OCR_DPI_RAPIDO e só as páginas com confiança abaixo de
+    OCR_CONFIANCA_MINIMA são refeitas nas passadas seguintes (passadas_ocr);
+    cada página fica com o resultado de maior confiança. Se `estatisticas`
+    for um dict, recebe as passadas feitas, quantas páginas cada uma
+    processou e a confiança, DPI e PSM finais de cada página ('por_pagina').
+
+    Com `roi` (padrão SEI_OCR_ROI), cada página passa antes por uma detecção
+    barata dos rótulos e só as regiões encontradas recebem OCR completo
+    (ocr_regioes_interesse); 'por_pagina' traz também as regiões e a
+    fração da página lida.
+    """
+    workers = workers or OCR_WORKERS
+    perfil = perfil or OCR_PERFIL
+    psm_mode = psm_mode or OCR_PSM
+    oem_mode = OCR_OEM if oem_mode is None else oem_mode
+    multipassada = OCR_MULTIPASSADA if multipassada is None else multipassada
+    roi = OCR_ROI if roi is None else roi
+    max_paginas_simultaneas = max_paginas_simultaneas or OCR_MAX_PAGINAS_SIMULTANEAS
+    estatisticas = {} if estatisticas is None else estatisticas
+    estatisticas.update({"multipassada": multipassada, "roi": roi, "passadas": [], "por_pagina": {}})
+    melhores = {}
+
+    try:
+        pendentes = paginas
+        for numero, (dpi, psm) in enumerate(passadas_ocr(psm_mode, multipassada)):
+            if numero > 0:
+                pendentes = sorted(
+                    idx for idx, (_, _, metricas) in melhores.items() if metricas["confianca"] < OCR_CONFIANCA_MINIMA
+                )
+                if not pendentes:
+                    break
+            opcoes = {"perfil": perfil, "dpi": dpi, "psm_mode": psm, "oem_mode": oem_mode, "roi": roi}
+            resultados = _passada_ocr(pdf_path, pendentes, opcoes, workers, max_paginas_simultaneas, tempos)
+            estatisticas["passadas"].append({"dpi": dpi, "psm": psm, "paginas": len(resultados)})
+            for idx, resultado in resultados.items():
+                metricas = resultado[2]
+                if idx not in melhores or metricas["confianca"] > melhores[idx][2]["confianca"]:
+                    melhores[idx] = resultado
+                    estatisticas["por_pagina"][idx] = {
+                        **metricas, "confianca": round(metricas["confianca"], 1), "dpi": dpi, "psm": psm, "passada": numero,
+                    }
+
+    except Exception as e:
+        # Mantém as páginas já lidas; o erro fica no log e nas estatísticas
+        logging.error(f"Erro durante o OCR: {e}")
+        estatisticas["erro"] = str(e)
+
+    estatisticas["paginas"] = len(melhores)
+    # Toda página abaixo da confiança mínima passa pela segunda passada (a cara)
+    passadas_feitas = estatisticas["passadas"]
+    estatisticas["paginas_reprocessadas"] = passadas_feitas[1]["paginas"] if len(passadas_feitas) > 1 else 0
+    return {idx: (texto, enderecos) for idx, (texto, enderecos, _) in melhores.items()}
+
+def ocr_extract(pdf_path, psm_mode=6, oem_mode=3, workers=None, max_paginas_simultaneas=None, tempos=None,
+                multipassada=None, estatisticas=None, roi=None):
+    """
+    Extrai texto via OCR de cada página do PDF (convertida em imagem).
+    Retorna todo o texto, com as páginas separadas por '\\f', e também uma lista
+    de endereços encontrados por regex, com respectivo 'source'. A ordem das
+    páginas é preservada. `multipassada`, `roi` e `estatisticas`: ver ocr_paginas.
+    """
+    resultados = ocr_paginas(
+        pdf_path, workers=workers, max_paginas_simultaneas=max_paginas_simultaneas, tempos=tempos,
+        psm_mode=psm_mode, oem_mode=oem_mode, multipassada=multipassada, estatisticas=estatisticas, roi=roi
+    )
 
-            file_origin = f"{os.path.basename(pdf_path)} - Página {idx}"
-            text_page, enderecos_page = extract_text_with_context(temp_filename, file_origin, lang='por')
+    paginas = []
+    enderecos_totais = []
+    for idx in sorted(resultados):
+        text_page, enderecos_page = resultados[idx]
+        paginas.append(text_page)
+        enderecos_totais.extend(enderecos_page)
 
-            text_total += text_page + "\n"
-            enderecos_totais.extend(enderecos_page)
+    # Cada página já foi normalizada em extract_text_with_context
+    return "\f".join(paginas), enderecos_totais
 
-            if os.path.exists(temp_filename):
-                os.remove(temp_filename)
+OCR_MIN_CARACTERES_PAGINA = int(os.environ.get("SEI_OCR_MIN_CARACTERES_PAGINA", "50"))
 
+def textos_paginas_pypdf2(pdf_path):
+    """
+    Extrai a camada de texto de cada página via PyPDF2 (iterar_paginas_pypdf2).
+    Retorna uma lista com o texto normalizado de cada página ('' quando a
+    página não tem texto ou falha), ou None se o PDF não puder ser lido.
+    """
+    try:
+        return list(iterar_paginas_pypdf2(pdf_path))
     except Exception as e:
-        st.error(f"Erro durante o OCR: {e}")
+        logging.error(f"PyPDF2 não conseguiu abrir {pdf_path}: {e}")
+        return None
+
+@rastrear("extract_text_with_best_ocr")
+def extract_text_with_best_ocr(pdf_path, tempos=None, proveniencia=None):
+    """
+    Decide página a página: usa a camada de texto (PyPDF2) quando ela tem ao
+    menos OCR_MIN_CARACTERES_PAGINA caracteres e faz OCR só das demais
+    (ex.: AR digitalizado no meio de um processo nativo).
+    Retorna o texto final, com as páginas separadas por '\\f', e a lista de
+    endereços extraídos (com .source). Cada página já vem normalizada da
+    sua origem, então o texto não é normalizado de novo como um todo.
+    Se `proveniencia` for uma lista, recebe um registro por página com o
+    método usado ('texto' ou 'ocr') e a quantidade de caracteres obtida; nas
+    páginas de OCR, também a confiança, o DPI e a passada (ocr_paginas).
+    """
+    with medir_tempo(tempos, "texto_pdf"):
+        textos = textos_paginas_pypdf2(pdf_path)
+
+    estatisticas_ocr = {}
+    if textos is None:
+        # PDF ilegível para o PyPDF2: OCR em todas as páginas
+        resultados_ocr = ocr_paginas(pdf_path, tempos=tempos, estatisticas=estatisticas_ocr)
+        textos = [''] * (max(resultados_ocr) if resultados_ocr else 0)
+    else:
+        paginas_sem_texto = [
+            idx for idx, texto in enumerate(textos, start=1)
+            if len(texto.strip()) < OCR_MIN_CARACTERES_PAGINA
+        ]
+        resultados_ocr = (
+            ocr_paginas(pdf_path, paginas=paginas_sem_texto, tempos=tempos, estatisticas=estatisticas_ocr)
+            if paginas_sem_texto else {}
+        )
 
-    text_total = corrigir_texto(normalize_text(text_total))
-    return text_total, enderecos_totais
+    partes = []
+    enderecos_ocr = []
+    for idx, texto in enumerate(textos, start=1):
+        metodo = 'texto'
+        if idx in resultados_ocr and resultados_ocr[idx][0].strip():
+            texto, enderecos_pagina = resultados_ocr[idx]
+            enderecos_ocr.extend(enderecos_pagina)
+            metodo = 'ocr'
+        partes.append(texto)
+        if proveniencia is not None:
+            registro = {"pagina": idx, "metodo": metodo, "caracteres": len(texto.strip())}
+            if metodo == 'ocr':
+                registro.update(estatisticas_ocr["por_pagina"].get(idx, {}))
+            proveniencia.append(registro)
+
+    anotar_span(
+        bytes=os.path.getsize(pdf_path),
+        paginas=len(textos),
+        paginas_ocr=sum(1 for idx in resultados_ocr if resultados_ocr[idx][0].strip()),
+        paginas_reprocessadas=estatisticas_ocr.get("paginas_reprocessadas", 0),
+    )
+
+    # As quebras de página delimitam os blocos AR/AIS em extract_addresses_with_source
+    text_final = "\f".join(partes)
+    if not text_final.strip():
+        return "", []
+    return text_final, enderecos_ocr
 
-def extract_text_with_best_ocr(pdf_path):
+###############################################################################
+# Modelo spaCy (carregado uma vez por processo e compartilhado)
+###############################################################################
+SPACY_MODELO = "pt_core_news_sm"
+# extract_information_spacy só usa as entidades nomeadas (ner)
+SPACY_COMPONENTES_EXCLUIDOS = ["parser", "lemmatizer", "morphologizer", "attribute_ruler", "tagger", "senter"]
+# Textos longos são divididos em blocos bem abaixo do nlp.max_length
+NLP_TAMANHO_BLOCO = int(os.environ.get("SEI_NLP_TAMANHO_BLOCO", "100000"))
+NLP_BATCH_SIZE = int(os.environ.get("SEI_NLP_BATCH_SIZE", "8"))
+
+class ProvedorNLP:
     """
-    Tenta extrair texto sem OCR (PyPDF2).
-    Se não conseguir, faz OCR em cada página.
-    Retorna o texto final e a lista de endereços extraídos (com .source).
+    Mantém o pipeline spaCy carregado e mede o custo de carga e a latência por documento.
     """
-    extracted_text = extract_text_with_pypdf2(pdf_path)
-    if extracted_text.strip():
-        # Se extraiu com PyPDF2, não faz OCR
-        return extracted_text, []
-    
-    # Caso contrário, faz OCR
-    text_ocr, enderecos_ocr = ocr_extract(pdf_path, psm_mode=6, oem_mode=3)
-    if len(text_ocr) > 0:
-        return text_ocr, enderecos_ocr
 
-    return "", []
+    def __init__(self, modelo=SPACY_MODELO, excluidos=SPACY_COMPONENTES_EXCLUIDOS):
+        inicio = time.perf_counter()
+        try:
+            self.nlp = spacy.load(modelo, exclude=excluidos)
+        except OSError:
+            raise OSError(
+                f"Modelo spaCy '{modelo}' não encontrado. Instale-o com: python -m spacy download {modelo}"
+            )
+        self.tempo_carga = time.perf_counter() - inicio
+        self.documentos = 0
+        self.tempo_processamento = 0.0
+        self._lock = threading.Lock()
+        logging.info(f"Modelo spaCy '{modelo}' carregado em {self.tempo_carga:.2f}s: {self.nlp.pipe_names}")
+
+    def processar_blocos(self, blocos, batch_size=NLP_BATCH_SIZE):
+        """
+        Processa vários blocos de texto com nlp.pipe; conta como um documento.
+        """
+        inicio = time.perf_counter()
+        docs = list(self.nlp.pipe(blocos, batch_size=batch_size))
+        with self._lock:
+            self.documentos += 1
+            self.tempo_processamento += time.perf_counter() - inicio
+        return docs
+
+    def metricas(self):
+        with self._lock:
+            media = self.tempo_processamento / self.documentos if self.documentos else 0.0
+            return {
+                "carga_s": self.tempo_carga,
+                "documentos": self.documentos,
+                "latencia_media_s": media,
+            }
+
+@st.cache_resource
+def obter_nlp():
+    return ProvedorNLP()
+
+def dividir_em_blocos(text, tamanho_maximo=NLP_TAMANHO_BLOCO):
+    """
+    Divide o texto nas quebras de página (\\f) e, se preciso, em blocos de até
+    tamanho_maximo caracteres, cortando em espaços para não partir palavras.
+    """
+    blocos = []
+    for pagina in text.split("\f"):
+        while len(pagina) > tamanho_maximo:
+            corte = pagina.rfind(" ", 0, tamanho_maximo)
+            if corte <= 0:
+                corte = tamanho_maximo
+            blocos.append(pagina[:corte])
+            pagina = pagina[corte:]
+        if pagina.strip():
+            blocos.append(pagina)
+    return blocos
+
+def analisar_documento(text):
+    """
+    Executa o pipeline spaCy uma única vez sobre o documento, em blocos.
+    O resultado deve ser repassado a todos os extratores que usam entidades.
+    """
+    return obter_nlp().processar_blocos(dividir_em_blocos(text))
 
 ###############################################################################
 # Formatação e extração de dados
@@ -410,11 +1947,267 @@ def extract_process_number(file_name):
         return base_name
     return f"{digits[:5]}.{digits[5:11]}/{digits[11:15]}-{digits[14:]}"
 
-def extract_information_spacy(text):
+###############################################################################
+# CPF/CNPJ sem depender de rótulo
+###############################################################################
+# CNPJ (14 dígitos) ou CPF (11), com ou sem a pontuação usual. Os lookarounds
+# descartam trechos de números maiores (ex.: número do processo, telefones).
+# O padrão começa pelo primeiro dígito (e só depois olha para trás) para o
+# motor de regex saltar direto entre os dígitos do texto; os grupos nomeados
+# só indicam o tipo, o número é o match inteiro.
+_PADRAO_CANDIDATO_ID = re.compile(
+    r"\d(?<!\d\d)(?<!\d[./-]\d)"
+    r"(?:(?P<cnpj>\d\.?\d{3}\.?\d{3}/?\d{4}-?\d{2})|(?P<cpf>\d{2}\.?\d{3}\.?\d{3}-?\d{2}))"
+    r"(?![./-]?\d)",
+    re.ASCII
+)
+_PONTUACAO_ID = str.maketrans("", "", "./-")
+# "CNPJ", "C.N.P.J", "CPF/MF", "inscrito no CNPJ sob o nº", "inscrição"...
+# Como em _PADRAO_ORIGEM, começar pela letra (e não por \b) deixa o motor de
+# regex saltar direto para os "c"/"i" do texto.
+_PADRAO_ROTULO_ID = re.compile(
+    r"[CcIi](?<!\w[CcIi])(?:\.?\s?N\.?\s?P\.?\s?J|\.?\s?P\.?\s?F|nscrit[oa]s?|nscri[cç][aã]o)",
+    re.IGNORECASE
+)
+_PADRAO_PALAVRA_AUTUADO = re.compile(r"[AaIi](?<!\w[AaIi])(?:utuad[oa]|nteressad[oa])\b", re.IGNORECASE)
+JANELA_ROTULO_ID = 60      # caracteres entre o rótulo e o número
+JANELA_AUTUADO_ID = 300    # caracteres entre o autuado e o número
+
+def _ocorrencias(texto, trecho, inicio, fim):
+    posicao = texto.find(trecho, inicio, fim)
+    while posicao != -1:
+        yield posicao, posicao + len(trecho)
+        posicao = texto.find(trecho, posicao + 1, fim)
+
+def _proximidade(texto, inicio, fim, janela, padrao, trecho=None):
+    """
+    1 se o padrão (ou o trecho literal) encosta em [inicio, fim), caindo até
+    0 a `janela` caracteres de distância. Só procura dentro da janela.
+    """
+    de, ate = max(0, inicio - janela), fim + janela
+    ocorrencias = [match.span() for match in padrao.finditer(texto, de, ate)]
+    if trecho:
+        ocorrencias.extend(_ocorrencias(texto, trecho, de, ate))
+    if not ocorrencias:
+        return 0.0
+    menor = min(max(inicio - f, i - fim, 0) for i, f in ocorrencias)
+    return max(0.0, 1.0 - menor / janela)
+
+def minerar_identificadores(texto, nome_autuado=None):
+    """
+    Procura todos os CPFs/CNPJs do texto, com ou sem rótulo: toda sequência
+    de 11 ou 14 dígitos (com ou sem pontuação) é candidata, e os dígitos
+    verificadores de todas são conferidos em lote (validar_cpfs/validar_cnpjs).
+
+    Cada ocorrência válida pontua pela proximidade de um rótulo (CNPJ,
+    C.N.P.J, CPF, inscrito...) e do autuado (nome_autuado, como escrito no
+    texto, ou as palavras "autuado"/"interessado"), de 0 a 1 cada. Retorna
+    uma lista de dicionários, um por número, do mais para o menos provável:
+    tipo ('cnpj' ou 'cpf'), valor formatado, pontuacao (a da melhor
+    ocorrência) e posicoes ([início, fim] de cada ocorrência no texto).
+    """
+    candidatos = {"cnpj": [], "cpf": []}
+    for match in _PADRAO_CANDIDATO_ID.finditer(texto):
+        candidatos[match.lastgroup].append((match.group(0).translate(_PONTUACAO_ID), match.start(), match.end()))
+    if not candidatos["cnpj"] and not candidatos["cpf"]:
+        return []
+    nome_autuado = nome_autuado.strip() if nome_autuado else None
+
+    encontrados = {}
+    for tipo, validar, formatar in (("cnpj", validar_cnpjs, format_cnpj), ("cpf", validar_cpfs, format_cpf)):
+        validos = validar([digitos for digitos, _, _ in candidatos[tipo]])
+        for (digitos, inicio, fim), valido in zip(candidatos[tipo], validos):
+            if not valido:
+                continue
+            pontuacao = (
+                _proximidade(texto, inicio, fim, JANELA_ROTULO_ID, _PADRAO_ROTULO_ID)
+                + _proximidade(texto, inicio, fim, JANELA_AUTUADO_ID, _PADRAO_PALAVRA_AUTUADO, nome_autuado)
+            )
+            registro = encontrados.setdefault(
+                (tipo, digitos),
+                {"tipo": tipo, "valor": formatar(digitos), "pontuacao": 0.0, "posicoes": []}
+            )
+            registro["pontuacao"] = max(registro["pontuacao"], round(pontuacao, 3))
+            registro["posicoes"].append([inicio, fim])
+
+    return sorted(encontrados.values(), key=lambda r: (-r["pontuacao"], r["posicoes"][0][0]))
+
+###############################################################################
+# Extração de campos por regex (padrão pré-compilado, passagem única)
+###############################################################################
+NAO_INFORMADO = "[Não informado]"
+CAMPOS_ENDERECO = ("endereco", "cidade", "bairro", "estado", "cep")
+
+# Dois tipos de ramo, ambos fáceis de achar para o motor de regex, que salta
+# direto para os caracteres com que começam em vez de testar cada
+# alternativa em cada posição do texto:
+# - pelo ":" que segue o rótulo, em qualquer grafia ("endereço:", "CEP :");
+# - sem os dois-pontos (o OCR muitas vezes os perde), pelo próprio rótulo,
+#   só como escrito ou em maiúsculas ("Endereço", "ENDEREÇO"), que começam
+#   por letras maiúsculas, raras no texto; assim "o endereço informado" de
+#   um parágrafo não é tomado por rótulo.
+# Os e-mails usam um padrão à parte, ancorado no "@", pelo mesmo motivo.
+# CPF/CNPJ ficam com minerar_identificadores, que não depende de rótulo.
+_ROTULOS_POR_CAMPO = {
+    "endereco": ["Endereço", "Endereco", "End", "End."],
+    "cidade": ["Cidade"],
+    "bairro": ["Bairro"],
+    "estado": ["Estado"],
+    "cep": ["CEP"],
+    "socio": ["Sócio", "Socio", "Advogado", "Responsável", "Responsavel", "Representante Legal"],
+}
+# Rótulos sem campo aqui, mas que encerram o valor do campo anterior
+_OUTROS_ROTULOS = ["CNPJ", "CPF", "E-mail", "Email"]
+# Sem os dois-pontos, "Responsável técnico..." seria tomado por rótulo
+_CAMPOS_COM_DOIS_PONTOS = ("socio",)
+UFS = (
+    "AC", "AL", "AP", "AM", "BA", "CE", "DF", "ES", "GO", "MA", "MT", "MS", "MG", "PA",
+    "PB", "PR", "PE", "PI", "RJ", "RN", "RS", "RO", "RR", "SC", "SP", "SE", "TO",
+)
+_TODOS_ROTULOS = "|".join(
+    re.escape(rotulo)
+    for rotulo in sorted({r for rs in _ROTULOS_POR_CAMPO.values() for r in rs} | set(_OUTROS_ROTULOS), key=len, reverse=True)
+)
+# Campos de texto livre terminam antes do próximo rótulo (ex.: "Centro Estado:"),
+# seja ele seguido de dois-pontos, seja no início de uma linha
+_FIM_TEXTO_LIVRE = rf"(?!\s+(?:{_TODOS_ROTULOS})\s*:|\s*\n[ \t]*(?:{_TODOS_ROTULOS})\b)"
+_VALORES_POR_CAMPO = {
+    "endereco": rf"(?:{_FIM_TEXTO_LIVRE}[\w\s.,/\-ºª])+",
+    "cidade": rf"(?:{_FIM_TEXTO_LIVRE}[\w\s])+",
+    "bairro": rf"(?:{_FIM_TEXTO_LIVRE}[\w\s])+",
+    "estado": rf"(?:{'|'.join(UFS)})\b",
+    "cep": r"\d{2}\.?\d{3}-?\d{3}\b",
+    "socio": rf"(?:{_FIM_TEXTO_LIVRE}[\w\s])+",
+}
+_CAMPOS_TEXTO_LIVRE = ("endereco", "cidade", "bairro", "socio")
+# Nome de cada grupo do padrão -> campo (um grupo por grafia sem dois-pontos)
+_CAMPO_DO_GRUPO = {}
+
+def _grupo_campo(campo, grupo):
+    _CAMPO_DO_GRUPO[grupo] = campo
+    return rf"(?i:(?P<{grupo}>{_VALORES_POR_CAMPO[campo]}))"
+
+def _ramo_dois_pontos(campo):
+    # Lookbehind exige largura fixa: um lookbehind por grafia do rótulo
+    rotulos = "|".join(
+        f"(?<=\\b{re.escape(rotulo)}{espaco}:)"
+        for rotulo in _ROTULOS_POR_CAMPO[campo]
+        for espaco in ("", " ")
+    )
+    return rf"(?i:{rotulos})\s*" + _grupo_campo(campo, campo)
+
+def _ramos_sem_dois_pontos(campo):
+    # Começar pelo rótulo literal (e não por \b) permite ao motor saltar
+    # direto para as suas iniciais; o \b vem depois, num lookbehind
+    grafias = [
+        grafia
+        for rotulo in _ROTULOS_POR_CAMPO[campo]
+        for grafia in dict.fromkeys((rotulo, rotulo.upper()))
+    ]
+    return [
+        rf"{re.escape(grafia)}(?<!\w{re.escape(grafia)})[:\s]+" + _grupo_campo(campo, f"{campo}_{i}")
+        for i, grafia in enumerate(grafias)
+    ]
+
+_PADRAO_CAMPOS = re.compile(
+    "|".join(
+        [":(?:" + "|".join(_ramo_dois_pontos(campo) for campo in _ROTULOS_POR_CAMPO) + ")"]
+        + [
+            ramo
+            for campo in _ROTULOS_POR_CAMPO if campo not in _CAMPOS_COM_DOIS_PONTOS
+            for ramo in _ramos_sem_dois_pontos(campo)
+        ]
+    )
+)
+_PADRAO_DOMINIO_EMAIL = re.compile(r"@[\w-]+(?:\.[\w-]+)+")
+_ROTULO_NO_FIM = re.compile(
+    r"\b(?:" + _TODOS_ROTULOS + r")\s*$",
+    re.IGNORECASE
+)
+_USUARIO_EMAIL_NO_FIM = re.compile(r"[\w.+-]+$")
+# Palavras procuradas na detecção de regiões do OCR (regioes_interesse), já normalizadas
+_ROTULOS_ROI = frozenset(
+    normalize_text(rotulo.split()[0]).lower().strip(".")
+    for rotulos in _ROTULOS_POR_CAMPO.values() for rotulo in rotulos
+) | {"cnpj", "cpf", "e-mail", "email", "autuado", "interessado", "razao"}
+
+def extrair_campos(texto):
+    """
+    Percorre o texto uma única vez com o padrão dos rótulos (mais uma busca
+    pelos "@" dos e-mails) e devolve todos os campos encontrados.
+    Os endereços são agrupados pela posição no texto: cada "Endereço" abre
+    um registro e Cidade/Bairro/Estado/CEP seguintes são associados a ele,
+    de modo que um campo ausente não desalinha os endereços seguintes.
+    """
+    campos = {"enderecos": [], "emails": [], "socios_advogados": []}
+    atual = None
+
+    for match in _PADRAO_CAMPOS.finditer(texto):
+        tipo = _CAMPO_DO_GRUPO[match.lastgroup]
+        valor = match.group(match.lastgroup)
+        if tipo in _CAMPOS_TEXTO_LIVRE:
+            valor = _ROTULO_NO_FIM.sub("", valor)
+        valor = valor.strip()
+        if not valor:
+            continue
+        if tipo == "estado":
+            valor = valor.upper()
+
+        if tipo in CAMPOS_ENDERECO:
+            preenchido = atual is not None and atual[tipo] is not None
+            if atual is None or preenchido:
+                atual = dict.fromkeys(CAMPOS_ENDERECO)
+                atual["posicao"] = match.start()
+                campos["enderecos"].append(atual)
+            atual[tipo] = valor
+        else:
+            campos["socios_advogados"].append(valor)
+
+    for match in _PADRAO_DOMINIO_EMAIL.finditer(texto):
+        # O padrão começa no "@"; o usuário é recuperado olhando para trás
+        usuario = _USUARIO_EMAIL_NO_FIM.search(texto, max(0, match.start() - 64), match.start())
+        if usuario:
+            campos["emails"].append(usuario.group(0) + match.group(0))
+
+    for registro in campos["enderecos"]:
+        for campo in CAMPOS_ENDERECO:
+            if not registro[campo]:
+                registro[campo] = NAO_INFORMADO
+
+    return campos
+
+# "AR"/"AIS" como palavra, sem diferenciar maiúsculas; começar por [Aa] (e não por \b)
+# permite ao motor de regex saltar direto para as letras "a" do texto
+_PADRAO_ORIGEM = re.compile(r"[Aa](?<!\w[Aa])(?:[Rr]|[Ii][Ss])\b")
+
+def enderecos_validos(registros, source):
+    """
+    Converte os registros de extrair_campos em endereços para exibição,
+    descartando os que não têm logradouro ou têm menos de 15 caracteres.
+    """
+    return [
+        {
+            "endereco": r["endereco"],
+            "cidade": r["cidade"],
+            "bairro": r["bairro"],
+            "estado": r["estado"],
+            "cep": r["cep"],
+            "source": source,
+        }
+        for r in registros
+        if r["endereco"] != NAO_INFORMADO and len(r["endereco"]) >= 15
+    ]
+
+@rastrear("extract_information_spacy")
+def extract_information_spacy(text, docs=None, campos=None):
     """
     Exemplo de extração com spacy (nomes, e-mails, etc.).
+    Recebe os docs já analisados (analisar_documento) e os campos já
+    extraídos (extrair_campos) para não reprocessar o texto.
     """
-    doc = nlp(text)
+    if docs is None:
+        docs = analisar_documento(text)
+    anotar_span(caracteres=len(text), blocos=len(docs))
     info = {
         "nome_autuado": None,
         "cpf": None,
@@ -423,93 +2216,74 @@ def extract_information_spacy(text):
         "emails": [],
     }
     
-    for ent in doc.ents:
-        if ent.label_ in ["PER", "ORG"]:
-            if not info["nome_autuado"]:
-                info["nome_autuado"] = ent.text.strip()
-        elif ent.label_ == "EMAIL":
-            info["emails"].append(ent.text.strip())
+    for doc in docs:
+        for ent in doc.ents:
+            if ent.label_ in ["PER", "ORG"]:
+                if not info["nome_autuado"]:
+                    info["nome_autuado"] = ent.text.strip()
+            elif ent.label_ == "EMAIL":
+                info["emails"].append(ent.text.strip())
     
-    # Regex para CNPJ/CPF
-    cnpj_pattern = r"CNPJ:\s*([\d./-]{14,18})"
-    cpf_pattern  = r"CPF:\s*([\d./-]{11,14})"
+    if campos is None:
+        campos = extrair_campos(text)
+
+    # CPF/CNPJ: todos os válidos do texto, com ou sem rótulo; o autuado fica
+    # com o melhor de cada tipo que esteja perto de um rótulo ou do autuado
+    info["identificadores"] = minerar_identificadores(text, info["nome_autuado"])
+    for tipo in ("cnpj", "cpf"):
+        info[tipo] = next(
+            (i["valor"] for i in info["identificadores"] if i["tipo"] == tipo and i["pontuacao"] > 0),
+            None
+        )
 
-    cnpj_match = re.search(cnpj_pattern, text)
-    cpf_match  = re.search(cpf_pattern, text)
-    
-    if cnpj_match:
-        cnpj_puro = re.sub(r'\D', '', cnpj_match.group(1))
-        if validar_cnpj(cnpj_puro):
-            info["cnpj"] = format_cnpj(cnpj_match.group(1))
-    
-    if cpf_match:
-        cpf_puro = re.sub(r'\D', '', cpf_match.group(1))
-        if validar_cpf(cpf_puro):
-            info["cpf"] = format_cpf(cpf_match.group(1))
-    
+    info["emails"].extend(campos["emails"])
     # Sócios / advogados
-    socios_adv_pattern = r"(?:Sócio|Advogado|Responsável|Representante Legal):\s*([\w\s]+)"
-    info["socios_advogados"] = re.findall(socios_adv_pattern, text) or []
+    info["socios_advogados"] = campos["socios_advogados"]
     
     return info
 
-def extract_addresses_with_source(text):
+def extrair_campos_por_bloco(text):
     """
-    Exemplo: extrai endereços com a 'source' baseada em 'AR' ou 'AIS' no texto.
-    + Filtrar endereços < 15 caracteres.
+    Divide o texto nas quebras de página (\\f) e extrai os campos de cada
+    bloco uma única vez. Retorna uma lista de (origem, campos), com origem
+    'AR', 'AIS' ou 'Desconhecido' conforme o bloco.
     """
-    doc = nlp(text)
-    page_blocks = text.split("\f")
-    
-    addresses = []
-    
-    endereco_pattern = r"(?:Endereço|End|Endereco):\s*([\w\s.,ºª-]+)"
-    cidade_pattern   = r"Cidade:\s*([\w\s]+(?: DE [\w\s]+)?)"
-    bairro_pattern   = r"Bairro:\s*([\w\s]+)"
-    estado_pattern   = r"Estado:\s*([A-Z]{2})"
-    cep_pattern      = r"CEP:\s*(\d{2}\.\d{3}-\d{3}|\d{5}-\d{3})"
-    
-    for block in page_blocks:
+    blocos = []
+    for block in text.split("\f"):
         block_clean = block.strip()
+        origens = {origem.upper() for origem in _PADRAO_ORIGEM.findall(block_clean)}
         block_source = "Desconhecido"
-        if re.search(r"\bAR\b", block_clean, re.IGNORECASE):
+        if "AR" in origens:
             block_source = "AR"
-        elif re.search(r"\bAIS\b", block_clean, re.IGNORECASE):
+        elif "AIS" in origens:
             block_source = "AIS"
-        
-        endereco_matches = re.findall(endereco_pattern, block_clean, re.IGNORECASE)
-        cidade_matches   = re.findall(cidade_pattern, block_clean, re.IGNORECASE)
-        bairro_matches   = re.findall(bairro_pattern, block_clean, re.IGNORECASE)
-        estado_matches   = re.findall(estado_pattern, block_clean, re.IGNORECASE)
-        cep_matches      = re.findall(cep_pattern, block_clean, re.IGNORECASE)
-        
-        max_len = max(
-            len(endereco_matches),
-            len(cidade_matches),
-            len(bairro_matches),
-            len(estado_matches),
-            len(cep_matches)
-        )
-        
-        for i in range(max_len):
-            end_str = endereco_matches[i].strip() if i < len(endereco_matches) else "[Não informado]"
-            cid_str = cidade_matches[i].strip()   if i < len(cidade_matches)   else "[Não informado]"
-            bai_str = bairro_matches[i].strip()   if i < len(bairro_matches)   else "[Não informado]"
-            uf_str  = estado_matches[i].strip()   if i < len(estado_matches)   else "[Não informado]"
-            cep_str = cep_matches[i].strip()      if i < len(cep_matches)      else "[Não informado]"
-            
-            if len(end_str) < 15:
-                continue
-            
-            addresses.append({
-                "endereco": end_str,
-                "cidade": cid_str,
-                "bairro": bai_str,
-                "estado": uf_str,
-                "cep": cep_str,
-                "source": block_source
-            })
-    
+        blocos.append((block_source, extrair_campos(block_clean)))
+    return blocos
+
+def juntar_campos(campos_blocos):
+    """
+    Reúne os campos de todos os blocos, na ordem do texto.
+    """
+    campos = {"enderecos": [], "emails": [], "socios_advogados": []}
+    for _, campos_bloco in campos_blocos:
+        for chave, valores in campos_bloco.items():
+            campos[chave].extend(valores)
+    return campos
+
+@rastrear("extract_addresses_with_source")
+def extract_addresses_with_source(text, campos_blocos=None):
+    """
+    Exemplo: extrai endereços com a 'source' baseada em 'AR' ou 'AIS' no texto.
+    + Filtrar endereços < 15 caracteres.
+    Aceita o resultado de extrair_campos_por_bloco para não reprocessar o texto.
+    """
+    if campos_blocos is None:
+        campos_blocos = extrair_campos_por_bloco(text)
+
+    addresses = []
+    for block_source, campos in campos_blocos:
+        addresses.extend(enderecos_validos(campos["enderecos"], block_source))
+    anotar_span(caracteres=len(text), blocos=len(campos_blocos), enderecos=len(addresses))
     return addresses
 
 def normalize_address(address):
@@ -518,9 +2292,289 @@ def normalize_address(address):
     address = re.sub(r'\s+', ' ', address)
     return address.lower().strip()
 
+ENDERECO_SIMILARIDADE_MINIMA = float(os.environ.get("SEI_ENDERECO_SIMILARIDADE", "0.85"))
+# Chaves comuns a muitos endereços (ex.: "rua das") não separam candidatos;
+# blocos com mais variantes que isto são ignorados
+ENDERECO_BLOCO_MAXIMO = int(os.environ.get("SEI_ENDERECO_BLOCO_MAXIMO", "50"))
+
+def _chaves_endereco(normalizado, cep):
+    """Chaves de bloco do endereço: o CEP e os pares de palavras consecutivas."""
+    palavras = normalizado.split()
+    chaves = {("ngrama",) + tuple(palavras[i:i + 2]) for i in range(max(1, len(palavras) - 1))}
+    if cep:
+        chaves.add(("cep", cep))
+    return chaves
+
+def _qualidade_endereco(endereco):
+    preenchidos = sum(1 for campo in CAMPOS_ENDERECO if endereco.get(campo) and endereco[campo] != NAO_INFORMADO)
+    return preenchidos, len(endereco.get("endereco") or "")
+
+@rastrear("deduplicar_enderecos")
+def deduplicar_enderecos(enderecos, limiar=ENDERECO_SIMILARIDADE_MINIMA):
+    """
+    Junta as variantes de um mesmo endereço (OCR, blocos AR/AIS...).
+
+    Os endereços iguais após normalize_address são agrupados direto. As
+    variantes restantes só são comparadas (difflib) dentro dos blocos que
+    compartilham o CEP ou um par de palavras; assim o custo cresce com o
+    número de endereços, e não com o número de pares. Não se juntam grupos
+    com CEPs diferentes, nem grupos com números diferentes (ex.: "Rua A,
+    100" e "Rua A, 200"): um endereço sem número se junta a um deles, mas
+    não liga os dois. Cada grupo vira o endereço de melhor qualidade (mais
+    campos preenchidos, depois o texto mais longo), com as origens de todas
+    as variantes em 'source' e o total em 'ocorrencias'. A ordem é a da
+    primeira ocorrência de cada grupo.
+    """
+    # Variantes distintas, com os índices dos endereços de cada uma
+    variantes = {}
+    for i, endereco in enumerate(enderecos):
+        cep = re.sub(r"[^0-9]", "", endereco.get("cep") or "")
+        chave = (normalize_address(endereco.get("endereco") or ""), cep if len(cep) == 8 else None)
+        variantes.setdefault(chave, []).append(i)
+    chaves_variantes = list(variantes)
+
+    pai = list(range(len(chaves_variantes)))
+    # CEP e números do grupo de cada raiz, atualizados a cada união
+    cep_grupo = [cep for _, cep in chaves_variantes]
+    numeros_grupo = [frozenset(p for p in normalizado.split() if p.isdigit()) for normalizado, _ in chaves_variantes]
+
+    def _raiz(v):
+        while pai[v] != v:
+            pai[v] = pai[pai[v]]
+            v = pai[v]
+        return v
+
+    blocos = {}
+    for v, (normalizado, cep) in enumerate(chaves_variantes):
+        for chave in _chaves_endereco(normalizado, cep):
+            blocos.setdefault(chave, []).append(v)
+
+    comparacoes = 0
+    for bloco in blocos.values():
+        if len(bloco) < 2 or len(bloco) > ENDERECO_BLOCO_MAXIMO:
+            continue
+        for posicao, a in enumerate(bloco):
+            comparador = difflib.SequenceMatcher(None, autojunk=False)
+            comparador.set_seq2(chaves_variantes[a][0])
+            for b in bloco[posicao + 1:]:
+                raiz_a, raiz_b = _raiz(a), _raiz(b)
+                cep_a, cep_b = cep_grupo[raiz_a], cep_grupo[raiz_b]
+                if raiz_a == raiz_b or (cep_a and cep_b and cep_a != cep_b):
+                    continue
+                numeros_a, numeros_b = numeros_grupo[raiz_a], numeros_grupo[raiz_b]
+                if not (numeros_a <= numeros_b or numeros_b <= numeros_a):
+                    continue
+                comparacoes += 1
+                comparador.set_seq1(chaves_variantes[b][0])
+                if (
+                    comparador.real_quick_ratio() >= limiar
+                    and comparador.quick_ratio() >= limiar
+                    and comparador.ratio() >= limiar
+                ):
+                    pai[raiz_b] = raiz_a
+                    cep_grupo[raiz_a] = cep_a or cep_b
+                    numeros_grupo[raiz_a] = numeros_a | numeros_b
+
+    grupos = {}
+    for v, chave in enumerate(chaves_variantes):
+        grupos.setdefault(_raiz(v), []).extend(variantes[chave])
+
+    resultado = []
+    for indices in sorted(grupos.values(), key=min):
+        indices.sort()
+        melhor = dict(max((enderecos[i] for i in indices), key=_qualidade_endereco))
+        origens = []
+        for i in indices:
+            for origem in str(enderecos[i].get("source") or "Desconhecido").split(", "):
+                if origem not in origens:
+                    origens.append(origem)
+        melhor["source"] = ", ".join(origens)
+        melhor["ocorrencias"] = sum(enderecos[i].get("ocorrencias", 1) for i in indices)
+        resultado.append(melhor)
+
+    anotar_span(enderecos=len(enderecos), variantes=len(chaves_variantes), comparacoes=comparacoes, unicos=len(resultado))
+    return resultado
+
 def extract_all_emails(emails):
     return list(set(emails))
 
+###############################################################################
+# Base de CEP offline
+###############################################################################
+CEP_INDICE_ARQUIVO = os.environ.get("SEI_CEP_INDICE", os.path.join(os.getcwd(), "dados", "cep.idx"))
+CAMPOS_INDICE_CEP = ("cidade", "bairro", "estado")
+# Nomes aceitos para as colunas do CSV de origem (sem acento, minúsculos)
+COLUNAS_CSV_CEP = {
+    "cep": ("cep",),
+    "cidade": ("cidade", "localidade", "municipio"),
+    "bairro": ("bairro",),
+    "estado": ("estado", "uf"),
+}
+_MAGICO_INDICE_CEP = b"CEPIDX1\n"
+_CABECALHO_INDICE_CEP = struct.Struct("<8sII")
+
+def construir_indice_cep(caminho_csv, destino=CEP_INDICE_ARQUIVO):
+    """
+    Gera o índice binário de CEP a partir de um CSV com as colunas CEP,
+    cidade (ou localidade/município), bairro e estado (ou UF), separado por
+    vírgula, ponto e vírgula ou tab. Retorna o número de CEPs gravados; um
+    CEP repetido fica com a primeira linha.
+
+    Formato (inteiros little-endian de 32 bits, tudo alinhado a 4 bytes):
+    cabeçalho (mágico, nº de CEPs, nº de textos), CEPs ordenados, para cada
+    CEP os índices dos textos de cidade/bairro/estado, os deslocamentos de
+    cada texto e, por fim, os textos em UTF-8. Cada texto é gravado uma vez.
+    """
+    textos = {"": 0}
+    registros = {}
+    with open(caminho_csv, newline="", encoding="utf-8-sig") as f:
+        try:
+            dialeto = csv.Sniffer().sniff(f.read(64 * 1024), delimiters=",;\t|")
+        except csv.Error:
+            # Ex.: CSV só com a coluna de CEP, sem delimitador a detectar
+            dialeto = csv.excel
+        f.seek(0)
+        leitor = csv.reader(f, dialeto)
+        cabecalho = [normalize_address(coluna) for coluna in next(leitor)]
+        colunas = {}
+        for campo, nomes in COLUNAS_CSV_CEP.items():
+            colunas[campo] = next((cabecalho.index(nome) for nome in nomes if nome in cabecalho), None)
+        if colunas["cep"] is None:
+            raise ValueError(f"Coluna de CEP não encontrada no cabeçalho: {cabecalho}")
+
+        for linha in leitor:
+            if len(linha) <= colunas["cep"]:
+                continue
+            cep = re.sub(r"[^0-9]", "", linha[colunas["cep"]])
+            if len(cep) != 8 or int(cep) in registros:
+                continue
+            ids = []
+            for campo in CAMPOS_INDICE_CEP:
+                coluna = colunas[campo]
+                valor = linha[coluna].strip() if coluna is not None and coluna < len(linha) else ""
+                ids.append(textos.setdefault(valor, len(textos)))
+            registros[int(cep)] = ids
+
+    ceps = np.array(sorted(registros), dtype="<u4")
+    campos = np.array([registros[cep] for cep in ceps.tolist()], dtype="<u4").reshape(-1, len(CAMPOS_INDICE_CEP))
+    blob = [texto.encode("utf-8") for texto in textos]
+    deslocamentos = np.zeros(len(blob) + 1, dtype="<u4")
+    np.cumsum([len(b) for b in blob], out=deslocamentos[1:])
+
+    os.makedirs(os.path.dirname(os.path.abspath(destino)), exist_ok=True)
+    temporario = f"{destino}.tmp"
+    with open(temporario, "wb") as f:
+        f.write(_CABECALHO_INDICE_CEP.pack(_MAGICO_INDICE_CEP, len(ceps), len(blob)))
+        f.write(ceps.tobytes())
+        f.write(campos.tobytes())
+        f.write(deslocamentos.tobytes())
+        f.write(b"".join(blob))
+    os.replace(temporario, destino)
+    return len(ceps)
+
+class IndiceCep:
+    """
+    Consulta somente leitura ao índice gerado por construir_indice_cep. O
+    arquivo é mapeado em memória: abrir não lê os dados, e cada consulta é
+    uma busca binária nos CEPs ordenados, sem rede.
+    """
+
+    def __init__(self, caminho):
+        self._mapa = np.memmap(caminho, dtype=np.uint8, mode="r")
+        magico, quantidade, quantidade_textos = _CABECALHO_INDICE_CEP.unpack_from(self._mapa, 0)
+        if magico != _MAGICO_INDICE_CEP:
+            raise ValueError(f"{caminho} não é um índice de CEP")
+        inicio = _CABECALHO_INDICE_CEP.size
+        fim = inicio + 4 * quantidade
+        self._ceps = self._mapa[inicio:fim].view("<u4")
+        inicio, fim = fim, fim + 4 * quantidade * len(CAMPOS_INDICE_CEP)
+        self._campos = self._mapa[inicio:fim].view("<u4").reshape(quantidade, len(CAMPOS_INDICE_CEP))
+        inicio, fim = fim, fim + 4 * (quantidade_textos + 1)
+        self._deslocamentos = self._mapa[inicio:fim].view("<u4")
+        self._textos = self._mapa[fim:]
+
+    def __len__(self):
+        return len(self._ceps)
+
+    def _texto(self, indice):
+        return self._textos[self._deslocamentos[indice]:self._deslocamentos[indice + 1]].tobytes().decode("utf-8")
+
+    def buscar(self, cep):
+        """Retorna {'cidade', 'bairro', 'estado'} do CEP, ou None se não estiver na base."""
+        digitos = re.sub(r"[^0-9]", "", cep or "")
+        if len(digitos) != 8:
+            return None
+        # Mesmo tipo do vetor: com outro tipo o numpy converteria o vetor inteiro
+        valor = np.uint32(digitos)
+        posicao = int(self._ceps.searchsorted(valor))
+        if posicao == len(self._ceps) or self._ceps[posicao] != valor:
+            return None
+        return {campo: self._texto(i) for campo, i in zip(CAMPOS_INDICE_CEP, self._campos[posicao].tolist())}
+
+@st.cache_resource(max_entries=1)
+def _abrir_indice_cep(caminho, modificado_ns, tamanho):
+    # modificado_ns e tamanho só entram na chave do cache: um índice gerado
+    # ou refeito depois que o app subiu é aberto de novo
+    return IndiceCep(caminho)
+
+def obter_indice_cep(caminho=CEP_INDICE_ARQUIVO):
+    """Índice de CEP, aberto na primeira consulta; None se o arquivo não existir."""
+    try:
+        estado = os.stat(caminho)
+    except FileNotFoundError:
+        return None
+    try:
+        return _abrir_indice_cep(caminho, estado.st_mtime_ns, estado.st_size)
+    except Exception as e:
+        logging.error(f"Erro ao abrir o índice de CEP {caminho}: {e}")
+        return None
+
+def _mesmo_valor(extraido, referencia):
+    a, b = normalize_address(extraido), normalize_address(referencia)
+    return a == b or difflib.SequenceMatcher(None, a, b, autojunk=False).ratio() >= ENDERECO_SIMILARIDADE_MINIMA
+
+@rastrear("completar_enderecos_cep")
+def completar_enderecos_cep(enderecos, indice=None):
+    """
+    Confere cidade, bairro e estado de cada endereço com a base de CEP.
+    Campos vazios ou '[Não informado]' são preenchidos (e listados em
+    'preenchidos_cep'); os que divergem da base são mantidos, e o valor da
+    base vai em 'divergencias_cep'. Sem índice (obter_indice_cep), devolve
+    os endereços sem alteração.
+    """
+    if indice is None:
+        indice = obter_indice_cep()
+    if indice is None:
+        return enderecos
+
+    encontrados = 0
+    resultado = []
+    for endereco in enderecos:
+        referencia = indice.buscar(endereco.get("cep"))
+        if referencia is None:
+            resultado.append(endereco)
+            continue
+        encontrados += 1
+        endereco = dict(endereco)
+        preenchidos, divergencias = [], {}
+        for campo, valor_base in referencia.items():
+            if not valor_base:
+                continue
+            valor = endereco.get(campo)
+            if not valor or valor == NAO_INFORMADO:
+                endereco[campo] = valor_base
+                preenchidos.append(campo)
+            elif not _mesmo_valor(valor, valor_base):
+                divergencias[campo] = valor_base
+        if preenchidos:
+            endereco["preenchidos_cep"] = preenchidos
+        if divergencias:
+            endereco["divergencias_cep"] = divergencias
+        resultado.append(endereco)
+
+    anotar_span(enderecos=len(enderecos), encontrados=encontrados)
+    return resultado
+
 ###############################################################################
 # Modelos Word
 ###############################################################################
@@ -531,10 +2585,273 @@ def adicionar_paragrafo(doc, texto="", negrito=False, tamanho=12):
     run.font.size = Pt(tamanho)
     return paragrafo
 
+# Partes especiais de ModeloDocx (as demais são tuplas (texto, negrito))
+QUEBRA = "quebra"        # doc.add_paragraph("\n"), sem formatação de fonte
+ENDERECOS = "enderecos"  # BLOCO_ENDERECO, repetido para cada endereço
+_CAMPO_MODELO = re.compile(r"\{(\w+)\}")
+# O python-docx converte tab e quebra de linha em elementos próprios do run
+_CARACTERES_ESPECIAIS_DOCX = re.compile(r"[\t\r\n]")
+
+class ModeloDocx:
+    """
+    Modelo Word pré-compilado. `partes` lista os parágrafos em ordem:
+    (texto, negrito), QUEBRA ou ENDERECOS; o texto pode ter campos {nome}.
+
+    Na primeira utilização cada parágrafo é montado uma única vez com
+    adicionar_paragrafo, num documento de rascunho, e guardado como elemento
+    XML. preencher() só copia esses elementos para o documento e troca o
+    texto dos campos, com resultado idêntico ao de montar parágrafo a parágrafo.
+    """
+
+    def __init__(self, partes):
+        self.partes = partes
+        self._compilado = None
+        self._trava = threading.Lock()
+
+    def _compilar(self):
+        rascunho = Document()
+        compilado = []
+        for parte in self.partes:
+            if parte is ENDERECOS:
+                compilado.append(ENDERECOS)
+            elif parte is QUEBRA:
+                compilado.append((rascunho.add_paragraph("\n")._p, (), None, False))
+            else:
+                texto, negrito = parte
+                elemento = adicionar_paragrafo(rascunho, texto, negrito=negrito)._p
+                compilado.append((elemento, tuple(_CAMPO_MODELO.findall(texto)), texto, negrito))
+        return compilado
+
+    def _elementos(self):
+        if self._compilado is None:
+            with self._trava:
+                if self._compilado is None:
+                    self._compilado = self._compilar()
+        return self._compilado
+
+    def preencher(self, doc, campos, enderecos=()):
+        corpo = doc.element.body
+        secao = corpo.find(qn("w:sectPr"))
+        inserir = secao.addprevious if secao is not None else corpo.append
+        for item in self._elementos():
+            if item is ENDERECOS:
+                for endereco in enderecos:
+                    BLOCO_ENDERECO.preencher(doc, {campo: endereco.get(campo, NAO_INFORMADO) for campo in CAMPOS_ENDERECO})
+                continue
+            elemento, nomes, texto, negrito = item
+            if not nomes:
+                inserir(copy.deepcopy(elemento))
+            elif any(_CARACTERES_ESPECIAIS_DOCX.search(str(campos[nome])) for nome in nomes):
+                adicionar_paragrafo(doc, texto.format_map(campos), negrito=negrito)
+            else:
+                copia = copy.deepcopy(elemento)
+                for t in copia.iter(qn("w:t")):
+                    t.text = t.text.format_map(campos)
+                    if len(t.text.strip()) < len(t.text):
+                        t.set(qn("xml:space"), "preserve")
+                    else:
+                        t.attrib.pop(qn("xml:space"), None)
+                inserir(copia)
+
+@functools.lru_cache(maxsize=1)
+def _documento_base():
+    return Document()
+
+def novo_documento():
+    """
+    Document vazio. Copia um documento mantido em memória em vez de chamar
+    Document(), que relê e interpreta o template padrão a cada chamada.
+    """
+    return copy.deepcopy(_documento_base())
+
+BLOCO_ENDERECO = ModeloDocx([
+    ("Endereço: {endereco}", False),
+    ("Cidade: {cidade}", False),
+    ("Bairro: {bairro}", False),
+    ("Estado: {estado}", False),
+    ("CEP: {cep}", False),
+    QUEBRA,
+])
+
+# Cabeçalho comum aos três modelos: destinatário e endereços
+_CABECALHO_DESTINATARIO = [
+    ("Ao(a) Senhor(a):", False),
+    ("{nome_autuado} – {identificador}", False),
+    QUEBRA,
+    ENDERECOS,
+]
+
+def _campos_destinatario(info):
+    cnpj = info.get('cnpj', '')
+    cpf = info.get('cpf', '')
+    if cnpj:
+        identificador = f"CNPJ: {cnpj}"
+    elif cpf:
+        identificador = f"CPF: {cpf}"
+    else:
+        identificador = "CNPJ/CPF: [Não informado]"
+    return {"nome_autuado": info.get('nome_autuado', '[Nome não informado]'), "identificador": identificador}
+
+MODELO_1 = ModeloDocx(_CABECALHO_DESTINATARIO + [
+    # Assunto e Referência em negrito
+    ("Assunto: Decisão de 1ª instância proferida pela Coordenação de Atuação Administrativa e Julgamento das Infrações Sanitárias.", True),
+    ("Referência: Processo Administrativo Sancionador nº: {numero_processo} ", True),
+    QUEBRA,
+
+    # Corpo do documento
+    ("Prezado(a) Senhor(a),", False),
+    QUEBRA,
+    ("Informamos que foi proferido julgamento pela Coordenação de Atuação Administrativa e Julgamento das Infrações Sanitárias no processo administrativo sancionador em referência, conforme decisão em anexo.", False),
+    QUEBRA,
+
+    # Seções do documento com formatação
+    ("O QUE FAZER SE A DECISÃO TIVER APLICADO MULTA?", True),
+    ("Sendo aplicada a penalidade de multa, esta notificação estará acompanhada de boleto bancário, que deverá ser pago até o vencimento.", False),
+    (
+        "O valor da multa poderá ser pago com 20% de desconto caso seja efetuado em até 20 dias contados de seu recebimento. "
+        "Incorrerá em ilegalidade o usufruto do desconto em data posterior ao prazo referido, mesmo que a data impressa no boleto permita pagamento, "
+        "sendo a diferença cobrada posteriormente pela Gerência de Gestão de Arrecadação (GEGAR). "
+        "O pagamento da multa implica em desistência tácita do recurso, conforme art. 21 da Lei nº 6.437/1977.",
+        False
+    ),
+    (
+        "O não pagamento do boleto sem que haja interposição de recurso, acarretará, sucessivamente: "
+        "i) a inscrição do devedor no Cadastro Informativo de Crédito não Quitado do Setor Público Federal (CADIN); "
+        "ii) a inscrição do débito em dívida ativa da União; iii) o ajuizamento de ação de execução fiscal contra o devedor; "
+        "e iv) a comunicação aos cartórios de registros de imóveis, dos devedores inscritos em dívida ativa ou execução fiscal.",
+        False
+    ),
+    (
+        "Esclarecemos que o valor da multa foi atualizado pela taxa Selic acumulada nos termos do art. 37-A da Lei 10.522/2002 "
+        "e no art. 5º do Decreto-Lei 1.736/79.",
+        False
+    ),
+    QUEBRA,
+
+    ("COMO FAÇO PARA INTERPOR RECURSO DA DECISÃO?", True),
+    (
+        "Havendo interesse na interposição de recurso administrativo, este poderá ser interposto no prazo de 20 dias contados do recebimento desta notificação, "
+        "conforme disposto no art. 9º da RDC nº 266/2019.",
+        False
+    ),
+    (
+        "O protocolo do recurso deverá ser feito exclusivamente, por meio de peticionamento intercorrente no processo indicado no campo assunto desta notificação, "
+        "pelo Sistema Eletrônico de Informações (SEI). Para tanto, é necessário, primeiramente, fazer o cadastro como usuário externo SEI-Anvisa. "
+        "Acesse o portal da Anvisa https://www.gov.br/anvisa/pt-br > Sistemas > SEI > Acesso para Usuários Externos (SEI) e siga as orientações. "
+        "Para maiores informações, consulte o Manual do Usuário Externo Sei-Anvisa, que está disponível em https://www.gov.br/anvisa/pt-br/sistemas/sei.",
+        False
+    ),
+    QUEBRA,
+
+    ("QUAIS DOCUMENTOS DEVEM ACOMPANHAR O RECURSO?", True),
+    ("a) Autuado pessoa jurídica:", False),
+    ("1. Contrato ou estatuto social da empresa, com a última alteração;", False),
+    (
+        "2. Procuração e documento de identificação do outorgado (advogado ou representante), caso constituído para atuar no processo. "
+        "Somente serão aceitas procurações e substabelecimentos assinados eletronicamente, com certificação digital no padrão da "
+        "Infraestrutura de Chaves Públicas Brasileira (ICP-Brasil) ou pelo assinador Gov.br.",
+        False
+    ),
+    ("3. Ata de eleição da atual diretoria quando a procuração estiver assinada por diretor que não conste como sócio da empresa;", False),
+    (
+        "4. No caso de contestação sobre o porte da empresa considerado para a dosimetria da pena de multa: comprovação do porte econômico "
+        "referente ao ano em que foi proferida a decisão (documentos previstos no art. 50 da RDC nº 222/2006).",
+        False
+    ),
+    ("b) Autuado pessoa física:", False),
+    ("1. Documento de identificação do autuado;", False),
+    ("2. Procuração e documento de identificação do outorgado (advogado ou representante), caso constituído para atuar no processo.", False),
+    ("\nInformações de contato: {email_selecionado}", False),
+])
+
+# Parágrafo do Modelo 2 conforme o motivo da revisão
+TEXTOS_MOTIVO_REVISAO = {
+    "insuficiencia_provas": "Foi constatado que não há comprovação suficiente nos autos do processo para afirmar que a recorrente cometeu a infração objeto da autuação em questão.",
+    "prescricao": "Foi observado que da decisão condenatória recorrível proferida em {data_decisao} até o ato seguinte capaz de interromper a prescrição (ex: notificação da decisão em {data_recebimento_notificacao}) passaram-se mais de cinco anos sem que houvesse entre eles outro ato capaz de interromper o curso prescricional (documento que declarou a prescrição. Ex: NOTA n. 00014/2020/EI-M-ANVIS/ENAC/PGF/AGU).",
+    "extincao_empresa": "Foi constatado, ao longo dos procedimentos de cobrança administrativa, que a empresa em questão havia sido 'EXTINTA' na data de {data_extincao}, conforme Certidão Simplificada e documento de Distrato Social fornecido pelo órgão de registro comercial - [Nome do Órgão].",
+}
+# Para outros motivos, conteúdo genérico
+TEXTO_MOTIVO_REVISAO_GENERICO = "Foi constatado que há razões adicionais para a revisão/retratação da decisão, conforme detalhado nos documentos anexos."
+
+MODELO_2 = ModeloDocx(_CABECALHO_DESTINATARIO + [
+    # Assunto e Referência em negrito
+    ("Assunto: Decisão de 1ª instância proferida pela Coordenação de Atuação Administrativa e Julgamento das Infrações Sanitárias.", True),
+    ("Referência: Processo Administrativo Sancionador nº: {numero_processo} ", True),
+    QUEBRA,
+
+    # Corpo do documento com conteúdo adaptado
+    ("Prezado(a) Senhor(a),", False),
+    QUEBRA,
+    ("Informamos que a Decisão em 1ª instância proferida pela Gerência-Geral de Portos, Aeroportos, Fronteiras e Recintos Alfandegados ou Coordenação de Atuação Administrativa e Julgamento das Infrações Sanitárias, em {data_decisao}, no processo administrativo sancionador em referência, foi revisada ou retratada no âmbito da Anvisa pelos motivos expostos abaixo.", False),
+    QUEBRA,
+    ("{texto_motivo}", False),
+    QUEBRA,
+    ("Dessa forma, a decisão condenatória perdeu seus efeitos e o processo será arquivado.", False),
+    QUEBRA,
+
+    # Seção "Como Obter Cópia do Processo"
+    ("COMO OBTER CÓPIA DO PROCESSO?", True),
+    ("Informações e pedidos de cópias devem ser solicitados exclusivamente pelos Canais de Atendimento da Anvisa (https://www.gov.br/anvisa/pt-br/canais_atendimento) ou pelo Serviço de Atendimento ao Cidadão (https://www.gov.br/anvisa/pt-br/acessoainformacao/sic).", False),
+    ("Os pedidos de cópia de processo devem informar o número do processo e a finalidade da cópia.", False),
+    ("A cópia integral dos autos somente será concedida para o interessado direto no processo, ou seu representante devidamente constituído, cuja condição deve ser comprovada mediante a apresentação dos seguintes documentos:", False),
+    ("1. Documento de identificação do autuado (se pessoa física) ou outorgado;", False),
+    (
+        "2. Procuração e documento de identificação do outorgado (advogado ou representante), caso seja ele o requerente. "
+        "Somente serão aceitas procurações e substabelecimento assinados eletronicamente, com certificação digital no padrão da Infraestrutura de Chaves Públicas Brasileira (ICP-Brasil) ou pelo assinador Gov.br.",
+        False
+    ),
+    ("3. Contrato ou estatuto social da empresa, com a última alteração (se pessoa jurídica);", False),
+    ("4. Ata de eleição da atual diretoria quando a procuração estiver assinada por diretor que não conste como sócio da empresa (se pessoa jurídica);", False),
+    ("A ausência de quaisquer dos documentos acima ensejará o indeferimento sumário do pedido.", False),
+    ("Terceiros não interessados diretamente no processo estão dispensados de apresentar documentação e terão acesso somente às cópias dos seguintes documentos: Auto de Infração, Manifestação da área autuante e Decisão.", False),
+    ("\nInformações de contato: {email_selecionado}", False),
+])
+
+MODELO_3 = ModeloDocx(_CABECALHO_DESTINATARIO + [
+    # Assunto e Referência em negrito
+    ("Assunto: Decisão proferida pela Diretoria Colegiada", True),
+    ("Referência: Processo Administrativo Sancionador nº {numero_processo}", True),
+    QUEBRA,
+
+    # Corpo do documento com conteúdo específico
+    ("Prezado(a) Senhor(a),", False),
+    QUEBRA,
+    ("Informamos que foi proferido julgamento da Diretoria Colegiada no processo administrativo sancionador em referência, conforme decisão em anexo, contra a qual não cabe recurso.", False),
+    ("\n", False),
+    ("Em sendo mantida a penalidade de multa, esta notificação estará acompanhada de boleto bancário. Exceto para a decisão, cujo recurso tenha sido considerado intempestivo, um vez que o boleto será encaminhado pela Gerência de Gestão de Arrecadação – GEGAR.", False),
+    ("\n", False),
+    ("O não pagamento do boleto, caso devido, acarretará, sucessivamente: i) a inscrição do devedor no Cadastro Informativo de Crédito não Quitado do Setor Público Federal (CADIN); ii) a inscrição do débito em dívida ativa da União; iii) o ajuizamento de ação de execução fiscal contra o devedor; e iv) a comunicação aos cartórios de registros de imóveis, dos devedores inscritos em dívida ativa ou execução fiscal.", False),
+    ("\n", False),
+    ("Esclarecemos que, em caso de penalidade de multa, seu valor foi atualizado pela taxa Selic acumulada nos termos do art. 37-A da Lei 10.522/2002 e no art. 5º do Decreto-Lei 1.736/79.", False),
+    ("\n", False),
+
+    # Seção "Informações e pedidos de cópias"
+    ("Informações e pedidos de cópias podem ser solicitados pelos Canais de Atendimento da Anvisa (webchat, formulário eletrônico ou telefone 0800 642 9782), responsáveis por atender a esse tipo de demanda de forma centralizada. Os pedidos de cópia de PAS devem vir acompanhados dos documentos abaixo, sob pena de não serem atendidos:", False),
+    ("\n", False),
+
+    # Lista de documentos necessários
+    ("- Cópia autenticada da procuração/substabelecimento com firma reconhecida e poderes específicos para tal;", False),
+    ("- Cópia do CPF e do RG do outorgado e do requerente, caso sejam pessoas distintas; e", False),
+    ("- Cópia autenticada do contrato social/estatuto social, com a última alteração.", False),
+    ("\n", False),
+
+    ("Por fim, esclarecemos que foi concedido aos autos por meio do Sistema Eletrônico de Informações (SEI), por 180 (cento e oitenta) dias, ao usuário: {usuario_nome} ({usuario_email}).", False),
+    ("\n", False),
+
+    # Informações de contato
+    ("\nInformações de contato: {email_selecionado}", False),
+
+    # Encerramento do documento
+    ("Atenciosamente,", False),
+    ("\n", False),
+    ("{usuario_nome}", False),
+])
+
+@rastrear("_gerar_modelo_1")
 def _gerar_modelo_1(doc, info, enderecos, numero_processo, email_selecionado):
     """
     Gera o Documento Word no Modelo 1.
-    
+
     :param doc: Objeto Document do python-docx.
     :param info: Dicionário com informações extraídas.
     :param enderecos: Lista de dicionários com endereços.
@@ -542,113 +2859,19 @@ def _gerar_modelo_1(doc, info, enderecos, numero_processo, email_selecionado):
     :param email_selecionado: Email selecionado pelo usuário.
     """
     try:
-        # Cabeçalho do documento
-        adicionar_paragrafo(doc, "Ao(a) Senhor(a):")
-        nome_autuado = info.get('nome_autuado', '[Nome não informado]')
-        cnpj = info.get('cnpj', '')
-        cpf = info.get('cpf', '')
-        if cnpj:
-            identificador = f"CNPJ: {cnpj}"
-        elif cpf:
-            identificador = f"CPF: {cpf}"
-        else:
-            identificador = "CNPJ/CPF: [Não informado]"
-        adicionar_paragrafo(doc, f"{nome_autuado} – {identificador}")
-        doc.add_paragraph("\n")
-
-        # Informações de endereço
-        for endereco in enderecos:
-            adicionar_paragrafo(doc, f"Endereço: {endereco.get('endereco', '[Não informado]')}")
-            adicionar_paragrafo(doc, f"Cidade: {endereco.get('cidade', '[Não informado]')}")
-            adicionar_paragrafo(doc, f"Bairro: {endereco.get('bairro', '[Não informado]')}")
-            adicionar_paragrafo(doc, f"Estado: {endereco.get('estado', '[Não informado]')}")
-            adicionar_paragrafo(doc, f"CEP: {endereco.get('cep', '[Não informado]')}")
-            doc.add_paragraph("\n")
-
-        # Assunto e Referência em negrito
-        adicionar_paragrafo(doc, 
-            "Assunto: Decisão de 1ª instância proferida pela Coordenação de Atuação Administrativa e Julgamento das Infrações Sanitárias.", 
-            negrito=True
-        )
-        adicionar_paragrafo(doc, 
-            f"Referência: Processo Administrativo Sancionador nº: {numero_processo} ", 
-            negrito=True
-        )
-        doc.add_paragraph("\n")
-
-        # Corpo do documento
-        adicionar_paragrafo(doc, "Prezado(a) Senhor(a),")
-        doc.add_paragraph("\n")
-        adicionar_paragrafo(doc, 
-            "Informamos que foi proferido julgamento pela Coordenação de Atuação Administrativa e Julgamento das Infrações Sanitárias no processo administrativo sancionador em referência, conforme decisão em anexo."
-        )
-        doc.add_paragraph("\n")
-
-        # Seções do documento com formatação
-        adicionar_paragrafo(doc, "O QUE FAZER SE A DECISÃO TIVER APLICADO MULTA?", negrito=True)
-        adicionar_paragrafo(doc, 
-            "Sendo aplicada a penalidade de multa, esta notificação estará acompanhada de boleto bancário, que deverá ser pago até o vencimento."
-        )
-        adicionar_paragrafo(doc, 
-            "O valor da multa poderá ser pago com 20% de desconto caso seja efetuado em até 20 dias contados de seu recebimento. "
-            "Incorrerá em ilegalidade o usufruto do desconto em data posterior ao prazo referido, mesmo que a data impressa no boleto permita pagamento, "
-            "sendo a diferença cobrada posteriormente pela Gerência de Gestão de Arrecadação (GEGAR). "
-            "O pagamento da multa implica em desistência tácita do recurso, conforme art. 21 da Lei nº 6.437/1977."
-        )
-        adicionar_paragrafo(doc, 
-            "O não pagamento do boleto sem que haja interposição de recurso, acarretará, sucessivamente: "
-            "i) a inscrição do devedor no Cadastro Informativo de Crédito não Quitado do Setor Público Federal (CADIN); "
-            "ii) a inscrição do débito em dívida ativa da União; iii) o ajuizamento de ação de execução fiscal contra o devedor; "
-            "e iv) a comunicação aos cartórios de registros de imóveis, dos devedores inscritos em dívida ativa ou execução fiscal."
-        )
-        adicionar_paragrafo(doc, 
-            "Esclarecemos que o valor da multa foi atualizado pela taxa Selic acumulada nos termos do art. 37-A da Lei 10.522/2002 "
-            "e no art. 5º do Decreto-Lei 1.736/79."
-        )
-        doc.add_paragraph("\n")
-
-        adicionar_paragrafo(doc, "COMO FAÇO PARA INTERPOR RECURSO DA DECISÃO?", negrito=True)
-        adicionar_paragrafo(doc, 
-            "Havendo interesse na interposição de recurso administrativo, este poderá ser interposto no prazo de 20 dias contados do recebimento desta notificação, "
-            "conforme disposto no art. 9º da RDC nº 266/2019."
-        )
-        adicionar_paragrafo(doc, 
-            "O protocolo do recurso deverá ser feito exclusivamente, por meio de peticionamento intercorrente no processo indicado no campo assunto desta notificação, "
-            "pelo Sistema Eletrônico de Informações (SEI). Para tanto, é necessário, primeiramente, fazer o cadastro como usuário externo SEI-Anvisa. "
-            "Acesse o portal da Anvisa https://www.gov.br/anvisa/pt-br > Sistemas > SEI > Acesso para Usuários Externos (SEI) e siga as orientações. "
-            "Para maiores informações, consulte o Manual do Usuário Externo Sei-Anvisa, que está disponível em https://www.gov.br/anvisa/pt-br/sistemas/sei."
-        )
-        doc.add_paragraph("\n")
-
-        adicionar_paragrafo(doc, "QUAIS DOCUMENTOS DEVEM ACOMPANHAR O RECURSO?", negrito=True)
-        adicionar_paragrafo(doc, "a) Autuado pessoa jurídica:")
-        adicionar_paragrafo(doc, "1. Contrato ou estatuto social da empresa, com a última alteração;")
-        adicionar_paragrafo(doc, 
-            "2. Procuração e documento de identificação do outorgado (advogado ou representante), caso constituído para atuar no processo. "
-            "Somente serão aceitas procurações e substabelecimentos assinados eletronicamente, com certificação digital no padrão da "
-            "Infraestrutura de Chaves Públicas Brasileira (ICP-Brasil) ou pelo assinador Gov.br."
-        )
-        adicionar_paragrafo(doc, 
-            "3. Ata de eleição da atual diretoria quando a procuração estiver assinada por diretor que não conste como sócio da empresa;"
-        )
-        adicionar_paragrafo(doc, 
-            "4. No caso de contestação sobre o porte da empresa considerado para a dosimetria da pena de multa: comprovação do porte econômico "
-            "referente ao ano em que foi proferida a decisão (documentos previstos no art. 50 da RDC nº 222/2006)."
-        )
-        adicionar_paragrafo(doc, "b) Autuado pessoa física:")
-        adicionar_paragrafo(doc, "1. Documento de identificação do autuado;")
-        adicionar_paragrafo(doc, 
-            "2. Procuração e documento de identificação do outorgado (advogado ou representante), caso constituído para atuar no processo."
-        )
-        adicionar_paragrafo(doc, f"\nInformações de contato: {email_selecionado}")
+        anotar_span(enderecos=len(enderecos))
+        campos = _campos_destinatario(info)
+        campos.update(numero_processo=numero_processo, email_selecionado=email_selecionado)
+        MODELO_1.preencher(doc, campos, enderecos)
 
     except Exception as e:
-        st.error(f"Erro ao gerar o documento no modelo 1: {e}")
+        raise Exception(f"Erro ao gerar o documento no modelo 1: {e}")
 
+@rastrear("_gerar_modelo_2")
 def _gerar_modelo_2(doc, info, enderecos, numero_processo, motivo_revisao, data_decisao, data_recebimento_notificacao, data_extincao=None, email_selecionado=None):
     """
     Gera o Documento Word no Modelo 2.
-    
+
     :param doc: Objeto Document do python-docx.
     :param info: Dicionário com informações extraídas.
     :param enderecos: Lista de dicionários com endereços.
@@ -660,112 +2883,33 @@ def _gerar_modelo_2(doc, info, enderecos, numero_processo, motivo_revisao, data_
     :param email_selecionado: Email selecionado pelo usuário.
     """
     try:
-        # Cabeçalho do documento
-        adicionar_paragrafo(doc, "Ao(a) Senhor(a):")
-        nome_autuado = info.get('nome_autuado', '[Nome não informado]')
-        cnpj = info.get('cnpj', '')
-        cpf = info.get('cpf', '')
-        if cnpj:
-            identificador = f"CNPJ: {cnpj}"
-        elif cpf:
-            identificador = f"CPF: {cpf}"
-        else:
-            identificador = "CNPJ/CPF: [Não informado]"
-        adicionar_paragrafo(doc, f"{nome_autuado} – {identificador}")
-        doc.add_paragraph("\n")
-
-        # Informações de endereço
-        for endereco in enderecos:
-            adicionar_paragrafo(doc, f"Endereço: {endereco.get('endereco', '[Não informado]')}")
-            adicionar_paragrafo(doc, f"Cidade: {endereco.get('cidade', '[Não informado]')}")
-            adicionar_paragrafo(doc, f"Bairro: {endereco.get('bairro', '[Não informado]')}")
-            adicionar_paragrafo(doc, f"Estado: {endereco.get('estado', '[Não informado]')}")
-            adicionar_paragrafo(doc, f"CEP: {endereco.get('cep', '[Não informado]')}")
-            doc.add_paragraph("\n")
-
-        # Assunto e Referência em negrito
-        adicionar_paragrafo(doc, 
-            "Assunto: Decisão de 1ª instância proferida pela Coordenação de Atuação Administrativa e Julgamento das Infrações Sanitárias.", 
-            negrito=True
-        )
-        adicionar_paragrafo(doc, 
-            f"Referência: Processo Administrativo Sancionador nº: {numero_processo} ", 
-            negrito=True
-        )
-        doc.add_paragraph("\n")
-        
-        # Corpo do documento com conteúdo adaptado
-        adicionar_paragrafo(doc, "Prezado(a) Senhor(a),")
-        doc.add_paragraph("\n")
-        adicionar_paragrafo(doc, 
-            f"Informamos que a Decisão em 1ª instância proferida pela Gerência-Geral de Portos, Aeroportos, Fronteiras e Recintos Alfandegados ou Coordenação de Atuação Administrativa e Julgamento das Infrações Sanitárias, em {data_decisao.strftime('%d/%m/%Y')}, no processo administrativo sancionador em referência, foi revisada ou retratada no âmbito da Anvisa pelos motivos expostos abaixo."
+        anotar_span(enderecos=len(enderecos))
+        campos = _campos_destinatario(info)
+        campos.update(
+            numero_processo=numero_processo,
+            email_selecionado=email_selecionado,
+            data_decisao=data_decisao.strftime('%d/%m/%Y'),
         )
-        doc.add_paragraph("\n")
-        
+
         # Condições baseadas no motivo da revisão
-        if motivo_revisao == "insuficiencia_provas":
-            adicionar_paragrafo(doc, 
-                "Foi constatado que não há comprovação suficiente nos autos do processo para afirmar que a recorrente cometeu a infração objeto da autuação em questão."
-            )
-        elif motivo_revisao == "prescricao":
-            adicionar_paragrafo(doc, 
-                f"Foi observado que da decisão condenatória recorrível proferida em {data_decisao.strftime('%d/%m/%Y')} até o ato seguinte capaz de interromper a prescrição (ex: notificação da decisão em {data_recebimento_notificacao.strftime('%d/%m/%Y')}) passaram-se mais de cinco anos sem que houvesse entre eles outro ato capaz de interromper o curso prescricional (documento que declarou a prescrição. Ex: NOTA n. 00014/2020/EI-M-ANVIS/ENAC/PGF/AGU)."
-            )
+        if motivo_revisao == "prescricao":
+            campos["data_recebimento_notificacao"] = data_recebimento_notificacao.strftime('%d/%m/%Y')
         elif motivo_revisao == "extincao_empresa":
             if not data_extincao:
                 raise ValueError("A data de extinção da empresa deve ser fornecida para o motivo 'extincao_empresa'.")
-            adicionar_paragrafo(doc, 
-                f"Foi constatado, ao longo dos procedimentos de cobrança administrativa, que a empresa em questão havia sido 'EXTINTA' na data de {data_extincao.strftime('%d/%m/%Y')}, conforme Certidão Simplificada e documento de Distrato Social fornecido pelo órgão de registro comercial - [Nome do Órgão]."
-            )
-        else:
-            # Para outros motivos, conteúdo genérico
-            adicionar_paragrafo(doc, 
-                "Foi constatado que há razões adicionais para a revisão/retratação da decisão, conforme detalhado nos documentos anexos."
-            )
-        
-        doc.add_paragraph("\n")
-        adicionar_paragrafo(doc, 
-            "Dessa forma, a decisão condenatória perdeu seus efeitos e o processo será arquivado."
-        )
-        doc.add_paragraph("\n")
-        
-        # Seção "Como Obter Cópia do Processo"
-        adicionar_paragrafo(doc, "COMO OBTER CÓPIA DO PROCESSO?", negrito=True)
-        adicionar_paragrafo(doc, 
-            "Informações e pedidos de cópias devem ser solicitados exclusivamente pelos Canais de Atendimento da Anvisa (https://www.gov.br/anvisa/pt-br/canais_atendimento) ou pelo Serviço de Atendimento ao Cidadão (https://www.gov.br/anvisa/pt-br/acessoainformacao/sic)."
-        )
-        adicionar_paragrafo(doc, 
-            "Os pedidos de cópia de processo devem informar o número do processo e a finalidade da cópia."
-        )
-        adicionar_paragrafo(doc, 
-            "A cópia integral dos autos somente será concedida para o interessado direto no processo, ou seu representante devidamente constituído, cuja condição deve ser comprovada mediante a apresentação dos seguintes documentos:"
-        )
-        adicionar_paragrafo(doc, "1. Documento de identificação do autuado (se pessoa física) ou outorgado;")
-        adicionar_paragrafo(doc, 
-            "2. Procuração e documento de identificação do outorgado (advogado ou representante), caso seja ele o requerente. "
-            "Somente serão aceitas procurações e substabelecimento assinados eletronicamente, com certificação digital no padrão da Infraestrutura de Chaves Públicas Brasileira (ICP-Brasil) ou pelo assinador Gov.br."
-        )
-        adicionar_paragrafo(doc, 
-            "3. Contrato ou estatuto social da empresa, com a última alteração (se pessoa jurídica);"
-        )
-        adicionar_paragrafo(doc, 
-            "4. Ata de eleição da atual diretoria quando a procuração estiver assinada por diretor que não conste como sócio da empresa (se pessoa jurídica);"
-        )
-        adicionar_paragrafo(doc, 
-            "A ausência de quaisquer dos documentos acima ensejará o indeferimento sumário do pedido."
-        )
-        adicionar_paragrafo(doc, 
-            "Terceiros não interessados diretamente no processo estão dispensados de apresentar documentação e terão acesso somente às cópias dos seguintes documentos: Auto de Infração, Manifestação da área autuante e Decisão."
-        )
-        adicionar_paragrafo(doc, f"\nInformações de contato: {email_selecionado}")
+            campos["data_extincao"] = data_extincao.strftime('%d/%m/%Y')
+        campos["texto_motivo"] = TEXTOS_MOTIVO_REVISAO.get(motivo_revisao, TEXTO_MOTIVO_REVISAO_GENERICO).format_map(campos)
+
+        MODELO_2.preencher(doc, campos, enderecos)
 
     except Exception as e:
-        st.error(f"Erro ao gerar o documento no modelo 2: {e}")
+        raise Exception(f"Erro ao gerar o documento no modelo 2: {e}")
 
+@rastrear("_gerar_modelo_3")
 def _gerar_modelo_3(doc, info, enderecos, numero_processo, usuario_nome, usuario_email, orgao_registro_comercial, email_selecionado):
     """
     Gera o Documento Word no Modelo 3.
-    
+
     :param doc: Objeto Document do python-docx.
     :param info: Dicionário com informações extraídas.
     :param enderecos: Lista de dicionários com endereços.
@@ -776,90 +2920,207 @@ def _gerar_modelo_3(doc, info, enderecos, numero_processo, usuario_nome, usuario
     :param email_selecionado: Email selecionado pelo usuário.
     """
     try:
-        # Cabeçalho do documento
-        adicionar_paragrafo(doc, "Ao(a) Senhor(a):")
-        nome_autuado = info.get('nome_autuado', '[Nome não informado]')
-        cnpj = info.get('cnpj', '')
-        cpf = info.get('cpf', '')
-        if cnpj:
-            identificador = f"CNPJ: {cnpj}"
-        elif cpf:
-            identificador = f"CPF: {cpf}"
-        else:
-            identificador = "CNPJ/CPF: [Não informado]"
-        adicionar_paragrafo(doc, f"{nome_autuado} – {identificador}")
-        doc.add_paragraph("\n")
-
-        # Informações de endereço
-        for endereco in enderecos:
-            adicionar_paragrafo(doc, f"Endereço: {endereco.get('endereco', '[Não informado]')}")
-            adicionar_paragrafo(doc, f"Cidade: {endereco.get('cidade', '[Não informado]')}")
-            adicionar_paragrafo(doc, f"Bairro: {endereco.get('bairro', '[Não informado]')}")
-            adicionar_paragrafo(doc, f"Estado: {endereco.get('estado', '[Não informado]')}")
-            adicionar_paragrafo(doc, f"CEP: {endereco.get('cep', '[Não informado]')}")
-            doc.add_paragraph("\n")
-        
-        # Assunto e Referência em negrito
-        adicionar_paragrafo(doc, "Assunto: Decisão proferida pela Diretoria Colegiada", negrito=True)
-        adicionar_paragrafo(doc, f"Referência: Processo Administrativo Sancionador nº {numero_processo}", negrito=True)
-        doc.add_paragraph("\n")
-        
-        # Corpo do documento com conteúdo específico
-        adicionar_paragrafo(doc, "Prezado(a) Senhor(a),")
-        doc.add_paragraph("\n")
-        adicionar_paragrafo(doc, 
-            "Informamos que foi proferido julgamento da Diretoria Colegiada no processo administrativo sancionador em referência, conforme decisão em anexo, contra a qual não cabe recurso."
-        )
-        adicionar_paragrafo(doc, "\n")
-        adicionar_paragrafo(doc, 
-            "Em sendo mantida a penalidade de multa, esta notificação estará acompanhada de boleto bancário. Exceto para a decisão, cujo recurso tenha sido considerado intempestivo, um vez que o boleto será encaminhado pela Gerência de Gestão de Arrecadação – GEGAR."
+        anotar_span(enderecos=len(enderecos))
+        campos = _campos_destinatario(info)
+        campos.update(
+            numero_processo=numero_processo,
+            email_selecionado=email_selecionado,
+            usuario_nome=usuario_nome,
+            usuario_email=usuario_email,
         )
-        adicionar_paragrafo(doc, "\n")
-        adicionar_paragrafo(doc, 
-            "O não pagamento do boleto, caso devido, acarretará, sucessivamente: i) a inscrição do devedor no Cadastro Informativo de Crédito não Quitado do Setor Público Federal (CADIN); ii) a inscrição do débito em dívida ativa da União; iii) o ajuizamento de ação de execução fiscal contra o devedor; e iv) a comunicação aos cartórios de registros de imóveis, dos devedores inscritos em dívida ativa ou execução fiscal."
-        )
-        adicionar_paragrafo(doc, "\n")
-        adicionar_paragrafo(doc, 
-            "Esclarecemos que, em caso de penalidade de multa, seu valor foi atualizado pela taxa Selic acumulada nos termos do art. 37-A da Lei 10.522/2002 e no art. 5º do Decreto-Lei 1.736/79."
-        )
-        adicionar_paragrafo(doc, "\n")
-        
-        # Seção "Informações e pedidos de cópias"
-        adicionar_paragrafo(doc, 
-            "Informações e pedidos de cópias podem ser solicitados pelos Canais de Atendimento da Anvisa (webchat, formulário eletrônico ou telefone 0800 642 9782), responsáveis por atender a esse tipo de demanda de forma centralizada. Os pedidos de cópia de PAS devem vir acompanhados dos documentos abaixo, sob pena de não serem atendidos:"
+        MODELO_3.preencher(doc, campos, enderecos)
+
+    except Exception as e:
+        raise Exception(f"Erro ao gerar o documento no modelo 3: {e}")
+
+CAMPOS_OBRIGATORIOS_MODELO = {
+    2: ("motivo_revisao", "data_decisao", "data_recebimento_notificacao"),
+    3: ("usuario_nome", "usuario_email", "orgao_registro_comercial"),
+}
+
+def gerar_documento_modelo(modelo, info, enderecos, numero_processo, email_selecionado, **parametros):
+    """
+    Gera um novo Document no modelo 1, 2 ou 3. Os campos extras de cada
+    modelo vão em `parametros`: motivo_revisao, data_decisao,
+    data_recebimento_notificacao e data_extincao (modelo 2); usuario_nome,
+    usuario_email e orgao_registro_comercial (modelo 3).
+    """
+    faltando = [campo for campo in CAMPOS_OBRIGATORIOS_MODELO.get(modelo, ()) if parametros.get(campo) in (None, "")]
+    if faltando:
+        raise ValueError(f"Campos obrigatórios do modelo {modelo} ausentes: {', '.join(faltando)}")
+    doc = novo_documento()
+    if modelo == 1:
+        _gerar_modelo_1(doc, info, enderecos, numero_processo, email_selecionado)
+    elif modelo == 2:
+        _gerar_modelo_2(
+            doc, info, enderecos, numero_processo,
+            parametros["motivo_revisao"], parametros["data_decisao"], parametros["data_recebimento_notificacao"],
+            parametros.get("data_extincao"), email_selecionado
         )
-        adicionar_paragrafo(doc, "\n")
-        
-        # Lista de documentos necessários
-        documentos = [
-            "Cópia autenticada da procuração/substabelecimento com firma reconhecida e poderes específicos para tal;",
-            "Cópia do CPF e do RG do outorgado e do requerente, caso sejam pessoas distintas; e",
-            "Cópia autenticada do contrato social/estatuto social, com a última alteração."
-        ]
-        
-        for doc_item in documentos:
-            adicionar_paragrafo(doc, f"- {doc_item}")
-        adicionar_paragrafo(doc, "\n")
-        
-        adicionar_paragrafo(doc, 
-            f"Por fim, esclarecemos que foi concedido aos autos por meio do Sistema Eletrônico de Informações (SEI), por 180 (cento e oitenta) dias, ao usuário: {usuario_nome} ({usuario_email})."
+    elif modelo == 3:
+        _gerar_modelo_3(
+            doc, info, enderecos, numero_processo,
+            parametros["usuario_nome"], parametros["usuario_email"], parametros["orgao_registro_comercial"],
+            email_selecionado
         )
-        adicionar_paragrafo(doc, "\n")
-        
-        # Informações de contato
-        adicionar_paragrafo(doc, f"\nInformações de contato: {email_selecionado}")
-        
-        # Encerramento do documento
-        adicionar_paragrafo(doc, "Atenciosamente,")
-        adicionar_paragrafo(doc, "\n")
-        adicionar_paragrafo(doc, f"{usuario_nome}")
-        
-    except Exception as e:
-        st.error(f"Erro ao gerar o documento no modelo 3: {e}")
+    else:
+        raise ValueError(f"Modelo desconhecido: {modelo}")
+    return doc
+
+def nome_arquivo_docx(numero_processo, modelo):
+    """
+    Nome do .docx do processo, como oferecido para download na interface,
+    sem caracteres inválidos em nomes de arquivo (ex.: '/').
+    """
+    sufixo = "" if modelo == 1 else f"_modelo{modelo}"
+    return re.sub(r"[^\w.-]", "_", f"Notificacao_{numero_processo}{sufixo}") + ".docx"
+
+###############################################################################
+# Exportação em lote (ZIP)
+###############################################################################
+MANIFESTO_CAMPOS = ["numero_processo", "destinatario", "arquivo", "erro"]
+# Campos de "dados" usados por exportar_notificacoes_zip
+CAMPOS_DADOS_EXPORTACAO = ("numero_processo", "info", "addresses", "emails")
+
+def resultado_para_exportacao(resultado):
+    """
+    Cópia de um resultado de process_batch só com o que a exportação usa
+    (sem o texto extraído, páginas e rastro), para guardar na sessão.
+    """
+    dados = resultado.get("dados")
+    return {
+        "process_number": resultado["process_number"],
+        "error": resultado.get("error"),
+        "dados": {campo: dados.get(campo) for campo in CAMPOS_DADOS_EXPORTACAO} if dados else None,
+    }
+
+def _nome_unico(nome, usados):
+    """nome, ou nome_2, nome_3... (antes da extensão) se já estiver em usados."""
+    base, extensao = os.path.splitext(nome)
+    candidato, contador = nome, 1
+    while candidato in usados:
+        contador += 1
+        candidato = f"{base}_{contador}{extensao}"
+    usados.add(candidato)
+    return candidato
+
+def exportar_notificacoes_zip(destino, resultados, modelo, **parametros):
+    """
+    Gera a notificação no `modelo` para cada resultado de process_batch e
+    grava o .docx direto no ZIP `destino` (caminho ou arquivo aberto) assim
+    que é gerado, sem manter os documentos em memória. `resultados` pode ser
+    o próprio gerador de process_batch. `parametros` são os campos extras do
+    modelo (ver gerar_documento_modelo).
+
+    O ZIP inclui manifesto.csv com processo, destinatário e arquivo gerado
+    (ou o erro) de cada processo. Um processo repetido no lote gera
+    arquivos com sufixo (_2, _3...), listados no manifesto. Retorna as
+    linhas do manifesto.
+    """
+    manifesto = []
+    nomes_usados = {"manifesto.csv"}
+    # Os .docx já são comprimidos; comprimir de novo só gasta CPU
+    with zipfile.ZipFile(destino, "w", compression=zipfile.ZIP_STORED) as arquivo_zip:
+        for resultado in resultados:
+            dados = resultado.get("dados")
+            linha = {
+                "numero_processo": resultado["process_number"],
+                "destinatario": "",
+                "arquivo": "",
+                "erro": resultado.get("error") or ("" if dados else "Sem dados extraídos"),
+            }
+            if not linha["erro"]:
+                campos = _campos_destinatario(dados["info"])
+                linha["destinatario"] = f"{campos['nome_autuado']} – {campos['identificador']}"
+                enderecos = [a for a in dados["addresses"] if not a.get('excluded', False)]
+                emails = dados.get("emails") or []
+                try:
+                    doc = gerar_documento_modelo(
+                        modelo, dados["info"], enderecos, dados["numero_processo"],
+                        emails[0] if emails else NAO_INFORMADO, **parametros
+                    )
+                    nome = _nome_unico(nome_arquivo_docx(dados["numero_processo"], modelo), nomes_usados)
+                    with arquivo_zip.open(nome, "w") as entrada:
+                        doc.save(entrada)
+                    linha["arquivo"] = nome
+                except Exception as e:
+                    logging.error(f"Erro ao exportar {linha['numero_processo']}: {e}")
+                    linha["erro"] = str(e)
+            manifesto.append(linha)
+
+        csv_manifesto = StringIO()
+        escritor = csv.DictWriter(csv_manifesto, fieldnames=MANIFESTO_CAMPOS)
+        escritor.writeheader()
+        escritor.writerows(manifesto)
+        # BOM para o Excel reconhecer o UTF-8
+        arquivo_zip.writestr("manifesto.csv", csv_manifesto.getvalue().encode("utf-8-sig"))
+    return manifesto
 
 ###############################################################################
 # Aplicação principal (Streamlit)
 ###############################################################################
+RASTREAMENTO_MAX_SESSAO = 20
+
+def _salvar_docx(doc):
+    with span("salvar_docx"):
+        buffer = BytesIO()
+        doc.save(buffer)
+        anotar_span(bytes=buffer.tell())
+    buffer.seek(0)
+    return buffer
+
+def _guardar_rastro(dados_rastro):
+    rastros = st.session_state.setdefault('rastros', [])
+    rastros.append(dados_rastro)
+    del rastros[:-RASTREAMENTO_MAX_SESSAO]
+
+def _linhas_tabela_rastro(dados_rastro):
+    niveis = {}
+    linhas = []
+    for span in dados_rastro["spans"]:
+        nivel = niveis.get(span["pai"], -1) + 1
+        niveis[span["span"]] = nivel
+        detalhes = ", ".join(f"{chave}={valor}" for chave, valor in span["atributos"].items())
+        if span.get("erro"):
+            detalhes = (detalhes + ", " if detalhes else "") + "erro"
+        linhas.append({
+            "etapa": "· " * nivel + span["etapa"],
+            "segundos": f"{span['duracao_s']:.2f}",
+            "detalhes": detalhes,
+        })
+    return linhas
+
+def _exibir_rastros(painel):
+    """
+    Mostra no painel (sidebar) o detalhamento de tempos da última requisição
+    e o total das anteriores, com exportação em JSON lines.
+    """
+    rastros = st.session_state.get('rastros', [])
+    with painel.container():
+        st.subheader("Tempos por etapa")
+        if not rastros:
+            st.caption("Nenhuma requisição medida nesta sessão.")
+            return
+
+        ultimo = rastros[-1]
+        raizes = [span for span in ultimo["spans"] if span["pai"] is None]
+        descricao = ", ".join(f"{chave} {valor}" for chave, valor in ultimo["atributos"].items())
+        st.caption(f"{ultimo['nome']} {descricao}: {sum(s['duracao_s'] for s in raizes):.2f}s")
+        st.table(_linhas_tabela_rastro(ultimo))
+
+        for anterior in reversed(rastros[:-1]):
+            raizes = [span for span in anterior["spans"] if span["pai"] is None]
+            descricao = ", ".join(f"{chave} {valor}" for chave, valor in anterior["atributos"].items())
+            st.caption(f"{anterior['nome']} {descricao}: {sum(s['duracao_s'] for s in raizes):.2f}s")
+
+        st.download_button(
+            label="Exportar spans (JSON lines)",
+            data="\n".join(linha for rastro in rastros for linha in linhas_jsonl(rastro)) + "\n",
+            file_name="spans.jsonl",
+            mime="application/x-ndjson",
+            key="exportar_spans"
+        )
+
 def main():
     st.title("Gerador de Notificações SEI-Anvisa")
 
@@ -875,7 +3136,27 @@ def main():
     st.session_state.password_input = st.sidebar.text_input("Senha", type="password", value=st.session_state.password_input)
 
     headless_option = st.sidebar.checkbox("Executar sem abrir o navegador (headless)?", value=True)
-    
+    async_option = st.sidebar.checkbox("Usar pipeline assíncrono (navegador compartilhado)?", value=False)
+    forcar_option = st.sidebar.checkbox("Forçar atualização (ignorar cache)?", value=False)
+
+    try:
+        metricas_nlp = obter_nlp().metricas()
+        st.sidebar.caption(
+            f"spaCy: carregado em {metricas_nlp['carga_s']:.1f}s, "
+            f"{metricas_nlp['documentos']} documento(s), média {metricas_nlp['latencia_media_s']:.2f}s"
+        )
+    except OSError as e:
+        st.sidebar.error(str(e))
+
+    # O painel fica nesta posição da sidebar, mas só é preenchido no fim da
+    # execução, já com os rastros desta rodada (um único botão de exportação)
+    painel_rastros = st.sidebar.empty()
+    try:
+        _pagina_processo(headless_option, async_option, forcar_option)
+    finally:
+        _exibir_rastros(painel_rastros)
+
+def _pagina_processo(headless_option, async_option, forcar_option):
     # Seção de entrada do número do processo
     st.header("Processo Administrativo")
     if "process_number_input" not in st.session_state:
@@ -893,39 +3174,136 @@ def main():
                     username_encrypted = cipher_suite.encrypt(st.session_state.username_input.encode('utf-8'))
                     password_encrypted = cipher_suite.encrypt(st.session_state.password_input.encode('utf-8'))
 
-                    download_path = process_notification(
-                        username_encrypted,
-                        password_encrypted,
-                        st.session_state.process_number_input,
-                        headless=headless_option
-                    )
-                    st.success("PDF gerado/baixado com sucesso!")
-
-                    if download_path:
-                        pdf_file_name = os.path.basename(download_path)
-                        numero_processo = extract_process_number(pdf_file_name)
-
-                        text_final, enderecos_ocr = extract_text_with_best_ocr(download_path)
-
-                        if text_final.strip():
-                            st.success("Texto extraído com sucesso!")
-                            info = extract_information_spacy(text_final)
-                            addresses_ar_ais = extract_addresses_with_source(text_final)
-
-                            # Unir endereços OCR e AR/AIS
-                            all_addresses = addresses_ar_ais + enderecos_ocr
-
-                            emails = extract_all_emails(info.get('emails', []))
+                    tempos = {}
+                    processar = process_notification_assincrono if async_option else process_notification
+                    with iniciar_rastro("processo", processo=st.session_state.process_number_input) as rastro:
+                        try:
+                            download_path, dados, do_cache = obter_dados_processo(
+                                st.session_state.process_number_input,
+                                lambda: processar(
+                                    username_encrypted,
+                                    password_encrypted,
+                                    st.session_state.process_number_input,
+                                    headless=headless_option,
+                                    tempos=tempos
+                                ),
+                                forcar_atualizacao=forcar_option,
+                                tempos=tempos
+                            )
+                        finally:
+                            _guardar_rastro(rastro.como_dict())
+                    if do_cache:
+                        st.success("Resultado recuperado do cache.")
+                    else:
+                        st.success("PDF gerado/baixado com sucesso!")
+                    if tempos:
+                        st.caption("Tempos: " + ", ".join(f"{etapa} {seg:.1f}s" for etapa, seg in tempos.items()))
+
+                    if dados:
+                        st.success("Texto extraído com sucesso!")
+                        paginas_ocr = sum(1 for p in dados.get('paginas', []) if p['metodo'] == 'ocr')
+                        reprocessadas = sum(1 for p in dados.get('paginas', []) if p.get('passada', 0) > 0)
+                        st.caption(
+                            f"Páginas: {len(dados.get('paginas', []))} no total, {paginas_ocr} via OCR"
+                            + (f", {reprocessadas} refeita(s) em alta resolução." if reprocessadas else ".")
+                        )
 
-                            # Guardar em session_state
-                            st.session_state['info'] = info
-                            st.session_state['addresses_raw'] = all_addresses
-                            st.session_state['numero_processo'] = numero_processo
-                            st.session_state['emails'] = emails
+                        # Guardar em session_state
+                        st.session_state['info'] = dados['info']
+                        st.session_state['addresses_raw'] = dados['addresses']
+                        st.session_state['numero_processo'] = dados['numero_processo']
+                        st.session_state['emails'] = dados['emails']
+                        # Descarta edições de endereços feitas para o processo anterior
+                        st.session_state.pop('addresses_edited', None)
 
                 except Exception as ex:
                     st.error(f"Ocorreu um erro: {ex}")
 
+    # Processamento em lote
+    with st.expander("Processamento em Lote"):
+        lista_processos = st.text_area("Números de processo (um por linha ou separados por vírgula)")
+        arquivo_csv = st.file_uploader("Ou envie um CSV com os números de processo", type=["csv", "txt"])
+        max_workers = st.number_input("Processos em paralelo", min_value=1, max_value=POOL_MAX_SESSOES, value=min(LOTE_MAX_WORKERS, POOL_MAX_SESSOES))
+
+        if st.button("Processar Lote"):
+            texto_lote = lista_processos
+            if arquivo_csv is not None:
+                texto_lote += "\n" + arquivo_csv.getvalue().decode('utf-8', errors='ignore')
+            numeros = parse_process_numbers(texto_lote)
+
+            if not st.session_state.username_input or not st.session_state.password_input or not numeros:
+                st.error("Por favor, preencha o login e informe ao menos um número de processo.")
+            else:
+                username_encrypted = cipher_suite.encrypt(st.session_state.username_input.encode('utf-8'))
+                password_encrypted = cipher_suite.encrypt(st.session_state.password_input.encode('utf-8'))
+
+                progresso = st.progress(0.0)
+                resultados = []
+                for resultado in process_batch(
+                    username_encrypted,
+                    password_encrypted,
+                    numeros,
+                    max_workers=int(max_workers),
+                    headless=headless_option,
+                    forcar_atualizacao=forcar_option
+                ):
+                    resultados.append(resultado)
+                    _guardar_rastro(resultado["rastro"])
+                    progresso.progress(len(resultados) / len(numeros))
+                    if resultado["error"]:
+                        st.error(f"{resultado['process_number']}: {resultado['error']}")
+                    else:
+                        nome = resultado["dados"]["info"].get('nome_autuado') or 'Não informado'
+                        st.write(f"✅ {resultado['process_number']}: {nome} ({os.path.basename(resultado['pdf_path'])})")
+                st.session_state['lote_resultados'] = [resultado_para_exportacao(r) for r in resultados]
+                st.success(f"Lote concluído: {sum(1 for r in resultados if not r['error'])} de {len(numeros)} processos.")
+
+        # Exportação das notificações do último lote processado
+        if st.session_state.get('lote_resultados'):
+            st.markdown("**Exportar notificações do lote (ZIP)**")
+            modelo_lote = st.selectbox(
+                "Modelo das notificações:",
+                [1, 2, 3],
+                format_func=lambda m: f"MODELO {m}",
+                key="modelo_lote_selectbox"
+            )
+            parametros_lote = {}
+            if modelo_lote == 2:
+                parametros_lote["motivo_revisao"] = st.selectbox("Motivo da Revisão:",
+                    ["insuficiencia_provas", "prescricao", "extincao_empresa", "outros"],
+                    key="motivo_revisao_lote"
+                )
+                parametros_lote["data_decisao"] = st.date_input("Data da Decisão:", key="data_decisao_lote")
+                parametros_lote["data_recebimento_notificacao"] = st.date_input("Data de Recebimento da Notificação:", key="data_receb_lote")
+                if parametros_lote["motivo_revisao"] == "extincao_empresa":
+                    parametros_lote["data_extincao"] = st.date_input("Data de Extinção da Empresa:", key="data_extincao_lote")
+            elif modelo_lote == 3:
+                parametros_lote["usuario_nome"] = st.text_input("Nome do Usuário:", key="usuario_nome_lote")
+                parametros_lote["usuario_email"] = st.text_input("Email do Usuário:", key="usuario_email_lote")
+                parametros_lote["orgao_registro_comercial"] = st.text_input("Órgão de Registro Comercial:", key="orgao_registro_lote")
+
+            if st.button("Gerar ZIP das notificações"):
+                resultados = st.session_state['lote_resultados']
+                try:
+                    with tempfile.TemporaryFile() as arquivo_zip:
+                        with iniciar_rastro("exportacao", processos=len(resultados), modelo=modelo_lote) as rastro:
+                            manifesto = exportar_notificacoes_zip(arquivo_zip, resultados, modelo_lote, **parametros_lote)
+                        _guardar_rastro(rastro.como_dict())
+                        arquivo_zip.seek(0)
+                        st.download_button(
+                            label="Baixar ZIP",
+                            data=arquivo_zip.read(),
+                            file_name=f"Notificacoes_lote_modelo{modelo_lote}.zip",
+                            mime="application/zip"
+                        )
+                    gerados = sum(1 for linha in manifesto if linha["arquivo"])
+                    st.success(f"{gerados} de {len(manifesto)} notificações no ZIP (ver manifesto.csv).")
+                    for linha in manifesto:
+                        if linha["erro"]:
+                            st.error(f"{linha['numero_processo']}: {linha['erro']}")
+                except Exception as ex:
+                    st.error(f"Ocorreu um erro ao gerar o ZIP: {ex}")
+
     # Só exibimos as informações extraídas se tivermos st.session_state populado
     if 'info' in st.session_state and 'addresses_raw' in st.session_state:
         st.subheader("Informações Extraídas")
@@ -940,6 +3318,9 @@ def main():
             st.write(f"**CPF:** {info.get('cpf')}")
         else:
             st.write("**CNPJ/CPF:** não encontrado ou inválido")
+        outros_ids = [i["valor"] for i in info.get("identificadores", []) if i["valor"] not in (info.get("cnpj"), info.get("cpf"))]
+        if outros_ids:
+            st.caption(f"Outros CPF/CNPJ válidos no processo: {', '.join(outros_ids)}")
         st.write(f"**Emails:** {', '.join(emails) if emails else 'Não informado'}")
         st.write(f"**Sócios/Advogados:** {', '.join(info.get('socios_advogados', []))}")
 
@@ -961,7 +3342,15 @@ def main():
             exclude_address = st.checkbox("Excluir este endereço?", key=f"excluir_{idx}", value=False)
 
             # Exibe a origem do endereço
-            st.write(f"Origem do endereço: {end.get('source', 'Desconhecido')}")
+            ocorrencias = end.get('ocorrencias', 1)
+            st.write(
+                f"Origem do endereço: {end.get('source', 'Desconhecido')}"
+                + (f" ({ocorrencias} ocorrências)" if ocorrencias > 1 else "")
+            )
+            if end.get('preenchidos_cep'):
+                st.caption("Preenchido pela base de CEP: " + ", ".join(end['preenchidos_cep']))
+            for campo, valor_base in end.get('divergencias_cep', {}).items():
+                st.warning(f"{campo.capitalize()} diverge da base de CEP, que indica: {valor_base}")
             st.write("---")
 
             # Atualizar dicionário em session_state
@@ -1002,7 +3391,7 @@ def main():
 
         if st.button("Gerar Documento Word"):
             try:
-                doc = Document()
+                doc = novo_documento()
                 info = st.session_state['info']
 
                 # Antes de gerar, vamos filtrar os endereços que foram marcados como excluídos
@@ -1013,11 +3402,10 @@ def main():
                 email_selecionado = st.session_state.get('selected_email', '[Não informado]')
 
                 if "MODELO 1" in modelo:
-                    _gerar_modelo_1(doc, info, final_addresses, numero_processo, email_selecionado)
-
-                    buffer = BytesIO()
-                    doc.save(buffer)
-                    buffer.seek(0)
+                    with iniciar_rastro("documento", processo=numero_processo, modelo=1) as rastro:
+                        _gerar_modelo_1(doc, info, final_addresses, numero_processo, email_selecionado)
+                        buffer = _salvar_docx(doc)
+                    _guardar_rastro(rastro.como_dict())
                     output_filename = f"Notificacao_{numero_processo}.docx"
                     st.download_button(
                         label="Baixar Documento",
@@ -1042,21 +3430,21 @@ def main():
                         data_extincao = st.date_input("Data de Extinção da Empresa:", key="data_extincao_input")
 
                     if st.button("Gerar Modelo 2 Word"):
-                        doc = Document()
-                        _gerar_modelo_2(
-                            doc,
-                            info,
-                            final_addresses,
-                            numero_processo,
-                            motivo_revisao,
-                            data_decisao,
-                            data_recebimento_notificacao,
-                            data_extincao,
-                            email_selecionado
-                        )
-                        buffer = BytesIO()
-                        doc.save(buffer)
-                        buffer.seek(0)
+                        doc = novo_documento()
+                        with iniciar_rastro("documento", processo=numero_processo, modelo=2) as rastro:
+                            _gerar_modelo_2(
+                                doc,
+                                info,
+                                final_addresses,
+                                numero_processo,
+                                motivo_revisao,
+                                data_decisao,
+                                data_recebimento_notificacao,
+                                data_extincao,
+                                email_selecionado
+                            )
+                            buffer = _salvar_docx(doc)
+                        _guardar_rastro(rastro.como_dict())
                         output_filename = f"Notificacao_{numero_processo}_modelo2.docx"
                         st.download_button(
                             label="Baixar Documento",
@@ -1074,20 +3462,20 @@ def main():
                     orgao_registro_comercial = st.text_input("Órgão de Registro Comercial:", key="orgao_registro_input")
 
                     if st.button("Gerar Modelo 3 Word"):
-                        doc = Document()
-                        _gerar_modelo_3(
-                            doc,
-                            info,
-                            final_addresses,
-                            numero_processo,
-                            usuario_nome,
-                            usuario_email,
-                            orgao_registro_comercial,
-                            email_selecionado
-                        )
-                        buffer = BytesIO()
-                        doc.save(buffer)
-                        buffer.seek(0)
+                        doc = novo_documento()
+                        with iniciar_rastro("documento", processo=numero_processo, modelo=3) as rastro:
+                            _gerar_modelo_3(
+                                doc,
+                                info,
+                                final_addresses,
+                                numero_processo,
+                                usuario_nome,
+                                usuario_email,
+                                orgao_registro_comercial,
+                                email_selecionado
+                            )
+                            buffer = _salvar_docx(doc)
+                        _guardar_rastro(rastro.como_dict())
                         output_filename = f"Notificacao_{numero_processo}_modelo3.docx"
                         st.download_button(
                             label="Baixar Documento",
@@ -1102,11 +3490,4 @@ def main():
                 st.error(f"Ocorreu um erro ao gerar o documento: {ex}")
 
 if __name__ == '__main__':
-    try:
-        nlp = spacy.load("pt_core_news_sm")
-    except OSError:
-        st.info("Modelo 'pt_core_news_sm' não encontrado. Instalando...")
-        os.system("python -m spacy download pt_core_news_sm")
-        nlp = spacy.load("pt_core_news_sm")
-
     main()
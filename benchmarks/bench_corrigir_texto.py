@@ -0,0 +1,83 @@
+"""
+Benchmark de corrigir_texto (uma passada com alternância pré-compilada)
+contra a implementação anterior (um str.replace por entrada do dicionário).
+
+Uso:
+    python benchmarks/bench_corrigir_texto.py --mb 20
+
+Gera um corpus sintético com palavras acentuadas corrompidas (UTF-8 lido
+como Latin-1) e imprime um JSON com a vazão de cada implementação e a
+se cada uma reconstituiu o texto original. A implementação anterior aplica
+'Ã' antes de 'Ãº', 'Ã£o' etc. e por isso corrompe parte das palavras.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+from bench_regex import gerar_corpus, medir  # noqa: E402
+
+PALAVRAS_ACENTUADAS = [
+    "notificação", "decisão", "infração", "análise", "sanitária", "recurso é",
+    "órgão", "está", "você", "única", "público", "três", "município", "após",
+]
+
+
+def corrigir_texto_anterior(texto):
+    """Cópia da lógica anterior: 16 str.replace em sequência."""
+    for errado, correto in app.SUBSTITUICOES_MOJIBAKE.items():
+        texto = texto.replace(errado, correto)
+    return texto
+
+
+def corromper(texto, proporcao, semente=42):
+    """
+    Acrescenta palavras acentuadas em `proporcao` das linhas do texto.
+    Retorna (original, corrompido), com as palavras do corrompido em
+    mojibake (UTF-8 decodificado como Latin-1).
+    """
+    rng = random.Random(semente)
+    originais, corrompidas = [], []
+    for linha in texto.split("\n"):
+        if rng.random() < proporcao:
+            palavra = rng.choice(PALAVRAS_ACENTUADAS)
+            originais.append(f"{linha} {palavra}")
+            corrompidas.append(f"{linha} {palavra.encode('utf-8').decode('latin-1')}")
+        else:
+            originais.append(linha)
+            corrompidas.append(linha)
+    return "\n".join(originais), "\n".join(corrompidas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=float, default=10, help="tamanho do corpus sintético em MB")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    base = gerar_corpus(args.mb)
+    relatorio = {}
+    for corpus, (original, texto) in (("ascii", (base, base)), ("mojibake", corromper(base, 0.5))):
+        megabytes = len(texto.encode("utf-8")) / (1024 * 1024)
+        resultado = {"corpus_mb": round(megabytes, 2), "sequencias": len(app._PADRAO_MOJIBAKE.findall(texto))}
+        for nome, funcao in (("anterior", corrigir_texto_anterior), ("atual", app.corrigir_texto)):
+            segundos, corrigido = medir(funcao, texto, args.repeticoes)
+            resultado[nome] = {
+                "segundos": round(segundos, 6),
+                "mb_por_s": round(megabytes / segundos, 2) if segundos else None,
+                "texto_original_reconstituido": corrigido == original,
+            }
+        resultado["aceleracao"] = (
+            round(resultado["anterior"]["segundos"] / resultado["atual"]["segundos"], 2)
+            if resultado["atual"]["segundos"] else None
+        )
+        relatorio[corpus] = resultado
+    print(json.dumps(relatorio, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Benchmark da geração dos .docx: modelos pré-compilados (app.ModeloDocx,
+usados por _gerar_modelo_1/2/3) contra a construção anterior, que chamava
+Document() e adicionar_paragrafo para cada parágrafo de cada documento.
+
+Uso:
+    python benchmarks/bench_docx.py --documentos 300
+
+Gera destinatários sintéticos (1 a 3 endereços) e imprime um JSON com a
+vazão em documentos por segundo de cada modelo, só montando o documento e
+montando e salvando o .docx, e se o XML gerado pelas duas formas é idêntico.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import date
+from io import BytesIO
+
+from docx import Document
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+MODELOS = {1: app.MODELO_1, 2: app.MODELO_2, 3: app.MODELO_3}
+DATA = date(2020, 3, 15)
+
+
+def gerar_destinatarios(quantidade, semente=42):
+    rng = random.Random(semente)
+    destinatarios = []
+    for i in range(quantidade):
+        info = {"nome_autuado": f"EMPRESA {rng.randint(1000, 9999)} COMERCIO LTDA"}
+        if rng.random() < 0.7:
+            info["cnpj"] = f"{rng.randint(10, 99)}.{rng.randint(100, 999)}.{rng.randint(100, 999)}/0001-{rng.randint(10, 99)}"
+        else:
+            info["cpf"] = f"{rng.randint(100, 999)}.{rng.randint(100, 999)}.{rng.randint(100, 999)}-{rng.randint(10, 99)}"
+        enderecos = [
+            {
+                "endereco": f"Rua {rng.choice(['das Flores', 'Sete de Setembro', 'XV de Novembro'])}, {rng.randint(1, 2000)}",
+                "cidade": rng.choice(["São Paulo", "Curitiba", "Recife"]),
+                "bairro": "Centro",
+                "estado": rng.choice(["SP", "PR", "PE"]),
+                "cep": f"{rng.randint(10000, 99999)}-{rng.randint(100, 999)}",
+            }
+            for _ in range(rng.randint(1, 3))
+        ]
+        destinatarios.append((info, enderecos, f"25351.{100000 + i}/2024-{rng.randint(10, 99)}", f"contato{i}@empresa.com.br"))
+    return destinatarios
+
+
+def gerar_atual(modelo, destinatario):
+    info, enderecos, numero_processo, email = destinatario
+    doc = app.novo_documento()
+    if modelo == 1:
+        app._gerar_modelo_1(doc, info, enderecos, numero_processo, email)
+    elif modelo == 2:
+        app._gerar_modelo_2(doc, info, enderecos, numero_processo, "prescricao", DATA, DATA, None, email)
+    else:
+        app._gerar_modelo_3(doc, info, enderecos, numero_processo, "Fulano de Tal", "fulano@anvisa.gov.br", "Junta Comercial", email)
+    return doc
+
+
+def _montar(doc, partes, campos, enderecos):
+    for parte in partes:
+        if parte is app.ENDERECOS:
+            for endereco in enderecos:
+                campos_endereco = {campo: endereco.get(campo, app.NAO_INFORMADO) for campo in app.CAMPOS_ENDERECO}
+                _montar(doc, app.BLOCO_ENDERECO.partes, campos_endereco, ())
+        elif parte is app.QUEBRA:
+            doc.add_paragraph("\n")
+        else:
+            texto, negrito = parte
+            app.adicionar_paragrafo(doc, texto.format_map(campos), negrito=negrito)
+
+
+def gerar_anterior(modelo, destinatario):
+    """Construção anterior: Document() e um adicionar_paragrafo por parágrafo."""
+    info, enderecos, numero_processo, email = destinatario
+    campos = app._campos_destinatario(info)
+    campos.update(
+        numero_processo=numero_processo,
+        email_selecionado=email,
+        data_decisao=DATA.strftime('%d/%m/%Y'),
+        data_recebimento_notificacao=DATA.strftime('%d/%m/%Y'),
+        usuario_nome="Fulano de Tal",
+        usuario_email="fulano@anvisa.gov.br",
+    )
+    campos["texto_motivo"] = app.TEXTOS_MOTIVO_REVISAO["prescricao"].format_map(campos)
+    doc = Document()
+    _montar(doc, MODELOS[modelo].partes, campos, enderecos)
+    return doc
+
+
+def _salvar(doc):
+    buffer = BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def _vazao(funcao, modelo, destinatarios, salvar):
+    inicio = time.perf_counter()
+    for destinatario in destinatarios:
+        doc = funcao(modelo, destinatario)
+        if salvar:
+            _salvar(doc)
+    segundos = time.perf_counter() - inicio
+    return round(len(destinatarios) / segundos, 1) if segundos else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documentos", type=int, default=300)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    destinatarios = gerar_destinatarios(args.documentos, args.semente)
+    relatorio = {"documentos": args.documentos, "modelos": {}}
+    for modelo in MODELOS:
+        # Primeira chamada compila o modelo; fica fora da medição
+        gerar_atual(modelo, destinatarios[0])
+        resultado = {}
+        for etapa, salvar in (("montagem", False), ("montagem_e_save", True)):
+            anterior = _vazao(gerar_anterior, modelo, destinatarios, salvar)
+            atual = _vazao(gerar_atual, modelo, destinatarios, salvar)
+            resultado[etapa] = {
+                "anterior_docs_por_s": anterior,
+                "atual_docs_por_s": atual,
+                "aceleracao": round(atual / anterior, 2) if anterior else None,
+            }
+        resultado["xml_identico"] = all(
+            gerar_anterior(modelo, d).element.xml == gerar_atual(modelo, d).element.xml for d in destinatarios[:20]
+        )
+        relatorio["modelos"][modelo] = resultado
+    print(json.dumps(relatorio, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Benchmark da deduplicação de endereços (app.deduplicar_enderecos, com
+blocos por CEP e pares de palavras) contra a comparação ingênua de todos os
+pares com difflib.
+
+Uso:
+    python benchmarks/bench_enderecos.py --enderecos 200 1000 5000
+
+Gera endereços distintos e, para cada um, variantes com ruído de OCR
+(letras trocadas, pontuação, CEP ausente) vindas de origens diferentes.
+Imprime um JSON com o tempo de cada método e a precisão/recall dos pares
+agrupados frente ao gabarito. A comparação ingênua é quadrática e só roda
+até --max-ingenuo endereços. Também confere o caso em que um endereço sem
+número ficaria ligado a dois números diferentes ("numeros_preservados").
+"""
+import argparse
+import difflib
+import json
+import os
+import random
+import sys
+import time
+from itertools import combinations
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+from bench_regex import BAIRROS, CIDADES, LOGRADOUROS, UFS  # noqa: E402
+
+TROCAS_OCR = {"i": "l", "l": "1", "o": "0", "e": "c", "a": "o", "s": "5"}
+ORIGENS = ["AR", "AIS", "Desconhecido", "processo.pdf"]
+
+
+def ruido_ocr(texto, rng):
+    caracteres = list(texto)
+    for _ in range(rng.randint(0, 2)):
+        posicao = rng.randrange(len(caracteres))
+        caracteres[posicao] = TROCAS_OCR.get(caracteres[posicao].lower(), caracteres[posicao])
+    texto = "".join(caracteres)
+    return texto.replace(",", "") if rng.random() < 0.3 else texto
+
+
+def gerar_enderecos(quantidade, semente=42):
+    """
+    Retorna (endereços embaralhados, grupo de cada um). Cerca de metade dos
+    endereços distintos aparece mais de uma vez.
+    """
+    rng = random.Random(semente)
+    enderecos, grupos = [], []
+    grupo = 0
+    while len(enderecos) < quantidade:
+        base = {
+            "endereco": f"{rng.choice(LOGRADOUROS)} {rng.choice(['das Acacias', 'Central', 'do Porto', 'Norte'])}, "
+                        f"{rng.randint(1, 9999)}, {rng.choice(['sala', 'apto', 'bloco', 'loja'])} {rng.randint(1, 300)}",
+            "cidade": rng.choice(CIDADES),
+            "bairro": rng.choice(BAIRROS),
+            "estado": rng.choice(UFS),
+            "cep": f"{rng.randint(10000, 99999)}-{rng.randint(100, 999)}",
+        }
+        for indice in range(rng.choice([1, 1, 2, 3, 4])):
+            variante = dict(base, source=rng.choice(ORIGENS))
+            if indice:
+                variante["endereco"] = ruido_ocr(base["endereco"], rng)
+                if rng.random() < 0.3:
+                    variante["cep"] = app.NAO_INFORMADO
+            enderecos.append(variante)
+            grupos.append(grupo)
+        grupo += 1
+    ordem = list(range(len(enderecos)))
+    rng.shuffle(ordem)
+    return [enderecos[i] for i in ordem], [grupos[i] for i in ordem]
+
+
+def deduplicar_ingenuo(enderecos, limiar=app.ENDERECO_SIMILARIDADE_MINIMA):
+    """Compara todos os pares; devolve o grupo de cada endereço."""
+    normalizados = [app.normalize_address(e["endereco"]) for e in enderecos]
+    grupo = list(range(len(enderecos)))
+
+    def _raiz(i):
+        while grupo[i] != i:
+            i = grupo[i]
+        return i
+
+    for a, b in combinations(range(len(enderecos)), 2):
+        if difflib.SequenceMatcher(None, normalizados[a], normalizados[b], autojunk=False).ratio() >= limiar:
+            grupo[_raiz(b)] = _raiz(a)
+    return [_raiz(i) for i in range(len(enderecos))]
+
+
+def _pares(grupos):
+    por_grupo = {}
+    for i, g in enumerate(grupos):
+        por_grupo.setdefault(g, []).append(i)
+    return {par for membros in por_grupo.values() for par in combinations(membros, 2)}
+
+
+def avaliar(grupos, gabarito):
+    obtidos, esperados = _pares(grupos), _pares(gabarito)
+    acertos = len(obtidos & esperados)
+    return {
+        "precisao": round(acertos / len(obtidos), 4) if obtidos else None,
+        "recall": round(acertos / len(esperados), 4) if esperados else None,
+    }
+
+
+def grupos_deduplicados(enderecos):
+    """Roda deduplicar_enderecos e recupera o grupo de cada endereço de entrada."""
+    marcados = [dict(e, source=str(i)) for i, e in enumerate(enderecos)]
+    grupos = [None] * len(enderecos)
+    for g, unico in enumerate(app.deduplicar_enderecos(marcados)):
+        for origem in unico["source"].split(", "):
+            grupos[int(origem)] = g
+    return grupos
+
+
+def numeros_preservados():
+    """
+    "Rua X, 100", "Rua X" e "Rua X, 200": o endereço sem número pode se
+    juntar a um dos dois, mas 100 e 200 não podem acabar no mesmo grupo.
+    """
+    base = {"cidade": "Sao Paulo", "bairro": "Centro", "estado": "SP", "cep": app.NAO_INFORMADO}
+    ruas = ["Rua Professor Joaquim de Almeida, 100", "Rua Professor Joaquim de Almeida", "Rua Professor Joaquim de Almeida, 200"]
+    for ordem in ([0, 1, 2], [1, 0, 2], [0, 2, 1], [1, 2, 0]):
+        unicos = app.deduplicar_enderecos([dict(base, endereco=ruas[i], source=str(i)) for i in ordem])
+        if not any("100" in u["endereco"] for u in unicos) or not any("200" in u["endereco"] for u in unicos):
+            return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--enderecos", type=int, nargs="+", default=[200, 1000, 5000])
+    parser.add_argument("--max-ingenuo", type=int, default=500)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    relatorio = {"numeros_preservados": numeros_preservados(), "execucoes": []}
+    for quantidade in args.enderecos:
+        enderecos, gabarito = gerar_enderecos(quantidade, args.semente)
+        resultado = {"enderecos": len(enderecos), "distintos": len(set(gabarito))}
+
+        inicio = time.perf_counter()
+        unicos = app.deduplicar_enderecos(enderecos)
+        resultado["blocos"] = {"segundos": round(time.perf_counter() - inicio, 4), "unicos": len(unicos)}
+        resultado["blocos"].update(avaliar(grupos_deduplicados(enderecos), gabarito))
+
+        if quantidade <= args.max_ingenuo:
+            inicio = time.perf_counter()
+            grupos = deduplicar_ingenuo(enderecos)
+            resultado["ingenuo"] = {"segundos": round(time.perf_counter() - inicio, 4), "unicos": len(set(grupos))}
+            resultado["ingenuo"].update(avaliar(grupos, gabarito))
+        relatorio["execucoes"].append(resultado)
+    print(json.dumps(relatorio, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Benchmark da mineração de CPF/CNPJ (app.minerar_identificadores) contra a
+extração anterior, que só aceitava "CNPJ:"/"CPF:" e ficava com o primeiro
+número válido, validado um a um com laços em Python.
+
+Uso:
+    python benchmarks/bench_identificadores.py --paginas 5000
+
+Gera páginas sintéticas com o CNPJ do autuado escrito de várias formas
+("CNPJ:", "C.N.P.J", "inscrita no CNPJ sob o nº", sem rótulo), CPFs de
+terceiros e números que não são documentos (telefones, número do processo,
+dígitos verificadores errados). Imprime um JSON com a vazão (páginas/s e
+MB/s), a vazão da validação em lote frente à validação um a um e, para cada
+método, em quantas páginas o CNPJ do autuado foi encontrado e escolhido.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+from bench_regex import PARAGRAFO  # noqa: E402
+
+FORMAS_CNPJ = [
+    "CNPJ: {cnpj}",
+    "C.N.P.J. {cnpj}",
+    "inscrita no CNPJ sob o n {cnpj}",
+    "{cnpj}",
+]
+
+
+def _com_dv(base, pesos):
+    for peso in pesos:
+        resto = sum(int(d) * p for d, p in zip(base, peso)) % 11
+        base += "0" if resto < 2 else str(11 - resto)
+    return base
+
+
+def gerar_cnpj(rng):
+    return app.format_cnpj(_com_dv("".join(rng.choice("0123456789") for _ in range(12)), app.PESOS_CNPJ))
+
+
+def gerar_cpf(rng):
+    return app.format_cpf(_com_dv("".join(rng.choice("0123456789") for _ in range(9)), app.PESOS_CPF))
+
+
+def gerar_pagina(rng):
+    """Retorna (texto, nome do autuado, CNPJ do autuado)."""
+    nome = f"EMPRESA {rng.randint(1000, 9999)} LTDA"
+    cnpj = gerar_cnpj(rng)
+    invalido = cnpj[:-1] + str((int(cnpj[-1]) + 1) % 10)
+    partes = [
+        f"Processo n 25351.{rng.randint(100000, 999999)}/2024-{rng.randint(10, 99)}. ",
+        PARAGRAFO * rng.randint(2, 6),
+        f"Auto de infracao lavrado contra {nome}, " + rng.choice(FORMAS_CNPJ).format(cnpj=cnpj) + ". ",
+        PARAGRAFO * rng.randint(2, 6),
+        f"Telefone (11) 9{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)} ou 119{rng.randint(10000000, 99999999)}. ",
+        f"Responsavel tecnico CPF {gerar_cpf(rng)}. Numero de referencia {invalido}. ",
+        PARAGRAFO * rng.randint(2, 6),
+    ]
+    if rng.random() < 0.5:
+        partes.append(f"Empresa distribuidora, CNPJ: {gerar_cnpj(rng)}. ")
+    return "".join(partes), nome, cnpj
+
+
+def extracao_anterior(texto):
+    """Extração anterior: primeiro "CNPJ:" com dígitos verificadores válidos."""
+    for cnpj in re.findall(r"CNPJ:\s*([\d./-]{14,18})", texto, re.IGNORECASE):
+        if validar_cnpj_anterior(cnpj):
+            return app.format_cnpj(cnpj)
+    return None
+
+
+def validar_cnpj_anterior(cnpj):
+    """Validação um a um, com a lista de sequências repetidas recriada a cada chamada."""
+    cnpj = "".join(c for c in cnpj if c.isdigit())
+    if len(cnpj) != 14 or cnpj in [str(i) * 14 for i in range(10)]:
+        return False
+    for peso in app.PESOS_CNPJ:
+        soma = 0
+        for j, p in enumerate(peso):
+            soma += int(cnpj[j]) * int(p)
+        resto = soma % 11
+        if (0 if resto < 2 else 11 - resto) != int(cnpj[len(peso)]):
+            return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paginas", type=int, default=5000)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.semente)
+    paginas = [gerar_pagina(rng) for _ in range(args.paginas)]
+    megabytes = sum(len(texto) for texto, _, _ in paginas) / (1024 * 1024)
+
+    relatorio = {"paginas": args.paginas, "corpus_mb": round(megabytes, 2), "metodos": {}}
+    metodos = {
+        "anterior": lambda texto, nome: extracao_anterior(texto),
+        "atual": lambda texto, nome: next(
+            (i["valor"] for i in app.minerar_identificadores(texto, nome) if i["tipo"] == "cnpj" and i["pontuacao"] > 0),
+            None
+        ),
+    }
+    for metodo, funcao in metodos.items():
+        inicio = time.perf_counter()
+        escolhidos = [funcao(texto, nome) for texto, nome, _ in paginas]
+        segundos = time.perf_counter() - inicio
+        relatorio["metodos"][metodo] = {
+            "paginas_por_s": round(args.paginas / segundos, 1),
+            "mb_por_s": round(megabytes / segundos, 2),
+            "cnpj_do_autuado": round(sum(e == c for e, (_, _, c) in zip(escolhidos, paginas)) / args.paginas, 4),
+        }
+
+    digitos = [c.translate(app._PONTUACAO_ID) for _, _, c in paginas] * 20
+    inicio = time.perf_counter()
+    um_a_um = [validar_cnpj_anterior(c) for c in digitos]
+    segundos_um_a_um = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    em_lote = app.validar_cnpjs(digitos)
+    segundos_lote = time.perf_counter() - inicio
+    relatorio["validacao"] = {
+        "numeros": len(digitos),
+        "um_a_um_por_s": round(len(digitos) / segundos_um_a_um),
+        "em_lote_por_s": round(len(digitos) / segundos_lote),
+        "resultados_iguais": um_a_um == em_lote.tolist(),
+    }
+    print(json.dumps(relatorio, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+"""
+Benchmark reprodutível do pipeline de extração com PDFs sintéticos no
+formato dos processos SEI.
+
+Gera PDFs com camada de texto e PDFs digitalizados (somente imagem) de
+tamanhos crescentes, contendo blocos de CPF/CNPJ e endereço conhecidos,
+e mede cada etapa: rasterização, pré-processamento, tesseract,
+normalização, spaCy, regex e geração do .docx. Para cada etapa informa
+tempo total, vazão e latência p50/p95 por página, além do pico de memória
+(RSS) e da acurácia frente ao gabarito embutido.
+
+Uso:
+    python benchmarks/bench_pipeline.py --paginas 10 100 500 --saida resultado.json
+    python benchmarks/bench_pipeline.py --paginas 10 --tipos texto   # sem OCR
+
+Não acessa a rede nem o SEI; os PDFs são gerados num diretório temporário.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+from PIL import Image, ImageDraw, ImageFont  # noqa: E402
+
+LOGRADOUROS = ["Rua das Flores", "Avenida Brasil", "Travessa Sao Jose", "Alameda Santos", "Rodovia BR 116"]
+CIDADES = ["Sao Paulo", "Rio de Janeiro", "Belo Horizonte", "Curitiba", "Recife"]
+BAIRROS = ["Centro", "Jardim America", "Vila Nova", "Boa Viagem", "Savassi"]
+UFS = ["SP", "RJ", "MG", "PR", "PE"]
+EMPRESAS = ["Farmacia Popular Ltda", "Distribuidora Saude SA", "Drogaria Central ME", "Laboratorio Vida Ltda"]
+PROSA = (
+    "Trata-se de processo administrativo sancionador instaurado em desfavor da empresa autuada "
+    "por infracao a legislacao sanitaria federal, conforme auto de infracao lavrado pela area "
+    "competente. A autuada apresentou defesa tempestiva, a qual foi devidamente analisada. "
+    "Considerando os elementos constantes dos autos, decide-se pela manutencao da penalidade."
+)
+LINHAS_POR_PAGINA = 50
+CARACTERES_POR_LINHA = 95
+
+
+###############################################################################
+# Geração de dados sintéticos com gabarito
+###############################################################################
+def _digitos_verificadores(base, pesos):
+    soma = sum(int(d) * p for d, p in zip(base, pesos))
+    resto = soma % 11
+    return "0" if resto < 2 else str(11 - resto)
+
+
+def gerar_cnpj(rng):
+    base = "".join(str(rng.randint(0, 9)) for _ in range(8)) + "0001"
+    base += _digitos_verificadores(base, [5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+    base += _digitos_verificadores(base, [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+    return app.format_cnpj(base)
+
+
+def gerar_cpf(rng):
+    base = "".join(str(rng.randint(0, 9)) for _ in range(9))
+    base += _digitos_verificadores(base, range(10, 1, -1))
+    base += _digitos_verificadores(base, range(11, 1, -1))
+    return app.format_cpf(base)
+
+
+def _quebrar(texto, largura=CARACTERES_POR_LINHA):
+    linhas, atual = [], ""
+    for palavra in texto.split():
+        if len(atual) + len(palavra) + 1 > largura:
+            linhas.append(atual)
+            atual = palavra
+        else:
+            atual = f"{atual} {palavra}".strip()
+    if atual:
+        linhas.append(atual)
+    return linhas
+
+
+def gerar_pagina(rng, numero_pagina):
+    """
+    Retorna (linhas da página, gabarito), onde o gabarito lista os blocos
+    de identificação/endereço inseridos na página.
+    """
+    linhas = [f"Processo n. 25351.{rng.randint(100000, 999999)}/2024-{rng.randint(10, 99)} - Pagina {numero_pagina}", ""]
+    gabarito = []
+    if rng.random() < 0.2:
+        linhas.append("AR - Aviso de Recebimento")
+
+    while len(linhas) < LINHAS_POR_PAGINA - 8:
+        if rng.random() < 0.25 and len(gabarito) < 2:
+            pessoa_fisica = rng.random() < 0.3
+            registro = {
+                "cpf": gerar_cpf(rng) if pessoa_fisica else None,
+                "cnpj": None if pessoa_fisica else gerar_cnpj(rng),
+                "endereco": f"{rng.choice(LOGRADOUROS)}, {rng.randint(10, 9999)} Sala {rng.randint(1, 99)}",
+                "cidade": rng.choice(CIDADES),
+                "bairro": rng.choice(BAIRROS),
+                "estado": rng.choice(UFS),
+                "cep": f"{rng.randint(10000, 99999)}-{rng.randint(100, 999)}",
+            }
+            identificador = f"CPF: {registro['cpf']}" if pessoa_fisica else f"CNPJ: {registro['cnpj']}"
+            linhas += [
+                f"Autuado: {rng.choice(EMPRESAS)}",
+                identificador,
+                f"Endereco: {registro['endereco']}",
+                f"Cidade: {registro['cidade']} Bairro: {registro['bairro']}",
+                f"Estado: {registro['estado']} CEP: {registro['cep']}",
+                "",
+            ]
+            gabarito.append(registro)
+        else:
+            linhas += _quebrar(PROSA) + [""]
+    return linhas[:LINHAS_POR_PAGINA], gabarito
+
+
+def gerar_documento(total_paginas, semente=42):
+    rng = random.Random(semente)
+    paginas, gabarito = [], []
+    for numero in range(1, total_paginas + 1):
+        linhas, registros = gerar_pagina(rng, numero)
+        paginas.append(linhas)
+        gabarito.append(registros)
+    return paginas, gabarito
+
+
+###############################################################################
+# Escrita dos PDFs
+###############################################################################
+def _escapar_pdf(linha):
+    return linha.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def escrever_pdf_texto(caminho, paginas):
+    """
+    Escreve um PDF mínimo com camada de texto (Helvetica), sem dependências externas.
+    """
+    objetos = [None, None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"]
+    kids = []
+    for linhas in paginas:
+        conteudo = ["BT", "/F1 10 Tf", "14 TL", "50 800 Td"]
+        conteudo += [f"({_escapar_pdf(linha)}) '" for linha in linhas]
+        conteudo.append("ET")
+        stream = "\n".join(conteudo).encode("cp1252", errors="replace")
+        objetos.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        numero_conteudo = len(objetos)
+        objetos.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % numero_conteudo
+        )
+        kids.append(len(objetos))
+    objetos[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objetos[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids), len(kids)
+    )
+
+    with open(caminho, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        deslocamentos = []
+        for numero, objeto in enumerate(objetos, start=1):
+            deslocamentos.append(f.tell())
+            f.write(b"%d 0 obj\n" % numero + objeto + b"\nendobj\n")
+        inicio_xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1))
+        for deslocamento in deslocamentos:
+            f.write(b"%010d 00000 n \n" % deslocamento)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, inicio_xref))
+
+
+def _fonte(tamanho=22):
+    for nome in ("DejaVuSans.ttf", "Arial.ttf", "arial.ttf"):
+        try:
+            return ImageFont.truetype(nome, tamanho)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+
+def renderizar_pagina(linhas, dpi=150, fonte=None):
+    """
+    Desenha as linhas numa página A4 em tons de cinza a `dpi`, com fonte e
+    espaçamento proporcionais à resolução.
+    """
+    escala = dpi / 150
+    fonte = fonte or _fonte(round(22 * escala))
+    imagem = Image.new("L", (int(8.27 * dpi), int(11.69 * dpi)), 255)
+    desenho = ImageDraw.Draw(imagem)
+    for i, linha in enumerate(linhas):
+        desenho.text((round(60 * escala), round((60 + i * 30) * escala)), linha, fill=0, font=fonte)
+    return imagem
+
+
+def escrever_pdf_digitalizado(caminho, paginas, dpi=150):
+    """
+    Escreve um PDF somente imagem (como um documento digitalizado), A4 a `dpi`.
+    """
+    fonte = _fonte(round(22 * dpi / 150))
+    imagens = [renderizar_pagina(linhas, dpi=dpi, fonte=fonte).convert("1") for linhas in paginas]
+    imagens[0].save(caminho, "PDF", resolution=dpi, save_all=True, append_images=imagens[1:])
+
+
+###############################################################################
+# Medição
+###############################################################################
+def _percentil(valores, p):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    # Percentil pelo método do posto mais próximo
+    indice = max(0, min(len(ordenados) - 1, math.ceil(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+
+def _resumo(latencias, unidades=None, nome_unidade="paginas"):
+    total = sum(latencias)
+    quantidade = unidades if unidades is not None else len(latencias)
+    return {
+        "total_s": round(total, 4),
+        f"{nome_unidade}_por_s": round(quantidade / total, 2) if total else None,
+        "p50_ms": round(_percentil(latencias, 50) * 1000, 3) if latencias else None,
+        "p95_ms": round(_percentil(latencias, 95) * 1000, 3) if latencias else None,
+    }
+
+
+def _pico_rss_mb():
+    if resource is None:
+        return None
+    fator = 1024 * 1024 if sys.platform == "darwin" else 1024
+    proprio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * fator / (1024 * 1024)
+    filhos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * fator / (1024 * 1024)
+    return {"processo_mb": round(proprio, 1), "maior_filho_mb": round(filhos, 1)}
+
+
+def _cronometrar(funcao, *args, **kwargs):
+    inicio = time.perf_counter()
+    resultado = funcao(*args, **kwargs)
+    return time.perf_counter() - inicio, resultado
+
+
+def avaliar_acuracia(gabarito, campos_por_pagina, textos):
+    """
+    Compara, página a página, os CEPs (extrair_campos) e CPF/CNPJ
+    (minerar_identificadores) extraídos com o gabarito.
+    """
+    esperados_cep = encontrados_cep = esperados_id = encontrados_id = extraidos = 0
+    for registros, campos, texto in zip(gabarito, campos_por_pagina, textos):
+        ceps = {re.sub(r"\D", "", e["cep"]) for e in campos["enderecos"]}
+        ids = {re.sub(r"\D", "", i["valor"]) for i in app.minerar_identificadores(texto)}
+        extraidos += len(app.enderecos_validos(campos["enderecos"], ""))
+        for registro in registros:
+            esperados_cep += 1
+            encontrados_cep += re.sub(r"\D", "", registro["cep"]) in ceps
+            esperados_id += 1
+            encontrados_id += re.sub(r"\D", "", registro["cnpj"] or registro["cpf"]) in ids
+    return {
+        "enderecos_esperados": esperados_cep,
+        "enderecos_extraidos": extraidos,
+        "recall_cep": round(encontrados_cep / esperados_cep, 4) if esperados_cep else None,
+        "recall_cpf_cnpj": round(encontrados_id / esperados_id, 4) if esperados_id else None,
+    }
+
+
+def medir_documento(caminho_pdf, tipo, gabarito, repeticoes_docx=10):
+    etapas = {}
+    textos = []
+
+    if tipo == "texto":
+        segundos, textos = _cronometrar(lambda c: list(app.iterar_paginas_pypdf2(c, normalizar=False)), caminho_pdf)
+        etapas["texto_pypdf2"] = _resumo([segundos], unidades=len(textos))
+    else:
+        rasterizacao, preprocessamento, tesseract = [], [], []
+        nome = os.path.basename(caminho_pdf)
+        inicio = time.perf_counter()
+        for idx, imagem in app.rasterizar_paginas(caminho_pdf):
+            rasterizacao.append(time.perf_counter() - inicio)
+            _, texto, _, tempos, _ = app._ocr_pagina(idx, imagem, nome)
+            preprocessamento.append(tempos.get("preprocessamento", 0.0))
+            tesseract.append(tempos.get("ocr", 0.0))
+            textos.append(texto)
+            inicio = time.perf_counter()
+        etapas["rasterizacao"] = _resumo(rasterizacao)
+        etapas["preprocessamento"] = _resumo(preprocessamento)
+        etapas["tesseract"] = _resumo(tesseract)
+
+    normalizacao, normalizados = [], []
+    for texto in textos:
+        segundos, normalizado = _cronometrar(lambda t: app.corrigir_texto(app.normalize_text(t)), texto)
+        normalizacao.append(segundos)
+        normalizados.append(normalizado)
+    etapas["normalizacao"] = _resumo(normalizacao)
+
+    regex, campos_por_pagina = [], []
+    for texto in normalizados:
+        segundos, campos = _cronometrar(app.extrair_campos, texto)
+        regex.append(segundos)
+        campos_por_pagina.append(campos)
+    etapas["regex"] = _resumo(regex)
+    megabytes = sum(len(t.encode("utf-8")) for t in normalizados) / (1024 * 1024)
+    etapas["regex"]["mb_por_s"] = round(megabytes / sum(regex), 2) if sum(regex) else None
+
+    spacy_latencias, docs = [], []
+    for texto in normalizados:
+        segundos, docs_pagina = _cronometrar(app.analisar_documento, texto)
+        spacy_latencias.append(segundos)
+        docs.extend(docs_pagina)
+    etapas["spacy"] = _resumo(spacy_latencias)
+
+    texto_final = "\f".join(normalizados)
+    campos = app.juntar_campos([("", c) for c in campos_por_pagina])
+    info = app.extract_information_spacy(texto_final, docs=docs, campos=campos)
+    enderecos = app.enderecos_validos(campos["enderecos"], "benchmark")
+
+    geracao_docx = []
+    for _ in range(repeticoes_docx):
+        inicio = time.perf_counter()
+        documento = app.novo_documento()
+        app._gerar_modelo_1(documento, info, enderecos, "25351.000000/2024-00", "contato@exemplo.gov.br")
+        documento.save(BytesIO())
+        geracao_docx.append(time.perf_counter() - inicio)
+    etapas["geracao_docx"] = _resumo(geracao_docx, nome_unidade="documentos")
+
+    return {
+        "etapas": etapas,
+        "acuracia": avaliar_acuracia(gabarito, campos_por_pagina, normalizados),
+        "pico_rss": _pico_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paginas", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--tipos", nargs="+", choices=["texto", "digitalizado"], default=["texto", "digitalizado"])
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", help="arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    resultados = []
+    with tempfile.TemporaryDirectory(prefix="bench_sei_") as diretorio:
+        for total_paginas in args.paginas:
+            paginas, gabarito = gerar_documento(total_paginas, semente=args.semente)
+            for tipo in args.tipos:
+                caminho = os.path.join(diretorio, f"SEI_{tipo}_{total_paginas}.pdf")
+                if tipo == "texto":
+                    escrever_pdf_texto(caminho, paginas)
+                else:
+                    escrever_pdf_digitalizado(caminho, paginas)
+                resultado = medir_documento(caminho, tipo, gabarito)
+                resultado.update({"tipo": tipo, "paginas": total_paginas, "bytes_pdf": os.path.getsize(caminho)})
+                resultados.append(resultado)
+                print(f"{tipo} {total_paginas} páginas: ok", file=sys.stderr)
+
+    relatorio = {"python": sys.version.split()[0], "semente": args.semente, "resultados": resultados}
+    saida = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(saida)
+    else:
+        print(saida)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Benchmark do extrator de campos por regex (extrair_campos) contra a
+implementação anterior (várias chamadas a re.findall por bloco, campos
+alinhados por índice).
+
+Uso:
+    python benchmarks/bench_regex.py --mb 20
+
+Gera um corpus sintético no formato dos processos SEI e imprime um JSON
+com a vazão (MB/s) de cada implementação.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+LOGRADOUROS = ["Rua das Flores", "Avenida Brasil", "Travessa Sao Jose", "Alameda Santos", "Rodovia BR 116"]
+CIDADES = ["Sao Paulo", "Rio de Janeiro", "Belo Horizonte", "Curitiba", "Recife"]
+BAIRROS = ["Centro", "Jardim America", "Vila Nova", "Boa Viagem", "Savassi"]
+UFS = ["SP", "RJ", "MG", "PR", "PE"]
+PARAGRAFO = (
+    "Informamos que foi proferido julgamento pela Coordenacao de Atuacao Administrativa "
+    "e Julgamento das Infracoes Sanitarias no processo administrativo sancionador em referencia. "
+)
+
+
+def gerar_pagina(rng, paragrafos):
+    partes = [PARAGRAFO * rng.randint(*paragrafos)]
+    for _ in range(rng.randint(0, 3)):
+        partes.append(
+            f"Endereco: {rng.choice(LOGRADOUROS)}, {rng.randint(1, 9999)} "
+            f"Cidade: {rng.choice(CIDADES)} Bairro: {rng.choice(BAIRROS)} "
+            f"Estado: {rng.choice(UFS)} CEP: {rng.randint(10000, 99999)}-{rng.randint(100, 999)}\n"
+        )
+    if rng.random() < 0.3:
+        partes.append("AR - Aviso de Recebimento\n")
+    partes.append(f"CNPJ: 11.222.333/0001-81 contato{rng.randint(1, 99)}@empresa.com.br\n")
+    return "".join(partes)
+
+
+def gerar_corpus(megabytes, paragrafos=(8, 20), semente=42):
+    """
+    paragrafos: faixa de parágrafos de texto corrido por página. O padrão
+    (8, 20) dá páginas de 1,5 a 4 mil caracteres, como um despacho típico;
+    (2, 6) gera um corpus denso em rótulos, pior caso para o extrator.
+    """
+    rng = random.Random(semente)
+    paginas = []
+    tamanho = 0
+    while tamanho < megabytes * 1024 * 1024:
+        pagina = gerar_pagina(rng, paragrafos)
+        paginas.append(pagina)
+        tamanho += len(pagina.encode("utf-8"))
+    return "\f".join(paginas)
+
+
+def extracao_anterior(text):
+    """
+    Cópia da lógica anterior de extract_addresses_with_source e dos sócios.
+    CPF/CNPJ saíram de extrair_campos e são medidos em bench_identificadores.py.
+    """
+    addresses = []
+    endereco_pattern = r"(?:Endereço|End|Endereco):\s*([\w\s.,ºª-]+)"
+    cidade_pattern = r"Cidade:\s*([\w\s]+(?: DE [\w\s]+)?)"
+    bairro_pattern = r"Bairro:\s*([\w\s]+)"
+    estado_pattern = r"Estado:\s*([A-Z]{2})"
+    cep_pattern = r"CEP:\s*(\d{2}\.\d{3}-\d{3}|\d{5}-\d{3})"
+
+    for block in text.split("\f"):
+        block_clean = block.strip()
+        block_source = "Desconhecido"
+        if re.search(r"\bAR\b", block_clean, re.IGNORECASE):
+            block_source = "AR"
+        elif re.search(r"\bAIS\b", block_clean, re.IGNORECASE):
+            block_source = "AIS"
+        endereco_matches = re.findall(endereco_pattern, block_clean, re.IGNORECASE)
+        cidade_matches = re.findall(cidade_pattern, block_clean, re.IGNORECASE)
+        bairro_matches = re.findall(bairro_pattern, block_clean, re.IGNORECASE)
+        estado_matches = re.findall(estado_pattern, block_clean, re.IGNORECASE)
+        cep_matches = re.findall(cep_pattern, block_clean, re.IGNORECASE)
+        max_len = max(len(endereco_matches), len(cidade_matches), len(bairro_matches),
+                      len(estado_matches), len(cep_matches))
+        for i in range(max_len):
+            end_str = endereco_matches[i].strip() if i < len(endereco_matches) else "[Não informado]"
+            if len(end_str) < 15:
+                continue
+            addresses.append({
+                "endereco": end_str,
+                "cidade": cidade_matches[i].strip() if i < len(cidade_matches) else "[Não informado]",
+                "bairro": bairro_matches[i].strip() if i < len(bairro_matches) else "[Não informado]",
+                "estado": estado_matches[i].strip() if i < len(estado_matches) else "[Não informado]",
+                "cep": cep_matches[i].strip() if i < len(cep_matches) else "[Não informado]",
+                "source": block_source,
+            })
+    re.findall(r"(?:Sócio|Advogado|Responsável|Representante Legal):\s*([\w\s]+)", text)
+    return addresses
+
+
+def extracao_atual(text):
+    campos_blocos = app.extrair_campos_por_bloco(text)
+    app.juntar_campos(campos_blocos)
+    return app.extract_addresses_with_source(text, campos_blocos=campos_blocos)
+
+
+def medir(funcao, text, repeticoes):
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao(text)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=float, default=10, help="tamanho do corpus sintético em MB")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    relatorio = {}
+    for corpus, paragrafos in (("tipico", (8, 20)), ("denso", (2, 6))):
+        text = gerar_corpus(args.mb, paragrafos=paragrafos)
+        megabytes = len(text.encode("utf-8")) / (1024 * 1024)
+
+        resultado = {"corpus_mb": round(megabytes, 2)}
+        for nome, funcao in (("anterior", extracao_anterior), ("atual", extracao_atual)):
+            segundos, enderecos = medir(funcao, text, args.repeticoes)
+            resultado[nome] = {
+                "segundos": round(segundos, 4),
+                "mb_por_s": round(megabytes / segundos, 2),
+                "enderecos": len(enderecos),
+            }
+        resultado["aceleracao"] = round(resultado["anterior"]["segundos"] / resultado["atual"]["segundos"], 2)
+        relatorio[corpus] = resultado
+    print(json.dumps(relatorio, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark do OCR por regiões de interesse (modo ROI) contra o OCR da
+página inteira.
+
+Uso:
+    python benchmarks/bench_roi.py --paginas 20 --tesseract-cmd /usr/bin/tesseract
+
+Renderiza as páginas sintéticas de bench_pipeline a 300 DPI e, para cada
+uma, faz o OCR completo e o OCR só das regiões com rótulos
+(app._ocr_pagina com roi=True). Informa o tempo por página de cada modo,
+a aceleração, a fração média da página lida no modo ROI e o recall de CEP
+e CPF/CNPJ de cada modo frente ao gabarito. Precisa do Tesseract.
+"""
+import argparse
+import json
+import os
+import sys
+
+import pytesseract
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+from bench_pipeline import _fonte, _resumo, avaliar_acuracia, gerar_documento, renderizar_pagina  # noqa: E402
+
+DPI = 300
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paginas", type=int, default=20)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--tesseract-cmd", help="caminho do executável do Tesseract")
+    parser.add_argument("--saida", help="arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    if args.tesseract_cmd:
+        pytesseract.pytesseract.tesseract_cmd = args.tesseract_cmd
+    try:
+        pytesseract.get_tesseract_version()
+    except Exception as e:
+        sys.exit(f"Tesseract indisponível ({e}); informe --tesseract-cmd.")
+
+    paginas, gabarito = gerar_documento(args.paginas, semente=args.semente)
+    fonte = _fonte(round(22 * DPI / 150))
+
+    modos = {"pagina_inteira": False, "roi": True}
+    medidas = {modo: {"ocr": [], "textos": [], "campos": [], "fracao_area": []} for modo in modos}
+    for idx, linhas in enumerate(paginas, start=1):
+        imagem = renderizar_pagina(linhas, dpi=DPI, fonte=fonte)
+        for modo, roi in modos.items():
+            _, texto, _, tempos, metricas = app._ocr_pagina(idx, imagem, "benchmark", dpi=DPI, roi=roi)
+            medidas[modo]["ocr"].append(tempos["ocr"])
+            medidas[modo]["textos"].append(texto)
+            medidas[modo]["campos"].append(app.extrair_campos(texto))
+            medidas[modo]["fracao_area"].append(metricas.get("fracao_area", 1.0))
+
+    relatorio = {"paginas": args.paginas, "dpi": DPI, "modos": {}}
+    for modo, medida in medidas.items():
+        relatorio["modos"][modo] = {
+            "ocr": _resumo(medida["ocr"]),
+            "fracao_area_media": round(sum(medida["fracao_area"]) / len(medida["fracao_area"]), 3),
+            "acuracia": avaliar_acuracia(gabarito, medida["campos"], medida["textos"]),
+        }
+    inteira = relatorio["modos"]["pagina_inteira"]["ocr"]["total_s"]
+    roi = relatorio["modos"]["roi"]["ocr"]["total_s"]
+    relatorio["aceleracao"] = round(inteira / roi, 2) if roi else None
+
+    saida = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(saida)
+    else:
+        print(saida)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Gera o índice de CEP offline usado pelo app para preencher e conferir
+cidade, bairro e estado dos endereços extraídos.
+
+Uso:
+    python construir_indice_cep.py ceps.csv
+    python construir_indice_cep.py ceps.csv --saida dados/cep.idx
+
+O CSV precisa de uma coluna de CEP e, de preferência, das colunas cidade
+(ou localidade/município), bairro e estado (ou UF). O índice é gravado em
+SEI_CEP_INDICE (padrão dados/cep.idx), que é onde o app o procura.
+"""
+import argparse
+import os
+import time
+
+import app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("csv", help="CSV de origem")
+    parser.add_argument("--saida", default=app.CEP_INDICE_ARQUIVO, help="arquivo do índice")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    quantidade = app.construir_indice_cep(args.csv, args.saida)
+    print(
+        f"{quantidade} CEPs gravados em {args.saida} "
+        f"({os.path.getsize(args.saida) / (1024 * 1024):.1f} MB, {time.perf_counter() - inicio:.1f}s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Execução sem interface do pipeline do app (download no SEI → extração →
+geração do .docx), para rodar em lote em servidores, sem navegador visível
+nem Streamlit em execução.
+
+Uso:
+    SEI_USUARIO=... SEI_SENHA=... python worker.py --fila jobs.jsonl --saida resultados/
+    SEI_USUARIO=... SEI_SENHA=... python worker.py --diretorio jobs/ --saida resultados/ --observar
+
+Cada job é um objeto JSON (uma linha do arquivo --fila, ou um arquivo .json
+em --diretorio, que pode conter um objeto ou uma lista deles):
+
+    {"processo": "25351.123456/2024-12", "modelo": 1, "email": "contato@empresa.com.br"}
+
+    modelo 2: "motivo_revisao", "data_decisao", "data_recebimento_notificacao"
+              e, se for o caso, "data_extincao" (datas em AAAA-MM-DD)
+    modelo 3: "usuario_nome", "usuario_email", "orgao_registro_comercial"
+
+Sem "modelo", o processo é só baixado e extraído. Sem "email", usa o
+primeiro e-mail encontrado no processo.
+
+Para cada job são gravados em --saida o .docx (mesmo nome oferecido na
+interface), um JSON com os dados extraídos e uma linha em resultados.jsonl.
+Em --diretorio, os arquivos lidos são movidos para processados/ ao final.
+Linhas ou arquivos com JSON inválido, ou jobs sem "processo" ou sem os
+campos obrigatórios do modelo, são rejeitados antes de acessar o SEI e não
+param o worker: viram uma linha com "erro" em resultados.jsonl e, em --diretorio, o
+arquivo vai para rejeitados/. Para não ler um arquivo pela metade, grave-o
+com outra extensão e renomeie para .json ao terminar.
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+from collections import defaultdict
+from datetime import date
+
+import app
+
+CAMPOS_DATA = ("data_decisao", "data_recebimento_notificacao", "data_extincao")
+CAMPOS_MODELO = {
+    1: (),
+    2: ("motivo_revisao", "data_decisao", "data_recebimento_notificacao", "data_extincao"),
+    3: ("usuario_nome", "usuario_email", "orgao_registro_comercial"),
+}
+
+
+def validar_job(job):
+    """
+    Rejeita o job antes de qualquer acesso ao SEI: sem "processo", com
+    modelo desconhecido, data inválida ou campo obrigatório do modelo
+    (app.CAMPOS_OBRIGATORIOS_MODELO) ausente.
+    """
+    if not isinstance(job, dict):
+        raise ValueError(f"Job deve ser um objeto JSON, não {type(job).__name__}")
+    if not str(job.get("processo") or "").strip():
+        raise ValueError('Job sem "processo"')
+    if job.get("modelo") is None:
+        return
+    modelo, parametros = parametros_modelo(job)
+    faltando = [
+        campo for campo in app.CAMPOS_OBRIGATORIOS_MODELO.get(modelo, ())
+        if parametros.get(campo) in (None, "")
+    ]
+    if faltando:
+        raise ValueError(f"Campos obrigatórios do modelo {modelo} ausentes: {', '.join(faltando)}")
+
+
+def ler_fila(caminho):
+    """
+    Lê o arquivo JSONL. Retorna (jobs, rejeitados); cada rejeitado é
+    {"origem", "erro"} de uma linha que não pôde ser usada.
+    """
+    jobs, rejeitados = [], []
+    with open(caminho, encoding="utf-8") as f:
+        for numero_linha, linha in enumerate(f, start=1):
+            if not linha.strip():
+                continue
+            origem = f"{caminho}:{numero_linha}"
+            try:
+                job = json.loads(linha)
+                validar_job(job)
+            except ValueError as e:
+                rejeitados.append({"origem": origem, "erro": str(e)})
+                continue
+            job["_origem"] = origem
+            jobs.append(job)
+    return jobs, rejeitados
+
+
+def ler_diretorio(diretorio):
+    """
+    Lê os arquivos .json do diretório (em ordem de nome).
+    Retorna (jobs, arquivos lidos, rejeitados). Um arquivo ilegível ou com
+    algum job inválido é rejeitado inteiro: nenhum job dele é executado.
+    """
+    jobs, arquivos, rejeitados = [], [], []
+    for nome in sorted(os.listdir(diretorio)):
+        caminho = os.path.join(diretorio, nome)
+        if not nome.endswith(".json") or not os.path.isfile(caminho):
+            continue
+        try:
+            with open(caminho, encoding="utf-8") as f:
+                conteudo = json.load(f)
+            jobs_arquivo = conteudo if isinstance(conteudo, list) else [conteudo]
+            for job in jobs_arquivo:
+                validar_job(job)
+        except (OSError, ValueError) as e:
+            rejeitados.append({"origem": caminho, "erro": str(e)})
+            continue
+        for job in jobs_arquivo:
+            job["_origem"] = caminho
+            jobs.append(job)
+        arquivos.append(caminho)
+    return jobs, arquivos, rejeitados
+
+
+def parametros_modelo(job):
+    try:
+        modelo = int(job["modelo"])
+    except (TypeError, ValueError):
+        raise ValueError(f"Modelo inválido: {job['modelo']!r}")
+    if modelo not in CAMPOS_MODELO:
+        raise ValueError(f"Modelo desconhecido: {modelo}")
+    parametros = {}
+    for campo in CAMPOS_MODELO[modelo]:
+        valor = job.get(campo)
+        if campo in CAMPOS_DATA and valor:
+            try:
+                valor = date.fromisoformat(valor)
+            except (TypeError, ValueError):
+                raise ValueError(f"Data inválida em {campo}: {valor!r} (use AAAA-MM-DD)")
+        parametros[campo] = valor
+    return modelo, parametros
+
+
+def gravar_docx(job, dados, saida):
+    modelo, parametros = parametros_modelo(job)
+    emails = dados["emails"]
+    email = job.get("email") or (emails[0] if emails else app.NAO_INFORMADO)
+    doc = app.gerar_documento_modelo(
+        modelo, dados["info"], dados["addresses"], dados["numero_processo"], email, **parametros
+    )
+    caminho = os.path.join(saida, app.nome_arquivo_docx(dados["numero_processo"], modelo))
+    doc.save(caminho)
+    return caminho
+
+
+def registrar_rejeitados(rejeitados, saida):
+    """Grava uma linha com o erro de cada rejeitado em resultados.jsonl."""
+    with open(os.path.join(saida, "resultados.jsonl"), "a", encoding="utf-8") as resumo:
+        for rejeitado in rejeitados:
+            logging.error(f"Job rejeitado ({rejeitado['origem']}): {rejeitado['erro']}")
+            registro = {"processo": None, "origem": rejeitado["origem"], "modelo": None,
+                        "json": None, "docx": None, "erro": rejeitado["erro"], "tempos": {}}
+            resumo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+    return len(rejeitados)
+
+
+def processar_jobs(jobs, saida, username_encrypted, password_encrypted, max_workers, forcar_atualizacao):
+    """
+    Baixa e extrai os processos dos jobs em paralelo (app.process_batch) e,
+    conforme cada um termina, grava os resultados. Retorna quantos jobs falharam.
+    """
+    jobs_por_processo = defaultdict(list)
+    for job in jobs:
+        jobs_por_processo[str(job["processo"]).strip()].append(job)
+
+    falhas = 0
+    with open(os.path.join(saida, "resultados.jsonl"), "a", encoding="utf-8") as resumo:
+        for resultado in app.process_batch(
+            username_encrypted,
+            password_encrypted,
+            list(jobs_por_processo),
+            max_workers=max_workers,
+            headless=True,
+            forcar_atualizacao=forcar_atualizacao,
+        ):
+            numero = resultado["process_number"]
+            dados = resultado["dados"]
+            caminho_json = None
+            if dados is not None:
+                caminho_json = os.path.join(saida, app.nome_arquivo_docx(numero, 1)[:-len(".docx")] + ".json")
+                try:
+                    with open(caminho_json, "w", encoding="utf-8") as f:
+                        json.dump({**dados, "pdf_path": resultado["pdf_path"], "tempos": resultado["tempos"]}, f, ensure_ascii=False, indent=2)
+                except (OSError, TypeError, ValueError) as e:
+                    resultado["error"] = resultado["error"] or f"Erro ao gravar {caminho_json}: {e}"
+                    caminho_json = None
+
+            for job in jobs_por_processo[numero]:
+                registro = {
+                    "processo": numero,
+                    "origem": job["_origem"],
+                    "modelo": job.get("modelo"),
+                    "json": caminho_json,
+                    "docx": None,
+                    "erro": resultado["error"],
+                    "tempos": resultado["tempos"],
+                }
+                if not registro["erro"] and job.get("modelo") is not None:
+                    try:
+                        registro["docx"] = gravar_docx(job, dados, saida)
+                    except Exception as e:
+                        registro["erro"] = str(e)
+                if registro["erro"]:
+                    falhas += 1
+                    logging.error(f"{numero} ({job['_origem']}): {registro['erro']}")
+                else:
+                    logging.info(f"{numero}: {registro['docx'] or registro['json']}")
+                resumo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+                resumo.flush()
+    return falhas
+
+
+def mover_arquivos(arquivos, diretorio, subpasta):
+    destino = os.path.join(diretorio, subpasta)
+    os.makedirs(destino, exist_ok=True)
+    for caminho in arquivos:
+        shutil.move(caminho, os.path.join(destino, os.path.basename(caminho)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    origem = parser.add_mutually_exclusive_group(required=True)
+    origem.add_argument("--fila", help="arquivo JSONL com um job por linha")
+    origem.add_argument("--diretorio", help="diretório com arquivos .json de jobs")
+    parser.add_argument("--saida", required=True, help="diretório de saída (.docx, .json e resultados.jsonl)")
+    parser.add_argument("--workers", type=int, default=app.LOTE_MAX_WORKERS, help="processos baixados em paralelo")
+    parser.add_argument("--forcar", action="store_true", help="ignora o cache de extração")
+    parser.add_argument("--observar", action="store_true", help="com --diretorio, continua aguardando novos jobs")
+    parser.add_argument("--intervalo", type=float, default=30, help="segundos entre verificações com --observar")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO)
+    usuario, senha = os.environ.get("SEI_USUARIO"), os.environ.get("SEI_SENHA")
+    if not usuario or not senha:
+        sys.exit("Defina SEI_USUARIO e SEI_SENHA no ambiente.")
+    username_encrypted = app.cipher_suite.encrypt(usuario.encode("utf-8"))
+    password_encrypted = app.cipher_suite.encrypt(senha.encode("utf-8"))
+    os.makedirs(args.saida, exist_ok=True)
+
+    def _executar(jobs):
+        return processar_jobs(jobs, args.saida, username_encrypted, password_encrypted, args.workers, args.forcar)
+
+    if args.fila:
+        jobs, rejeitados = ler_fila(args.fila)
+        falhas = registrar_rejeitados(rejeitados, args.saida)
+        if jobs:
+            falhas += _executar(jobs)
+        sys.exit(1 if falhas else 0)
+
+    falhas = 0
+    while True:
+        jobs, arquivos, rejeitados = ler_diretorio(args.diretorio)
+        falhas += registrar_rejeitados(rejeitados, args.saida)
+        mover_arquivos([r["origem"] for r in rejeitados], args.diretorio, "rejeitados")
+        if jobs:
+            try:
+                falhas += _executar(jobs)
+            except Exception as e:
+                if not args.observar:
+                    raise
+                # Falha geral (ex.: SEI fora do ar): os arquivos ficam para a próxima verificação
+                logging.error(f"Erro ao processar os jobs de {args.diretorio}: {e}")
+                time.sleep(args.intervalo)
+                continue
+        mover_arquivos(arquivos, args.diretorio, "processados")
+        if not args.observar:
+            break
+        time.sleep(args.intervalo)
+    sys.exit(1 if falhas else 0)
+
+
+if __name__ == "__main__":
+    main()